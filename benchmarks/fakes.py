@@ -0,0 +1,459 @@
+"""Local stand-ins for YouTube, yt-dlp and Discord voice used by the benchmarks.
+
+Nothing here touches the network: yt-dlp is replaced by FakeYoutubeDL, the
+"googlevideo" stream URLs point at an AudioServer on 127.0.0.1, and voice
+connections are StubVoiceClients that read frames the way discord.py's
+audio player thread does. Playback through FFmpeg needs the ffmpeg binary.
+"""
+import asyncio
+import contextlib
+import math
+import multiprocessing
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+import discord
+import yt_dlp
+from aiohttp import web
+from discord.ext import commands
+
+FRAME_DURATION = 0.02
+
+def has_ffmpeg():
+    return shutil.which('ffmpeg') is not None
+
+def write_tone(path, seconds, frequency=440):
+    """Write a 48 kHz stereo sine wave as a WAV file"""
+    rate = 48000
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        chunk = []
+        for i in range(int(rate * seconds)):
+            value = int(12000 * math.sin(2 * math.pi * frequency * i / rate))
+            chunk.append(struct.pack('<hh', value, value))
+        f.writeframes(b''.join(chunk))
+
+class AudioServer:
+    """Serves generated audio files over HTTP in place of googlevideo.com.
+    
+    /videoplayback?id=<video id> returns the same tone for every id; codec
+    'opus' serves an Ogg/Opus copy so the passthrough path can be measured.
+    With delay or rate set it behaves like a slow host: responses start after
+    `delay` seconds and are sent at `rate` bytes per second.
+    """
+    
+    def __init__(self, seconds=3.0, codec='pcm', delay=0.0, rate=None):
+        self.seconds = seconds
+        self.codec = codec
+        self.delay = delay
+        self.rate = rate
+        self.directory = tempfile.mkdtemp(prefix='musicbot-bench-')
+        self.runner = None
+        self.port = None
+        self.requests = 0
+    
+    def prepare(self):
+        wav = os.path.join(self.directory, 'tone.wav')
+        write_tone(wav, self.seconds)
+        if self.codec != 'opus':
+            return wav
+        opus = os.path.join(self.directory, 'tone.opus')
+        subprocess.run(
+            ['ffmpeg', '-loglevel', 'error', '-i', wav, '-c:a', 'libopus', '-b:a', '128k', '-y', opus],
+            check=True
+        )
+        return opus
+    
+    async def start(self):
+        self.path = self.prepare()
+        app = web.Application()
+        app.router.add_get('/videoplayback', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+    
+    async def handle(self, request):
+        self.requests += 1
+        if not self.delay and not self.rate:
+            return web.FileResponse(self.path)
+        
+        await asyncio.sleep(self.delay)
+        response = web.StreamResponse(headers={'Content-Type': 'application/octet-stream'})
+        response.content_length = os.path.getsize(self.path)
+        await response.prepare(request)
+        chunk = max(int(self.rate * 0.02), 1) if self.rate else 65536
+        try:
+            with open(self.path, 'rb') as f:
+                while True:
+                    data = f.read(chunk)
+                    if not data:
+                        break
+                    await response.write(data)
+                    if self.rate:
+                        await asyncio.sleep(len(data) / self.rate)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+    
+    def stream_url(self, video_id):
+        expire = int(time.time()) + 6 * 3600
+        return f"http://127.0.0.1:{self.port}/videoplayback?expire={expire}&id={video_id}"
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def serve_audio_node(port, fake):
+    from utils.audio_node import AudioNode
+    
+    try:
+        asyncio.run(AudioNode('127.0.0.1', port, fake=fake).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+class AudioNodeProcess:
+    """An audio node in a child process, as `run.py --audio-node` would run it.
+    
+    With fake set it streams silence instead of running FFmpeg.
+    """
+    
+    def __init__(self, fake=False):
+        self.fake = fake
+        self.process = None
+        self.port = None
+    
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.port}"
+    
+    def start(self, timeout=10.0):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=serve_audio_node, args=(self.port, self.fake), daemon=True
+        )
+        self.process.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline or not self.process.is_alive():
+                    raise RuntimeError("Audio node did not start")
+                time.sleep(0.05)
+    
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join(5)
+
+class FakeYoutubeDL:
+    """Answers extract_info like yt-dlp, pointing every stream at the AudioServer"""
+    
+    server = None
+    delay = 0.0
+    playlist_size = 50
+    calls = 0
+    
+    def __init__(self, options=None):
+        self.options = options or {}
+    
+    def video(self, video_id):
+        return {
+            'id': video_id,
+            'title': f"Bench Track {video_id}",
+            'url': self.server.stream_url(video_id),
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+            'duration': int(self.server.seconds),
+            'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            'acodec': 'opus' if self.server.codec == 'opus' else 'pcm_s16le',
+            'formats': [{'format_id': str(i), 'url': self.server.stream_url(video_id)} for i in range(20)],
+        }
+    
+    def extract_info(self, url, download=False, process=True):
+        FakeYoutubeDL.calls += 1
+        time.sleep(self.delay)
+        if 'list=' in url:
+            entries = (
+                {'id': f"pl{i:09d}", 'title': f"Playlist Track {i}", 'duration': int(self.server.seconds)}
+                for i in range(self.playlist_size)
+            )
+            return {'_type': 'playlist', 'entries': entries if not process else list(entries)}
+        if url.startswith('ytsearch'):
+            query = url.split(':', 1)[1]
+            return {'entries': [self.video(f"s{abs(hash(query)) % 10 ** 10:010d}")]}
+        video_id = url.split('v=')[-1][:11] if 'v=' in url else url[-11:]
+        return self.video(video_id)
+    
+    def prepare_filename(self, info):
+        return os.path.join(self.server.directory, f"{info['id']}.wav")
+
+def install_fake_ytdl(server, delay=0.0):
+    """Route every yt-dlp extraction in the bot to FakeYoutubeDL"""
+    FakeYoutubeDL.server = server
+    FakeYoutubeDL.delay = delay
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+class StubEncoder:
+    """Takes the encoder settings the bot changes mid-song; frames are never actually encoded"""
+    
+    def __init__(self, bitrate=128, bandwidth='full', expected_packet_loss=0.15, **kwargs):
+        self.bitrate = bitrate
+        self.bandwidth = bandwidth
+        self.packet_loss = expected_packet_loss
+    
+    def set_bitrate(self, kbps):
+        self.bitrate = kbps
+    
+    def set_bandwidth(self, req):
+        self.bandwidth = req
+    
+    def set_expected_packet_loss_percent(self, percentage):
+        self.packet_loss = percentage
+
+class StubVoiceClient:
+    """Plays sources on a thread like discord.py's AudioPlayer, without sending anything.
+    
+    With paced=True frames are read every 20 ms and a frame counts as late
+    when it is read after its deadline; otherwise frames are consumed as
+    fast as the source produces them.
+    """
+    
+    def __init__(self, channel, paced=True, late_threshold=0.005):
+        self.channel = channel
+        self.paced = paced
+        self.late_threshold = late_threshold
+        self.source = None
+        self.encoder = None
+        self.latency = 0.0
+        self.frames = 0
+        self.late_frames = 0
+        self.first_frame_times = []
+        self.last_frame_times = []
+        self.connected = True
+        self._thread = None
+        self._stopped = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+    
+    def play(self, source, *, after=None, **encoder_settings):
+        if self.is_playing():
+            raise discord.ClientException('Already playing audio.')
+        self.source = source
+        if not source.is_opus():
+            self.encoder = StubEncoder(**encoder_settings)
+        self._stopped = threading.Event()
+        self._resumed.set()
+        self._thread = threading.Thread(target=self._run, args=(source, after, self._stopped), daemon=True)
+        self._thread.start()
+    
+    def _run(self, source, after, stopped):
+        first = True
+        next_deadline = time.perf_counter()
+        error = None
+        try:
+            while not stopped.is_set():
+                self._resumed.wait()
+                data = source.read()
+                now = time.perf_counter()
+                if not data:
+                    self.last_frame_times.append(now)
+                    break
+                if first:
+                    self.first_frame_times.append(now)
+                    first = False
+                    next_deadline = now
+                elif self.paced and now - next_deadline > self.late_threshold:
+                    self.late_frames += 1
+                self.frames += 1
+                if self.paced:
+                    next_deadline += FRAME_DURATION
+                    delay = next_deadline - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Like discord.py, don't try to catch up after a stall
+                        next_deadline = time.perf_counter()
+        except Exception as e:
+            error = e
+        finally:
+            if self.source is source:
+                self.source = None
+            # discord.py calls after() before cleaning up the source
+            if after is not None:
+                try:
+                    after(error)
+                except Exception as e:
+                    print(f"after callback failed: {e}")
+            source.cleanup()
+    
+    def is_playing(self):
+        return self.source is not None and self._resumed.is_set()
+    
+    def is_paused(self):
+        return self.source is not None and not self._resumed.is_set()
+    
+    def is_connected(self):
+        return self.connected
+    
+    def pause(self):
+        self._resumed.clear()
+    
+    def resume(self):
+        self._resumed.set()
+    
+    def stop(self):
+        # Like discord.py this only signals the player thread; after() runs there
+        self._stopped.set()
+        self._resumed.set()
+    
+    def join(self, timeout=5):
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+    
+    async def move_to(self, channel):
+        self.channel = channel
+    
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self.connected = False
+        self.channel.guild.voice_client = None
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, view=None):
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.edits = 0
+    
+    async def edit(self, *, content=None, embed=None, view=None):
+        self.edits += 1
+        self.embed = embed or self.embed
+        self.view = view or self.view
+    
+    async def delete(self):
+        pass
+    
+    async def add_reaction(self, emoji):
+        pass
+
+class FakeVoiceChannel:
+    def __init__(self, guild, paced=True):
+        self.guild = guild
+        self.name = f"voice-{guild.id}"
+        self.paced = paced
+    
+    async def connect(self, **kwargs):
+        self.guild.voice_client = StubVoiceClient(self, paced=self.paced)
+        return self.guild.voice_client
+
+class FakeGuild:
+    def __init__(self, guild_id, paced=True):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.voice_client = None
+        self.voice_channel = FakeVoiceChannel(self, paced=paced)
+
+class FakeContext:
+    """Just enough of commands.Context for the music cogs"""
+    
+    def __init__(self, bot, guild, author='bench'):
+        self.bot = bot
+        self.guild = guild
+        self.author = SimpleNamespace(name=author, voice=SimpleNamespace(channel=guild.voice_channel))
+        self.message = FakeMessage(self)
+        self.sent = []
+    
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+    
+    async def send(self, content=None, *, embed=None, view=None, delete_after=None):
+        message = FakeMessage(self, content, embed, view)
+        self.sent.append(message)
+        return message
+    
+    def typing(self):
+        return _NoTyping()
+
+class _NoTyping:
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+
+# Config used for every benchmark bot: no API key, no disk caches, thread extractors
+BENCH_CONFIG = {
+    'DISCORD_TOKEN': None,
+    'YOUTUBE_API_KEY': None,
+    'SEARCH_CACHE_FILE': '',
+    'AUDIO_CACHE_ENABLED': False,
+    'EXTRACTOR_MODE': 'thread',
+    'METRICS_PORT': 0,
+}
+
+@contextlib.asynccontextmanager
+async def bench_bot(**overrides):
+    """A real commands.Bot with the music cogs loaded and fake guilds instead of a gateway"""
+    from utils.config import load_config
+    
+    config = load_config()
+    config.update(BENCH_CONFIG)
+    config['PLAYLIST_DB'] = os.path.join(tempfile.mkdtemp(prefix='musicbot-bench-'), 'playlists.db')
+    config.update(overrides)
+    
+    bot = commands.Bot(command_prefix='!', intents=discord.Intents.default(), help_command=None)
+    bot.config = config
+    guilds = {}
+    bot.get_guild = guilds.get
+    bot.fake_guilds = guilds
+    async with bot:
+        await bot.load_extension('cogs.commands')
+        await bot.load_extension('cogs.ui')
+        yield bot
+        stop_all(bot)
+    shutil.rmtree(os.path.dirname(config['PLAYLIST_DB']), ignore_errors=True)
+
+def stop_all(bot):
+    """Empty every queue and stop every stub voice client, waiting for the player threads"""
+    cog = bot.get_cog('Commands')
+    for guild in bot.fake_guilds.values():
+        if cog and guild.id in cog.players:
+            cog.get_player(guild.id).clear_queue()
+        if guild.voice_client:
+            guild.voice_client.stop()
+    for guild in bot.fake_guilds.values():
+        if guild.voice_client:
+            guild.voice_client.join()
+
+def add_guild(bot, guild_id, paced=True):
+    guild = FakeGuild(guild_id, paced=paced)
+    bot.fake_guilds[guild_id] = guild
+    return guild, FakeContext(bot, guild)
+
+async def wait_for(predicate, timeout=30.0, interval=0.002):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark condition not reached")
+        await asyncio.sleep(interval)
@@ -0,0 +1,232 @@
+"""Multi-guild load simulator.
+
+Runs the real Commands cog with N synthetic guilds at once, each following a
+scripted workload (play, queue more songs, skip, volume, playlist load)
+against the local stand-ins in benchmarks.fakes. Every guild has its own
+paced stub voice client, so frames read later than their 20 ms slot show up
+as late frames, the same way a real voice connection would stutter.
+
+For each step of --guilds it reports event-loop lag, late frames, bot and
+FFmpeg CPU, and RSS. The capacity is the largest step that stayed within
+--max-late and --max-lag. Needs ffmpeg on PATH.
+
+With --audio-node, FFmpeg runs under a separate audio node process and the
+bot only relays its Opus packets; FFmpeg CPU is then not counted. The stub
+voice client does not Opus-encode PCM the way discord.py does, so in-process
+runs below 100% volume leave out encoding work that the node includes.
+
+    python -m benchmarks.load_sim [--guilds 1,5,10,25,50] [--duration 20] [--audio-node] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import AudioServer, AudioNodeProcess, install_fake_ytdl, bench_bot, add_guild, stop_all, has_ffmpeg
+from benchmarks.pipeline_bench import git_commit
+from utils.track import Track
+from utils.ytdl_source import YTDLSource
+
+# Relative weights of the scripted actions once a guild is playing
+ACTIONS = (
+    ('queue', 4),
+    ('volume', 2),
+    ('skip', 2),
+    ('playlist_load', 1),
+)
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best we have without /proc (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a short sleep"""
+    
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+    
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+    
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+    
+    def stop(self):
+        self.task.cancel()
+    
+    def summary(self):
+        samples = sorted(self.samples) or [0.0]
+        return {
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            'max_ms': samples[-1] * 1000,
+        }
+
+async def resolve_track(cog, url):
+    info = await YTDLSource.resolve(url, ytdl_options=cog.config['YTDL_OPTIONS'])
+    return Track.from_info(info, 'loadsim')
+
+async def guild_workload(cog, ctx, rng, stop_at, counts):
+    video = lambda: f"https://www.youtube.com/watch?v=g{ctx.guild.id:04d}{rng.randrange(10 ** 6):06d}"
+    names, weights = zip(*ACTIONS)
+    try:
+        await cog.play.callback(cog, ctx, query=video())
+        counts['play'] += 1
+        while time.perf_counter() < stop_at:
+            await asyncio.sleep(rng.uniform(1.0, 3.0))
+            action = rng.choices(names, weights)[0]
+            if action == 'queue':
+                await cog.play.callback(cog, ctx, query=video())
+            elif action == 'volume':
+                await cog.volume.callback(cog, ctx, rng.choice((50, 80, 100, 120)))
+            elif action == 'skip':
+                await cog.skip.callback(cog, ctx)
+            elif action == 'playlist_load':
+                await cog.playlist.callback(cog, ctx, 'load', name='loadsim')
+            counts[action] += 1
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        counts['errors'] += 1
+        print(f"guild {ctx.guild.id}: {e!r}")
+
+async def run_step(guild_count, duration, seed, **overrides):
+    rng = random.Random(seed)
+    counts = {name: 0 for name in ('play', 'errors', *dict(ACTIONS))}
+    async with bench_bot(**overrides) as bot:
+        cog = bot.get_cog('Commands')
+        # One shared playlist for the playlist_load action
+        _, setup_ctx = add_guild(bot, 0)
+        for i in range(5):
+            cog.get_player(0).add_to_queue(await resolve_track(cog, f"https://www.youtube.com/watch?v=plist{i:06d}"))
+        await cog.playlist.callback(cog, setup_ctx, 'save', name='loadsim')
+        cog.get_player(0).clear_queue()
+        
+        guilds = [add_guild(bot, 1 + i) for i in range(guild_count)]
+        monitor = LoopLagMonitor()
+        monitor.start()
+        cpu_start = time.process_time()
+        children_start = children_cpu()
+        wall_start = time.perf_counter()
+        stop_at = wall_start + duration
+        tasks = [
+            asyncio.create_task(guild_workload(cog, ctx, random.Random(rng.random()), stop_at, counts))
+            for _, ctx in guilds
+        ]
+        await asyncio.sleep(duration)
+        rss = rss_mb()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        monitor.stop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        
+        frames = late = 0
+        for guild, _ in guilds:
+            if guild.voice_client:
+                frames += guild.voice_client.frames
+                late += guild.voice_client.late_frames
+        stop_all(bot)
+    
+    # FFmpeg children are only counted once they have exited and been reaped
+    return {
+        'guilds': guild_count,
+        'frames': frames,
+        'late_frames': late,
+        'late_ratio': late / frames if frames else 0.0,
+        'loop_lag': monitor.summary(),
+        'bot_cpu_percent': cpu / wall * 100,
+        'ffmpeg_cpu_percent': (children_cpu() - children_start) / wall * 100,
+        'rss_mb': rss,
+        'actions': counts,
+    }
+
+async def run(args):
+    server = await AudioServer(seconds=args.track_seconds, codec=args.codec).start()
+    install_fake_ytdl(server, delay=args.extract_delay)
+    node = AudioNodeProcess().start() if args.audio_node else None
+    overrides = {'AUDIO_NODES': node.address} if node else {}
+    steps = []
+    try:
+        for guild_count in args.guilds:
+            step = await run_step(guild_count, args.duration, args.seed, **overrides)
+            steps.append(step)
+            print(
+                f"{guild_count:>6} guilds  late {step['late_ratio'] * 100:6.2f}%  "
+                f"lag p99 {step['loop_lag']['p99_ms']:7.1f} ms  "
+                f"cpu {step['bot_cpu_percent']:6.1f}% (+ffmpeg {step['ffmpeg_cpu_percent']:6.1f}%)  "
+                f"rss {step['rss_mb']:7.1f} MB  errors {step['actions']['errors']}"
+            )
+            if step['late_ratio'] > args.max_late * 4:
+                print("Far past the late-frame limit, stopping here")
+                break
+    finally:
+        if node:
+            node.stop()
+        await server.stop()
+    return steps
+
+def capacity(steps, max_late, max_lag):
+    passing = [
+        step['guilds'] for step in steps
+        if step['late_ratio'] <= max_late and step['loop_lag']['p99_ms'] <= max_lag and not step['actions']['errors']
+    ]
+    return max(passing) if passing else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', default='1,5,10,25,50', help="comma separated guild counts to step through")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per step")
+    parser.add_argument('--track-seconds', type=float, default=8.0)
+    parser.add_argument('--codec', choices=('pcm', 'opus'), default='pcm')
+    parser.add_argument('--extract-delay', type=float, default=0.05, help="seconds each fake extraction takes")
+    parser.add_argument('--max-late', type=float, default=0.01, help="late frame ratio a step may have")
+    parser.add_argument('--max-lag', type=float, default=50.0, help="p99 event loop lag (ms) a step may have")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--audio-node', action='store_true', help="play through a separate audio node process")
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+    args.guilds = [int(count) for count in args.guilds.split(',')]
+    
+    if not has_ffmpeg():
+        sys.exit("ffmpeg not found on PATH; the load simulator needs it to play audio")
+    
+    json_path = os.path.abspath(args.json) if args.json else None
+    # The cog imports playlists.json from the working directory, so keep it away from real data
+    os.chdir(tempfile.mkdtemp(prefix='musicbot-loadsim-'))
+    
+    steps = asyncio.run(run(args))
+    result = capacity(steps, args.max_late, args.max_lag)
+    print(f"Capacity: {result} guilds (late frames <= {args.max_late * 100:.1f}%, loop lag p99 <= {args.max_lag:.0f} ms)")
+    
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'commit': git_commit(), 'args': vars(args), 'capacity': result, 'steps': steps}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measure memory retained per queued track with tracemalloc.
+
+Builds a synthetic yt-dlp info dict shaped like a real YouTube extraction
+(formats, thumbnails, subtitles), then measures what each representation
+keeps alive per entry. Exits with status 1 if a Track or a playing
+YTDLSource retains more than the given bound.
+
+The project has no test suite or runner, so this script is the regression
+gate for per-track memory rather than a test file: it runs offline in a
+second, and its exit status can fail a CI job or a pre-merge check. Run it
+after changing INFO_FIELDS, Track or what YTDLSource keeps.
+
+    python -m benchmarks.memory_bench [--count 1000] [--max-track-bytes 600] [--max-source-bytes 4096]
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from utils.track import Track, compact_info
+from utils.ytdl_source import YTDLSource
+
+def raw_info(index):
+    video_id = f"{index:011d}"
+    return {
+        'id': video_id,
+        'title': f"Benchmark Song {index}",
+        'url': f"https://rr1---sn-test.googlevideo.com/videoplayback?expire=1700000000&id={video_id}&itag=251&mime=audio%2Fwebm",
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': 215,
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'acodec': 'opus',
+        'description': "Lorem ipsum dolor sit amet " * 40,
+        'tags': [f"tag{i}" for i in range(30)],
+        'formats': [
+            {
+                'format_id': str(format_id),
+                'url': f"https://rr1---sn-test.googlevideo.com/videoplayback?itag={format_id}&id={video_id}&" + "x" * 600,
+                'ext': 'webm',
+                'acodec': 'opus',
+                'vcodec': 'none',
+                'abr': 160.0,
+                'asr': 48000,
+                'filesize': 3500000,
+                'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*', 'Accept-Language': 'en-us'},
+                'protocol': 'https',
+                'format_note': 'medium',
+            }
+            for format_id in range(30)
+        ],
+        'thumbnails': [
+            {'url': f"https://i.ytimg.com/vi/{video_id}/{i}.jpg", 'height': 90 * i, 'width': 160 * i, 'id': str(i)}
+            for i in range(40)
+        ],
+        'subtitles': {lang: [{'ext': 'vtt', 'url': f"https://example.invalid/{video_id}/{lang}"}] for lang in ('en', 'de', 'fr', 'es', 'ja')},
+        'requester': 'benchmark',
+    }
+
+class SilentSource(discord.AudioSource):
+    def read(self):
+        return b''
+
+def retained_per_item(build, count):
+    """Bytes still allocated per item after building `count` of them and keeping only the results"""
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    kept = [build(index) for index in range(count)]
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in snapshot.compare_to(baseline, 'filename'))
+    del kept
+    return size / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--max-track-bytes', type=int, default=600)
+    parser.add_argument('--max-source-bytes', type=int, default=4096)
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+    
+    results = {
+        'raw_info': retained_per_item(raw_info, args.count),
+        'compact_info': retained_per_item(lambda i: compact_info(raw_info(i)), args.count),
+        'track': retained_per_item(lambda i: Track.from_info(raw_info(i)), args.count),
+        'ytdl_source': retained_per_item(
+            lambda i: YTDLSource(SilentSource(), data=compact_info(raw_info(i)), volume_mode='transformer'),
+            args.count
+        ),
+    }
+    
+    for name, size in results.items():
+        print(f"{name:<14}{size:>10.0f} bytes/entry")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'count': args.count, 'bytes_per_entry': results}, f, indent=2)
+    
+    failed = False
+    if results['track'] > args.max_track_bytes:
+        print(f"FAIL: Track retains {results['track']:.0f} bytes, bound is {args.max_track_bytes}")
+        failed = True
+    if results['ytdl_source'] > args.max_source_bytes:
+        print(f"FAIL: YTDLSource retains {results['ytdl_source']:.0f} bytes, bound is {args.max_source_bytes}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
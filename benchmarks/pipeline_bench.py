@@ -0,0 +1,223 @@
+"""Offline benchmarks for the play pipeline.
+
+Drives the real Commands cog against local stand-ins (see benchmarks.fakes):
+yt-dlp answers from FakeYoutubeDL after --extract-delay seconds, streams
+come from a local HTTP server, and a stub voice client reads the frames.
+Measures:
+
+  play_first_frame   !play until the voice client reads the first frame
+  transition_gap     last frame of one track until the first of the next
+  source_fps         YTDLSource.read() calls per CPU second in the bot process
+                     (with --codec opus also for Opus that FFmpeg encodes at 50% volume)
+  queue_ops          cost of TrackQueue operations with 10k entries
+
+Playback benchmarks need ffmpeg on PATH and are skipped without it. Results
+go to --json so runs can be compared; --compare prints the change against
+an earlier file.
+
+    python -m benchmarks.pipeline_bench [--runs 10] [--codec pcm|opus] [--json out.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from benchmarks.fakes import AudioServer, install_fake_ytdl, bench_bot, add_guild, stop_all, wait_for, has_ffmpeg
+from utils.track import Track, TrackQueue
+from utils.ytdl_source import YTDLSource, stream_cache
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+async def bench_play_first_frame(runs):
+    """Fresh guild per run, so each !play connects, resolves and starts FFmpeg"""
+    samples = []
+    async with bench_bot() as bot:
+        cog = bot.get_cog('Commands')
+        for run in range(runs):
+            guild, ctx = add_guild(bot, 1000 + run)
+            start = time.perf_counter()
+            await cog.play.callback(cog, ctx, query=f"https://www.youtube.com/watch?v=first{run:06d}")
+            await wait_for(lambda: guild.voice_client and guild.voice_client.first_frame_times)
+            samples.append(guild.voice_client.first_frame_times[0] - start)
+            stop_all(bot)
+            stream_cache.invalidate(f"first{run:06d}")
+    return summarize(samples)
+
+async def bench_transition_gap(runs):
+    """Queue runs more tracks behind a playing one and time the silence between consecutive tracks"""
+    async with bench_bot() as bot:
+        cog = bot.get_cog('Commands')
+        guild, ctx = add_guild(bot, 1)
+        await cog.play.callback(cog, ctx, query="https://www.youtube.com/watch?v=trans000000")
+        # Queue the rest the way playlist ingestion does, so they are prefetched like real ones
+        cog.get_player(guild.id).queue.extend(
+            Track(f"trans{i:06d}", f"Transition {i}", 1, None, 'bench') for i in range(1, runs + 1)
+        )
+        cog.schedule_prefetch(guild.id)
+        voice = guild.voice_client
+        await wait_for(lambda: len(voice.first_frame_times) >= runs + 1, timeout=60 + runs * 10)
+        gaps = [voice.first_frame_times[i + 1] - voice.last_frame_times[i] for i in range(runs)]
+    return summarize(gaps)
+
+class MemorySource(discord.AudioSource):
+    """Endless 20 ms PCM frames, to isolate the Python-side cost per frame"""
+    
+    def __init__(self):
+        self.frame = b'\x01\x00' * (discord.opus.Encoder.FRAME_SIZE // 2)
+    
+    def read(self):
+        return self.frame
+
+def frames_per_cpu_second(source, frames):
+    start = time.process_time()
+    read = 0
+    for _ in range(frames):
+        if not source.read():
+            break
+        read += 1
+    elapsed = time.process_time() - start
+    return read / elapsed if elapsed else float('inf')
+
+def bench_source_fps(frames, server):
+    info = {'id': 'fps00000000', 'title': 'fps', 'url': server.path, 'acodec': 'pcm_s16le', 'local': True}
+    results = {
+        'memory_unity': frames_per_cpu_second(YTDLSource(MemorySource(), data=info, volume=1.0), frames),
+        'memory_scaled': frames_per_cpu_second(YTDLSource(MemorySource(), data=info, volume=0.5), frames),
+    }
+    if has_ffmpeg():
+        from utils.ytdl_source import create_audio_source
+        source = YTDLSource(create_audio_source(info, 0.5, passthrough=False), data=info, volume=0.5)
+        # The local tone is short, so the count covers whatever FFmpeg produces
+        results['ffmpeg_pcm'] = frames_per_cpu_second(source, frames)
+        source.cleanup()
+        if server.codec == 'opus':
+            opus_info = dict(info, acodec='opus')
+            source = YTDLSource(create_audio_source(opus_info, 0.5), data=opus_info, volume=0.5)
+            results['ffmpeg_opus'] = frames_per_cpu_second(source, frames)
+            source.cleanup()
+    return results
+
+def bench_queue_ops(size, repeat):
+    tracks = [Track(f"q{i:09d}", f"Queue Track {i}", 200, None, 'bench') for i in range(size)]
+    
+    def filled():
+        queue = TrackQueue()
+        queue.extend(tracks)
+        return queue
+    
+    queue = filled()
+    results = {}
+    
+    def per_op(name, func, number=repeat):
+        timer = timeit.Timer(func)
+        results[name] = min(timer.repeat(repeat=3, number=number)) / number * 1e6
+    
+    per_op('append_popleft', lambda: queue.append(queue.popleft()))
+    per_op('peek_first_10', lambda: queue[:10])
+    per_op('remove_middle', lambda: queue.append(queue.remove_at(size // 2)), number=max(1, repeat // 10))
+    per_op('move_end_to_front', lambda: queue.move(len(queue) - 1, 0), number=max(1, repeat // 10))
+    per_op('shuffle', lambda: queue.shuffle(), number=max(1, repeat // 100))
+    per_op('extend_10k', lambda: filled(), number=max(1, repeat // 100))
+    per_op('to_dicts_10k', lambda: [track.to_dict() for track in queue], number=max(1, repeat // 100))
+    return {name: round(value, 3) for name, value in results.items()}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = flatten(json.load(f).get('results', {}))
+    print(f"\n{'metric':<40}{'before':>12}{'after':>12}{'change':>10}")
+    for name, value in flatten(current).items():
+        if name in previous and previous[name] and not name.endswith('.runs'):
+            change = (value - previous[name]) / previous[name] * 100
+            print(f"{name:<40}{previous[name]:>12.2f}{value:>12.2f}{change:>+9.1f}%")
+
+async def run(args):
+    server = await AudioServer(seconds=args.track_seconds, codec=args.codec).start()
+    install_fake_ytdl(server, delay=args.extract_delay)
+    results = {}
+    try:
+        results['queue_ops_us'] = bench_queue_ops(args.queue_size, args.repeat)
+        results['source_fps'] = bench_source_fps(args.frames, server)
+        if has_ffmpeg():
+            results['play_first_frame'] = await bench_play_first_frame(args.runs)
+            results['transition_gap'] = await bench_transition_gap(args.runs)
+        else:
+            print("ffmpeg not found, skipping playback benchmarks")
+    finally:
+        await server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--codec', choices=('pcm', 'opus'), default='pcm')
+    parser.add_argument('--extract-delay', type=float, default=0.05, help="seconds each fake extraction takes")
+    parser.add_argument('--track-seconds', type=float, default=1.0)
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--compare', help="earlier --json output to compare against")
+    args = parser.parse_args()
+    
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    # The cog imports playlists.json from the working directory, so keep it away from real data
+    os.chdir(tempfile.mkdtemp(prefix='musicbot-bench-'))
+    random.seed(0)
+    
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'ffmpeg': has_ffmpeg(),
+                'args': vars(args),
+                'results': results
+            }, f, indent=2)
+    if compare_path:
+        compare(results, compare_path)
+
+if __name__ == "__main__":
+    main()
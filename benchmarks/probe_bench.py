@@ -0,0 +1,101 @@
+"""Check the !diag network probe against a stream host with known behaviour.
+
+Starts the AudioServer stand-in with a fixed --delay before the first byte
+and a --rate bandwidth cap, probes it --runs times and prints the measured
+phases next to the configured values. It then plays a track from the
+stand-in in a benchmark bot and runs !diag, so the whole command is
+exercised offline. --url probes a real host instead (no bot run).
+
+    python -m benchmarks.probe_bench [--delay 0.2] [--rate 2000000] [--runs 5] [--url URL] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import AudioServer, install_fake_ytdl, bench_bot, add_guild, wait_for, has_ffmpeg
+from utils.net_probe import probe, format_ms, format_rate
+
+def summarize(result):
+    return {
+        'dns_ms': result.dns and result.dns * 1000,
+        'connect_ms': result.connect and result.connect * 1000,
+        'tls_ms': result.tls and result.tls * 1000,
+        'ttfb_ms': result.ttfb and result.ttfb * 1000,
+        'throughput_bytes_per_second': result.throughput,
+        'bytes': result.bytes,
+        'error': result.error,
+    }
+
+async def probe_runs(url, runs, max_bytes, max_seconds):
+    results = []
+    for _ in range(runs):
+        result = await probe(url, max_bytes=max_bytes, max_seconds=max_seconds)
+        print(
+            f"dns {format_ms(result.dns):>7}  connect {format_ms(result.connect):>7}  tls {format_ms(result.tls):>7}  "
+            f"first byte {format_ms(result.ttfb):>7}  {format_rate(result.throughput):>14}"
+            + (f"  error: {result.error}" if result.error else "")
+        )
+        results.append(summarize(result))
+    return results
+
+async def diag_run(server):
+    """!diag in a benchmark bot while a track from the stand-in plays"""
+    async with bench_bot() as bot:
+        cog = bot.get_cog('Commands')
+        guild, ctx = add_guild(bot, 1)
+        await cog.play.callback(cog, ctx, query="https://www.youtube.com/watch?v=diag0000000")
+        await wait_for(lambda: guild.voice_client and guild.voice_client.first_frame_times)
+        for _ in range(2):
+            await cog.diagnostics.callback(cog, ctx)
+        embed = ctx.sent[-1].embed
+        print(f"\n!diag: {embed.description}")
+        for field in embed.fields:
+            print(f"  {field.name}: {field.value}".replace('\n', ' | '))
+        return {field.name: field.value for field in embed.fields}
+
+async def run(args):
+    max_bytes = int(args.max_mb * 1024 * 1024)
+    if args.url:
+        return {'probes': await probe_runs(args.url, args.runs, max_bytes, args.max_seconds)}
+    
+    server = await AudioServer(seconds=args.track_seconds, delay=args.delay, rate=args.rate).start()
+    install_fake_ytdl(server)
+    try:
+        print(f"Stand-in: first byte after {args.delay * 1000:.0f} ms, {format_rate(args.rate)}")
+        results = {'probes': await probe_runs(server.stream_url('probe000000'), args.runs, max_bytes, args.max_seconds)}
+        if has_ffmpeg():
+            results['diag'] = await diag_run(server)
+        else:
+            print("ffmpeg not found, skipping the !diag run")
+        return results
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="probe this URL instead of the local stand-in")
+    parser.add_argument('--delay', type=float, default=0.2, help="stand-in delay before the first byte, in seconds")
+    parser.add_argument('--rate', type=float, default=2_000_000, help="stand-in bandwidth in bytes per second")
+    parser.add_argument('--track-seconds', type=float, default=20.0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-mb', type=float, default=2.0)
+    parser.add_argument('--max-seconds', type=float, default=3.0)
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+    
+    json_path = os.path.abspath(args.json) if args.json else None
+    # The cog imports playlists.json from the working directory, so keep it away from real data
+    os.chdir(tempfile.mkdtemp(prefix='musicbot-bench-'))
+    
+    results = asyncio.run(run(args))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare per-frame volume scaling costs.
+
+Measures how many 20 ms PCM frames one core can push through each volume
+path, which is roughly how many concurrent guilds a single player thread
+budget could serve at 50 frames per second each.
+
+    python -m benchmarks.volume_bench [--frames 20000] [--volume 0.5] [--json out.json]
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from utils.volume import VolumeTransformer, np
+
+FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE
+FRAMES_PER_SECOND = 50
+
+def make_frame():
+    # 20 ms of a 440 Hz stereo sine at 48 kHz
+    samples = []
+    for i in range(FRAME_SIZE // 4):
+        value = int(16000 * math.sin(2 * math.pi * 440 * i / 48000))
+        samples.extend((value, value))
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+class FrameSource(discord.AudioSource):
+    def __init__(self, frame):
+        self.frame = frame
+    
+    def read(self):
+        return self.frame
+
+def measure(source, frames):
+    start = time.process_time()
+    for _ in range(frames):
+        source.read()
+    elapsed = time.process_time() - start
+    return frames / elapsed if elapsed else float('inf')
+
+def measure_ffmpeg(frames, volume):
+    """CPU seconds FFmpeg spends per frame with and without a volume filter, if FFmpeg is installed"""
+    if not shutil.which('ffmpeg'):
+        return None
+    
+    seconds = frames / FRAMES_PER_SECOND
+    results = {}
+    for label, extra in (('ffmpeg_plain', []), ('ffmpeg_filter', ['-af', f'volume={volume:.2f}'])):
+        args = [
+            'ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            *extra, '-f', 's16le', '-ar', '48000', '-ac', '2', '-y', os.devnull
+        ]
+        before = os.times()
+        subprocess.run(args, check=True)
+        after = os.times()
+        cpu = (after.children_user - before.children_user) + (after.children_system - before.children_system)
+        results[label] = frames / cpu if cpu else float('inf')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--volume', type=float, default=0.5)
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+    
+    frame = make_frame()
+    results = {
+        'transformer_audioop': measure(discord.PCMVolumeTransformer(FrameSource(frame), args.volume), args.frames),
+        'transformer_unity': measure(VolumeTransformer(FrameSource(frame), 1.0), args.frames),
+        'passthrough': measure(FrameSource(frame), args.frames),
+    }
+    if np is not None:
+        results['transformer_numpy'] = measure(VolumeTransformer(FrameSource(frame), args.volume, use_numpy=True), args.frames)
+    
+    ffmpeg_results = measure_ffmpeg(args.frames, args.volume)
+    if ffmpeg_results:
+        results.update(ffmpeg_results)
+    
+    print(f"{'path':<22}{'frames/s/core':>16}{'streams/core':>14}")
+    for name, fps in sorted(results.items(), key=lambda item: item[1]):
+        print(f"{name:<22}{fps:>16.0f}{fps / FRAMES_PER_SECOND:>14.0f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': args.frames, 'volume': args.volume, 'frames_per_second': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
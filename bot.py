@@ -1,48 +1,83 @@
-import os
 import discord
 from discord.ext import commands
 from utils.config import load_config
+from utils.tracing import tracer, TracedContext
 
-async def main():
-    config = load_config()
-    
+# Load cogs
+INITIAL_EXTENSIONS = [
+    'cogs.commands',
+    'cogs.queue',
+    'cogs.ui',
+    'cogs.diagnostics'
+]
+
+def create_bot(config, shard_ids=None, shard_count=None):
+    """Build the bot; sharded when SHARDING_ENABLED is set or a cluster worker passes its shards"""
     intents = discord.Intents.default()
     intents.guilds = True
     intents.voice_states = True
     intents.messages = True
     intents.message_content = True
     
-    bot = commands.Bot(
-        command_prefix='!',
-        intents=intents,
-        help_command=None
-    )
+    if shard_ids is not None or config.get('SHARDING_ENABLED'):
+        bot = commands.AutoShardedBot(
+            command_prefix='!',
+            intents=intents,
+            help_command=None,
+            shard_ids=shard_ids,
+            shard_count=shard_count
+        )
+    else:
+        bot = commands.Bot(
+            command_prefix='!',
+            intents=intents,
+            help_command=None
+        )
     
     bot.config = config
     
-    # Load cogs
-    initial_extensions = [
-        'cogs.commands',
-        'cogs.ui'
-    ]
+    # Every command runs inside a tracing span; they are only recorded while tracing is enabled
+    if config.get('TRACING_ENABLED'):
+        tracer.configure(config['TRACE_FILE'], config.get('TRACE_MIN_MS', 0) / 1000)
+    bot.before_invoke(tracer.before_invoke)
+    bot.after_invoke(tracer.after_invoke)
     
-    for extension in initial_extensions:
-        try:
-            await bot.load_extension(extension)
-            print(f"Loaded extension: {extension}")
-        except Exception as e:
-            print(f"Failed to load extension {extension}: {e}")
+    @bot.event
+    async def on_message(message):
+        if message.author.bot:
+            return
+        ctx = await bot.get_context(message, cls=TracedContext)
+        await bot.invoke(ctx)
     
     @bot.event
     async def on_ready():
         print(f'{bot.user} has connected to Discord!')
+        if bot.shard_count:
+            print(f"Shards: {sorted(bot.shards)} of {bot.shard_count}")
         print("Loaded commands:")
         for command in bot.commands:
             print(f"  !{command.name}")
         print(f"Total commands: {len(bot.commands)}")
     
-    await bot.start(config['DISCORD_TOKEN'])
+    return bot
+
+async def load_extensions(bot):
+    for extension in INITIAL_EXTENSIONS:
+        try:
+            await bot.load_extension(extension)
+            print(f"Loaded extension: {extension}")
+        except Exception as e:
+            print(f"Failed to load extension {extension}: {e}")
+
+async def main(shard_ids=None, shard_count=None):
+    config = load_config()
+    bot = create_bot(config, shard_ids, shard_count)
+    
+    # Entering the bot sets up its event loop before the cogs' cog_load hooks run
+    async with bot:
+        await load_extensions(bot)
+        await bot.start(config['DISCORD_TOKEN'])
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,46 +1,209 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from utils.commands import CommandManager
-from utils.music_player import MusicPlayer
+from utils.player_manager import PlayerManager
+from utils.prefetcher import Prefetcher
 from utils.api_clients import APIClients
-from utils.ytdl_source import YTDLSource
+from utils.ytdl_source import YTDLSource, PrimedSource, stream_cache, set_extractor_pool, set_audio_cache, create_audio_source, can_passthrough, audio_mode
+from utils.track import Track, format_duration, parse_duration
+from utils.playlist_store import PlaylistStore
+from utils.audio_cache import AudioCache
+from utils.extractor_pool import ExtractorPool, extract_job
+from utils.audio_node import AudioNodePool
+from utils.stream_profile import AdaptiveStreaming, BUFFER_SIZES
+from utils.net_probe import probe, ProbeHistory, format_ms, format_rate
+from utils.metrics import metrics, MetricsServer
+from utils.tracing import tracer, traced
 import asyncio
-import random
-import json
-import os
+import math
+import time
 
 class Commands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config = bot.config
-        self.player = MusicPlayer()
+        self.players = PlayerManager(self.config.get('PLAYER_IDLE_TIMEOUT', 600))
+        stream_cache.margin = self.config.get('STREAM_CACHE_MARGIN', 300)
+        self.extractor = ExtractorPool.from_config(self.config)
+        set_extractor_pool(self.extractor)
+        self.audio_cache = None
+        if self.config.get('AUDIO_CACHE_ENABLED'):
+            self.audio_cache = AudioCache(
+                self.config['AUDIO_CACHE_DIR'],
+                max_bytes=self.config.get('AUDIO_CACHE_MAX_MB', 1024) * 1024 * 1024,
+                min_plays=self.config.get('AUDIO_CACHE_MIN_PLAYS', 3),
+                max_file_bytes=self.config.get('AUDIO_CACHE_MAX_FILE_MB', 100) * 1024 * 1024
+            )
+        self.prefetcher = Prefetcher(
+            self.prefetch_track,
+            depth=self.config.get('PREFETCH_DEPTH', 2),
+            build_source=self.build_source if self.config.get('PREFETCH_WARM_FFMPEG') else None
+        )
+        # FFmpeg and Opus encoding run on separate audio node processes when any are configured
+        self.audio_nodes = AudioNodePool.from_config(self.config)
+        # Per-guild bitrate and FFmpeg input settings, adjusted while tracks play
+        self.streaming = AdaptiveStreaming.from_config(self.config)
+        # Recent !diag results per guild
+        self.probe_history = ProbeHistory(self.config.get('DIAG_HISTORY', 10))
         self.api = APIClients(self.config)
-        self.cmd_manager = CommandManager()
-        self.playlists = {}
+        self.cmd_manager = CommandManager(bot)
+        self.playlist_store = PlaylistStore(
+            self.config.get('PLAYLIST_DB', 'playlists.db'),
+            legacy_json=self.config.get('PLAYLIST_LEGACY_JSON', 'playlists.json')
+        )
         self.disconnect_tasks = {}
-        self.load_playlists()
+        self.metrics_server = None
+        if self.config.get('METRICS_PORT'):
+            self.metrics_server = MetricsServer(
+                metrics,
+                host=self.config.get('METRICS_HOST', '127.0.0.1'),
+                port=self.config['METRICS_PORT']
+            )
+        self.register_metrics()
         print("Commands cog initialized!")
     
-    def load_playlists(self):
-        if os.path.exists("playlists.json"):
-            with open("playlists.json", "r") as f:
-                self.playlists = json.load(f)
+    async def cog_load(self):
+        await self.api.start()
+        await self.playlist_store.open()
+        if self.audio_cache:
+            await self.bot.loop.run_in_executor(None, self.audio_cache.scan)
+            set_audio_cache(self.audio_cache)
+        if self.metrics_server:
+            await self.metrics_server.start()
+        self.evict_idle_players.start()
+        self.adapt_streams.change_interval(seconds=self.config.get('ADAPTIVE_INTERVAL', 10))
+        self.adapt_streams.start()
+    
+    async def cog_unload(self):
+        self.evict_idle_players.cancel()
+        self.adapt_streams.cancel()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.api.close()
+        await self.playlist_store.close()
+        set_extractor_pool(None)
+        set_audio_cache(None)
+        if self.audio_cache:
+            self.audio_cache.close()
+        self.extractor.shutdown()
+    
+    def register_metrics(self):
+        metrics.describe('search_seconds', "YouTube Data API search latency")
+        metrics.describe('resolve_seconds', "yt-dlp extraction latency for tracks about to play")
+        metrics.describe('prefetch_seconds', "yt-dlp extraction latency for prefetched tracks")
+        metrics.describe('ffmpeg_spawn_seconds', "Time to start FFmpeg for a track")
+        metrics.describe('first_packet_seconds', "Time from FFmpeg start to its first audio frame")
+        metrics.describe('transition_seconds', "Time from play_next to handing the source to the voice client")
+        metrics.describe('time_to_first_audio_seconds', "Time from a play request or track change to the first audio frame")
+        metrics.describe('probe_dns_seconds', "!diag DNS lookup time for the stream host")
+        metrics.describe('probe_tls_seconds', "!diag TLS handshake time with the stream host")
+        metrics.describe('probe_ttfb_seconds', "!diag time from request to first response byte")
+        metrics.gauge('active_players', lambda: len(self.players))
+        metrics.gauge('extractor_pending', lambda: self.extractor.stats()['pending'])
+        metrics.gauge('stream_cache_size', lambda: stream_cache.stats()['size'])
+        if self.audio_nodes:
+            metrics.gauge('audio_node_streams', lambda: self.audio_nodes.stats()['streams'])
+    
+    async def resolve_track(self, track, background=False, guild_id=None):
+        return await YTDLSource.resolve_track(
+            track,
+            loop=self.bot.loop,
+            ytdl_options=self.config['YTDL_OPTIONS'],
+            background=background,
+            guild_id=guild_id
+        )
+    
+    async def prefetch_track(self, track):
+        return await self.resolve_track(track, background=True)
+    
+    def stream_profile(self, guild_id):
+        """The guild's StreamProfile: bitrate, Opus bandwidth and FFmpeg input options for its tracks"""
+        return self.streaming.profile(guild_id)
+    
+    async def build_source(self, guild_id, info, position=0.0):
+        player = self.get_player(guild_id)
+        profile = self.stream_profile(guild_id)
+        with metrics.timer('ffmpeg_spawn_seconds', guild_id), tracer.span('ffmpeg.spawn', track=info.get('id'), position=position):
+            # Nodes only stream http(s) URLs, so cached files play in-process
+            source = await self.create_node_source(info, player.volume, position, profile) if self.audio_nodes and not info.get('local') else None
+            if source is None:
+                source = create_audio_source(
+                    info,
+                    player.volume,
+                    self.config.get('AUDIO_PASSTHROUGH', True),
+                    self.config.get('VOLUME_MODE', 'ffmpeg'),
+                    position,
+                    profile.bitrate,
+                    profile.before_options(info.get('local', False)),
+                    profile.cutoff
+                )
+        source.spawned_at = time.perf_counter()
+        return source
+    
+    async def create_node_source(self, info, volume, position, profile):
+        """Start the track on an audio node, or return None so it plays in-process"""
+        try:
+            return await self.audio_nodes.create_source(
+                info,
+                volume,
+                self.config.get('AUDIO_PASSTHROUGH', True) and can_passthrough(info, 1.0, profile.bitrate),
+                profile.buffer,
+                position,
+                profile.bitrate,
+                profile.cutoff
+            )
+        except OSError as e:
+            print(f"No audio node available, playing in-process: {e}")
+            metrics.inc('audio_node_errors')
+            return None
+    
+    def download_track(self, url, options):
+        """Blocking yt-dlp download for the audio cache, which runs it on its own thread"""
+        return extract_job(url, options, True)
+    
+    def record_play(self, info):
+        """Count a play and start filling the audio cache once a track is popular enough"""
+        if not self.audio_cache or info.get('local') or not info.get('webpage_url'):
+            return
+        if self.audio_cache.record_play(info.get('id')):
+            self.bot.loop.create_task(
+                self.audio_cache.fill(info, self.download_track, self.config['YTDL_OPTIONS'])
+            )
+    
+    def schedule_prefetch(self, guild_id):
+        player = self.players.peek(guild_id)
+        if player:
+            self.prefetcher.schedule(guild_id, player.queue)
+    
+    def get_player(self, guild_id):
+        """Return the player for a guild, creating it on first use"""
+        return self.players.get(guild_id)
+    
+    def is_voice_connected(self, guild_id):
+        guild = self.bot.get_guild(guild_id)
+        return bool(guild and guild.voice_client and guild.voice_client.is_connected())
     
-    def save_playlists(self):
-        with open("playlists.json", "w") as f:
-            json.dump(self.playlists, f)
+    @tasks.loop(minutes=1)
+    async def evict_idle_players(self):
+        evicted = self.players.evict_idle(self.is_voice_connected)
+        if evicted:
+            metrics.retain_guilds(lambda guild_id: guild_id in self.players)
+            self.streaming.retain(lambda guild_id: guild_id in self.players)
+            self.probe_history.retain(lambda guild_id: guild_id in self.players)
+            print(f"Freed {evicted} idle player(s), {len(self.players)} active")
     
     async def send_control_panel(self, ctx):
         """Send or update the control panel"""
+        player = self.get_player(ctx.guild.id)
         ui_cog = self.bot.get_cog('UI')
         if ui_cog:
-            await ui_cog.show_control_panel(ctx, self.player)
+            await ui_cog.show_control_panel(ctx, player)
     
     async def update_control_panel(self, guild_id):
         """Update the control panel for a guild"""
         ui_cog = self.bot.get_cog('UI')
         if ui_cog and ui_cog.auto_show:
-            await ui_cog.update_control_panel(guild_id, self.player)
+            await ui_cog.update_control_panel(guild_id, self.get_player(guild_id))
             
     async def auto_disconnect(self, ctx, seconds):
         """Automatically disconnect from voice channel after specified seconds if queue is empty"""
@@ -54,11 +217,12 @@ class Commands(commands.Cog):
         try:
             # Wait for the specified time
             await asyncio.sleep(seconds)
+            player = self.get_player(ctx.guild.id)
             
             # Check if we should still disconnect
-            if ctx.voice_client and ctx.voice_client.is_connected() and not self.player.queue and not ctx.voice_client.is_playing():
+            if ctx.voice_client and ctx.voice_client.is_connected() and not player.queue and not ctx.voice_client.is_playing():
                 await ctx.voice_client.disconnect()
-                self.player.current = None
+                player.current = None
                 await ctx.send("⏱️ Auto-disconnected due to inactivity", delete_after=5.0)
                 await self.update_control_panel(ctx.guild.id)
         except asyncio.CancelledError:
@@ -79,9 +243,11 @@ class Commands(commands.Cog):
         if ctx.voice_client:
             if ctx.voice_client.channel == channel:
                 return await ctx.send("❌ I'm already in this voice channel!", delete_after=5.0)
-            await ctx.voice_client.move_to(channel)
+            with tracer.span('discord.voice_move'):
+                await ctx.voice_client.move_to(channel)
         else:
-            await channel.connect()
+            with tracer.span('discord.voice_connect'):
+                await channel.connect()
         
         # Cancel any auto-disconnect task when manually joining
         if ctx.guild.id in self.disconnect_tasks:
@@ -92,18 +258,22 @@ class Commands(commands.Cog):
     
     @commands.command(name='leave', aliases=['l', 'disconnect'])
     async def leave(self, ctx):
+        player = self.get_player(ctx.guild.id)
         if not ctx.voice_client:
             return await ctx.send("❌ I'm not connected to a voice channel", delete_after=5.0)
         
         await ctx.voice_client.disconnect()
-        self.player.clear_queue()
-        self.player.current = None
+        player.clear_queue()
+        self.prefetcher.cancel(ctx.guild.id)
+        player.current = None
         
         await ctx.send("👋 Disconnected from voice channel", delete_after=5.0)
         await self.update_control_panel(ctx.guild.id)
     
     @commands.command(name='play', aliases=['p'])
     async def play(self, ctx, *, query):
+        requested_at = time.perf_counter()
+        player = self.get_player(ctx.guild.id)
         if not ctx.voice_client:
             await self.join(ctx)
         
@@ -112,15 +282,16 @@ class Commands(commands.Cog):
             self.disconnect_tasks[ctx.guild.id].cancel()
         
         # Send search message outside the typing context and set it to delete after 5 seconds
-        if "youtube.com/watch" in query or "youtu.be/" in query:
+        is_url = "youtube.com/" in query or "youtu.be/" in query
+        if is_url:
             url = query
             status_msg = await ctx.send("🎵 Processing YouTube URL...", delete_after=5.0)
         else:
             status_msg = await ctx.send("🔍 Searching on YouTube...", delete_after=5.0)
             
         async with ctx.typing():
-            if not ("youtube.com/watch" in query or "youtu.be/" in query):
-                url = await self.api.search_youtube(query)
+            if not is_url:
+                url = await self.api.search_youtube(query, guild_id=ctx.guild.id)
                 
                 if not url:
                     url = f"ytsearch:{query}"
@@ -130,67 +301,229 @@ class Commands(commands.Cog):
             
             if "playlist" in url or "list=" in url:
                 await ctx.send("🔄 Processing playlist...", delete_after=5.0)
-                entries = await YTDLSource.from_url(
-                    url, 
-                    loop=self.bot.loop, 
-                    stream=True, 
-                    requester=ctx.author.name,
-                    ytdl_options=self.config['YTDL_OPTIONS']
-                )
+                added = 0
+                started = False
+                try:
+                    async for batch in YTDLSource.iter_playlist(
+                        url,
+                        loop=self.bot.loop,
+                        requester=ctx.author.name,
+                        ytdl_options=self.config['YTDL_OPTIONS']
+                    ):
+                        player.queue.extend(batch)
+                        added += len(batch)
+                        # Start the first track right away and keep ingesting behind it
+                        if batch and not started and not ctx.voice_client.is_playing():
+                            started = True
+                            self.bot.loop.create_task(self.play_next(ctx, requested_at))
+                except Exception as e:
+                    print(f"Playlist error: {e}")
                 
-                if isinstance(entries, list):
-                    self.player.queue.extend(entries)
-                    await ctx.send(f"✅ Added {len(entries)} songs to the queue", delete_after=5.0)
-                    if not ctx.voice_client.is_playing():
-                        await self.play_next(ctx)
+                if added:
+                    await ctx.send(f"✅ Added {added} songs to the queue", delete_after=5.0)
+                    if not started:
+                        self.schedule_prefetch(ctx.guild.id)
                 else:
-                        await ctx.send("❌ Could not process playlist", delete_after=5.0)
+                    await ctx.send("❌ Could not process playlist", delete_after=5.0)
             else:
                 try:
                     await asyncio.sleep(0.5)
                     
-                    song = await YTDLSource.from_url(
+                    info = await YTDLSource.resolve(
                         url, 
                         loop=self.bot.loop, 
-                        stream=True, 
                         requester=ctx.author.name,
-                        ytdl_options=self.config['YTDL_OPTIONS']
+                        ytdl_options=self.config['YTDL_OPTIONS'],
+                        guild_id=ctx.guild.id
                     )
-                    self.player.add_to_queue(song)
+                    song = Track.from_info(info, ctx.author.name)
+                    player.add_to_queue(song)
                     
                     if not ctx.voice_client.is_playing():
-                        await self.play_next(ctx)
+                        await self.play_next(ctx, requested_at)
                     else:
+                        # Resolve it (and warm FFmpeg if enabled) before the current song ends
+                        self.schedule_prefetch(ctx.guild.id)
                         await ctx.send(f'✅ Added to queue: {song.title}', delete_after=5.0)
                         
                 except Exception as e:
                     await ctx.send(f"❌ Error playing song: {e}", delete_after=5.0)
                     print(f"Play error: {e}")
     
-    async def play_next(self, ctx):
-        if self.player.queue:
-            next_song = self.player.queue.pop(0)
+    def watch_first_packet(self, guild_id, source, requested_at):
+        """Record first-audio timings when the audio thread reads the first frame"""
+        spawned_at = getattr(source.original, 'spawned_at', None)
+        
+        def on_first_packet():
+            now = time.perf_counter()
+            if spawned_at is not None and spawned_at >= requested_at:
+                # Warm sources were started before the request, so their spawn time says nothing
+                metrics.observe('first_packet_seconds', now - spawned_at, guild_id)
+            metrics.observe('time_to_first_audio_seconds', now - requested_at, guild_id)
+        
+        source.on_first_packet = on_first_packet
+    
+    async def playable_info(self, info, guild_id):
+        """The playing track's info with a usable stream URL; the cached one is reused while it is fresh"""
+        if info.get('local') or not info.get('webpage_url'):
+            return info
+        return await YTDLSource.resolve(
+            info['webpage_url'],
+            loop=self.bot.loop,
+            requester=info.get('requester'),
+            ytdl_options=self.config['YTDL_OPTIONS'],
+            guild_id=guild_id
+        )
+    
+    @traced('player.respawn')
+    async def respawn(self, guild_id, position=None):
+        """Restart FFmpeg for the playing track and swap it in without ending the track.
+        
+        With no position the new process starts where playback is now and
+        skips ahead until it catches up, so the listener hears no jump. Returns
+        False if nothing could be swapped in (the track changed, or the
+        position is past its end).
+        """
+        player = self.get_player(guild_id)
+        current = player.current
+        if current is None:
+            return False
+        current.respawns += 1
+        generation = current.respawns
+        started = time.perf_counter()
+        
+        target = current.position if position is None else position
+        info = await self.playable_info(current.data, guild_id)
+        source = PrimedSource(await self.build_source(guild_id, info, target))
+        behind = None if position is not None else (lambda at: current.position > at)
+        target = await self.bot.loop.run_in_executor(None, source.prime, target, behind)
+        
+        if player.current is not current or current.respawns != generation or source.first is None or not self.ensure_encoder(guild_id, source):
+            # Skipped, replaced by a later respawn, nothing left to play, or PCM that can't be encoded
+            source.cleanup()
+            return False
+        await self.bot.loop.run_in_executor(None, current.swap, source, target)
+        metrics.observe('respawn_seconds', time.perf_counter() - started, guild_id)
+        return True
+    
+    def ensure_encoder(self, guild_id, source):
+        """Give the voice client an Opus encoder before a track that started as Opus switches to PCM.
+        
+        discord.py only creates the encoder in play() when the first source is
+        PCM; without one the audio thread fails on the first PCM frame.
+        """
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild and guild.voice_client
+        if source.is_opus() or not voice_client or getattr(voice_client, 'encoder', None):
+            return True
+        try:
+            voice_client.encoder = discord.opus.Encoder(**self.stream_profile(guild_id).encoder_settings())
+        except discord.opus.OpusNotLoaded:
+            print("Opus is not loaded, so this track can only be played as an Opus copy")
+            return False
+        return True
+    
+    def apply_volume(self, guild_id, volume):
+        """Set a guild's volume, restarting FFmpeg at the current position when the running process can't apply it"""
+        player = self.get_player(guild_id)
+        player.set_volume(volume)
+        current = player.current
+        if current and not current.remote and (current.passthrough or self.config.get('VOLUME_MODE', 'ffmpeg') == 'ffmpeg'):
+            # Opus copies can't change volume, and FFmpeg's volume filter is cheaper than scaling in Python
+            self.bot.loop.create_task(self.respawn(guild_id))
+    
+    def apply_profile(self, guild_id):
+        """Bring the playing track in line with a changed stream profile.
+        
+        PCM tracks are encoded by the voice client, whose encoder can change
+        bitrate and bandwidth between frames. Opus from FFmpeg or an audio node
+        was encoded at the old bitrate, so it is restarted at the current
+        position, unless it is a passthrough copy that can stay one. Buffer
+        changes apply from the next FFmpeg start.
+        """
+        current = self.get_player(guild_id).current
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild and guild.voice_client
+        if not current or not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            return
+        profile = self.stream_profile(guild_id)
+        if current.is_opus():
+            if current.mode == 'copy' and can_passthrough(current.data, current.volume, profile.bitrate):
+                return
+            self.bot.loop.create_task(self.respawn(guild_id))
+        elif getattr(voice_client, 'encoder', None):
+            voice_client.encoder.set_bitrate(profile.bitrate)
+            voice_client.encoder.set_bandwidth(profile.bandwidth)
+            voice_client.encoder.set_expected_packet_loss_percent(profile.packet_loss)
+    
+    @tasks.loop(seconds=10)
+    async def adapt_streams(self):
+        """Step each playing guild's profile down or up from the last window's latency, stalls and late frames"""
+        for guild_id, player in list(self.players.players.items()):
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild and guild.voice_client
+            if not player.current or not voice_client or not voice_client.is_playing():
+                continue
+            change = self.streaming.evaluate(guild_id, getattr(voice_client, 'latency', None))
+            if change:
+                print(f"Stream profile for guild {guild_id}: {change}")
+                metrics.inc('stream_adjustments', guild_id)
+                self.apply_profile(guild_id)
+    
+    @traced('player.play_next')
+    async def play_next(self, ctx, requested_at=None):
+        """Start the next queued track; requested_at is when the user asked, if a command triggered this"""
+        started = time.perf_counter()
+        requested_at = requested_at or started
+        player = self.get_player(ctx.guild.id)
+        if player.queue:
+            track = player.queue.popleft()
             
-            if isinstance(next_song, dict):
-                ffmpeg_options = {
-                    'options': '-vn -b:a 128k -ar 44100',
-                    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -threads 2'
-                }
-                source = discord.FFmpegPCMAudio(next_song['url'], **ffmpeg_options)
-                self.player.current = YTDLSource(source, data=next_song, volume=self.player.volume)
+            warm = self.prefetcher.take_warm(ctx.guild.id, track)
+            profile = self.stream_profile(ctx.guild.id)
+            mode = audio_mode(warm[0], player.volume, self.config.get('AUDIO_PASSTHROUGH', True), profile.bitrate) if warm else None
+            if warm and not getattr(warm[1], 'remote', False) and (
+                getattr(warm[1], 'mode', None) != mode
+                or mode == 'opus' and (warm[1].filter_volume, warm[1].bitrate) != (player.volume, profile.bitrate)
+            ):
+                # Volume or quality changed since the source was warmed, so FFmpeg's output no longer fits
+                warm[1].cleanup()
+                warm = None
+            if warm:
+                info, source = warm
             else:
-                self.player.current = next_song
-                self.player.current.volume = self.player.volume
+                try:
+                    info = await self.resolve_track(track, guild_id=ctx.guild.id)
+                except Exception as e:
+                    print(f"Could not resolve {track.title}: {e}")
+                    metrics.inc('tracks_failed', ctx.guild.id)
+                    return await self.play_next(ctx, requested_at)
+                source = await self.build_source(ctx.guild.id, info)
+            
+            player.current = YTDLSource(
+                source,
+                data=info,
+                volume=player.volume,
+                volume_mode=self.config.get('VOLUME_MODE', 'ffmpeg')
+            )
+            
+            player.current.stats = self.streaming.stats_for(ctx.guild.id)
             
+            self.watch_first_packet(ctx.guild.id, player.current, requested_at)
             ctx.voice_client.play(
-                self.player.current, 
-                after=lambda e: self.bot.loop.create_task(self.play_next(ctx))
+                player.current, 
+                after=lambda e: asyncio.run_coroutine_threadsafe(self.play_next(ctx), self.bot.loop),
+                **profile.encoder_settings()
             )
+            metrics.observe('transition_seconds', time.perf_counter() - started, ctx.guild.id)
+            metrics.inc('tracks_started', ctx.guild.id)
+            self.record_play(player.current.data)
+            self.schedule_prefetch(ctx.guild.id)
             
             # Only update the control panel, don't send now playing message
             await self.update_control_panel(ctx.guild.id)
         else:
-            self.player.current = None
+            player.current = None
             # Update the control panel to show empty state
             await self.update_control_panel(ctx.guild.id)
             # Start auto-disconnect timer when queue is empty
@@ -206,6 +539,37 @@ class Commands(commands.Cog):
         else:
             await ctx.send('❌ No song is currently playing', delete_after=5.0)
     
+    @commands.command(name='seek')
+    async def seek(self, ctx, time_str: str):
+        """Jump to a time in the current song: 1:30, 90, +15 or -10"""
+        player = self.get_player(ctx.guild.id)
+        current = player.current
+        if not current or not ctx.voice_client or not (ctx.voice_client.is_playing() or ctx.voice_client.is_paused()):
+            return await ctx.send('❌ No song is currently playing', delete_after=5.0)
+        if not current.duration:
+            return await ctx.send('❌ Live streams cannot be seeked', delete_after=5.0)
+        
+        try:
+            offset = parse_duration(time_str.lstrip('+-'))
+        except ValueError:
+            return await ctx.send('❌ Invalid time. Use 1:30, 90, +15 or -10', delete_after=5.0)
+        if time_str.startswith('+'):
+            position = current.position + offset
+        elif time_str.startswith('-'):
+            position = current.position - offset
+        else:
+            position = offset
+        position = max(position, 0.0)
+        if position >= current.duration:
+            return await ctx.send(f"❌ The song is only {format_duration(current.duration)} long", delete_after=5.0)
+        
+        if current.remote:
+            # The audio node restarts FFmpeg itself
+            current.original.seek(position)
+        elif not await self.respawn(ctx.guild.id, position):
+            return await ctx.send('❌ Could not seek in this song', delete_after=5.0)
+        await ctx.send(f"⏩ Seeked to {format_duration(position)}", delete_after=5.0)
+    
     @commands.command(name='pause')
     async def pause(self, ctx):
         if ctx.voice_client and ctx.voice_client.is_playing():
@@ -224,52 +588,62 @@ class Commands(commands.Cog):
     
     @commands.command(name='stop')
     async def stop(self, ctx):
+        player = self.get_player(ctx.guild.id)
         if ctx.voice_client and ctx.voice_client.is_playing():
+            player.clear_queue()
+            self.prefetcher.cancel(ctx.guild.id)
             ctx.voice_client.stop()
-            self.player.clear_queue()
             await ctx.send('⏹️ Stopped playback and cleared queue', delete_after=5.0)
         else:
             await ctx.send('❌ No song is currently playing', delete_after=5.0)
     
     @commands.command(name='clear')
     async def clear(self, ctx):
-        if not self.player.queue:
+        player = self.get_player(ctx.guild.id)
+        if not player.queue:
             return await ctx.send("❌ The queue is already empty", delete_after=5.0)
         
-        self.player.clear_queue()
+        player.clear_queue()
+        self.prefetcher.cancel(ctx.guild.id)
         await ctx.send("✅ Queue cleared", delete_after=5.0)
     
     @commands.command(name='remove', aliases=['rm', 'delete'])
     async def remove(self, ctx, index: int):
-        if not self.player.queue:
+        player = self.get_player(ctx.guild.id)
+        if not player.queue:
             return await ctx.send("❌ The queue is empty", delete_after=5.0)
         
-        if index < 1 or index > len(self.player.queue):
-            return await ctx.send(f"❌ Invalid song number. Please enter a number between 1 and {len(self.player.queue)}", delete_after=5.0)
+        if index < 1 or index > len(player.queue):
+            return await ctx.send(f"❌ Invalid song number. Please enter a number between 1 and {len(player.queue)}", delete_after=5.0)
         
-        removed = self.player.queue.pop(index - 1)
-        await ctx.send(f"✅ Removed **{removed['title'] if isinstance(removed, dict) else removed.title}** from the queue", delete_after=5.0)
+        removed = player.queue.remove_at(index - 1)
+        if index <= self.prefetcher.depth:
+            self.schedule_prefetch(ctx.guild.id)
+        await ctx.send(f"✅ Removed **{removed.title}** from the queue", delete_after=5.0)
     
     @commands.command(name='shuffle')
     async def shuffle(self, ctx):
-        if not self.player.queue:
+        player = self.get_player(ctx.guild.id)
+        if not player.queue:
             return await ctx.send("❌ The queue is empty", delete_after=5.0)
         
-        random.shuffle(self.player.queue)
+        player.queue.shuffle()
+        self.schedule_prefetch(ctx.guild.id)
         await ctx.send("🔀 Queue shuffled", delete_after=5.0)
     
     @commands.command(name='now', aliases=['np', 'current'])
     async def now_playing(self, ctx):
-        if self.player.current:
+        player = self.get_player(ctx.guild.id)
+        if player.current:
             embed = discord.Embed(
                 title="Now Playing",
-                description=f"**{self.player.current.title}**",
+                description=f"**{player.current.title}**",
                 color=discord.Color.blue()
             )
-            embed.add_field(name="Duration", value=f"{self.player.current.duration // 60}:{self.player.current.duration % 60:02d}")
-            embed.add_field(name="Requested by", value=self.player.current.requester)
-            embed.set_thumbnail(url=self.player.current.thumbnail)
-            embed.set_footer(text=f"Volume: {int(self.player.volume * 100)}% | Loop: {'On' if self.player.loop else 'Off'}")
+            embed.add_field(name="Position", value=f"{format_duration(player.current.position)} / {format_duration(player.current.duration)}")
+            embed.add_field(name="Requested by", value=player.current.requester)
+            embed.set_thumbnail(url=player.current.thumbnail)
+            embed.set_footer(text=f"Volume: {int(player.volume * 100)}% | Loop: {'On' if player.loop else 'Off'}")
             await ctx.send(embed=embed, delete_after=5.0)
         else:
             await ctx.send("❌ No song is currently playing", delete_after=5.0)
@@ -280,59 +654,61 @@ class Commands(commands.Cog):
         if not 0 <= vol <= 200:
             return await ctx.send("❌ Volume must be between 0 and 200", delete_after=5.0)
         
-        self.player.set_volume(vol / 100)
+        self.apply_volume(ctx.guild.id, vol / 100)
         await ctx.send(f"🔊 Volume set to {vol}%", delete_after=5.0)
     
     @commands.command(name='loop')
     async def loop(self, ctx):
-        self.player.loop = not self.player.loop
-        status = "enabled" if self.player.loop else "disabled"
+        player = self.get_player(ctx.guild.id)
+        player.loop = not player.loop
+        status = "enabled" if player.loop else "disabled"
         await ctx.send(f"🔁 Loop mode {status}", delete_after=5.0)
     
     @commands.command(name='playlist', aliases=['pl'])
     async def playlist(self, ctx, action: str, *, name: str = None):
+        player = self.get_player(ctx.guild.id)
         if action == "save":
             if not name:
                 return await ctx.send("❌ Please provide a playlist name", delete_after=5.0)
             
-            if not self.player.queue:
+            if not player.queue:
                 return await ctx.send("❌ The queue is empty", delete_after=5.0)
             
-            self.playlists[name] = {
-                "songs": self.player.queue.copy(),
-                "created_by": ctx.author.name
-            }
-            self.save_playlists()
-            await ctx.send(f"✅ Playlist '{name}' saved with {len(self.player.queue)} songs", delete_after=5.0)
+            saved = await self.playlist_store.save(name, player.queue.copy(), ctx.author.name)
+            await ctx.send(f"✅ Playlist '{name}' saved with {saved} songs", delete_after=5.0)
         
         elif action == "load":
             if not name:
                 return await ctx.send("❌ Please provide a playlist name", delete_after=5.0)
             
-            if name not in self.playlists:
+            tracks = await self.playlist_store.load(name, requester=ctx.author.name)
+            if tracks is None:
                 return await ctx.send(f"❌ Playlist '{name}' not found", delete_after=5.0)
             
-            playlist = self.playlists[name]
-            self.player.queue.extend(playlist["songs"])
-            await ctx.send(f"✅ Loaded playlist '{name}' with {len(playlist['songs'])} songs", delete_after=5.0)
+            player.queue.extend(tracks)
+            await ctx.send(f"✅ Loaded playlist '{name}' with {len(tracks)} songs", delete_after=5.0)
             
             if not ctx.voice_client.is_playing():
                 await self.play_next(ctx)
+            else:
+                self.schedule_prefetch(ctx.guild.id)
         
         elif action == "list":
-            if not self.playlists:
+            playlists = await self.playlist_store.list()
+            if not playlists:
                 return await ctx.send("❌ No saved playlists", delete_after=5.0)
             
             embed = discord.Embed(
                 title="Saved Playlists",
-                description=f"Total playlists: {len(self.playlists)}",
+                description=f"Total playlists: {len(playlists)}",
                 color=discord.Color.blue()
             )
             
-            for name, data in self.playlists.items():
+            # Embeds are limited to 25 fields
+            for name, track_count, created_by in playlists[:25]:
                 embed.add_field(
                     name=name,
-                    value=f"{len(data['songs'])} songs | Created by {data['created_by']}",
+                    value=f"{track_count} songs | Created by {created_by}",
                     inline=False
                 )
             
@@ -343,8 +719,9 @@ class Commands(commands.Cog):
     
     @commands.command(name='stats')
     async def stats(self, ctx):
-        total_songs = len(self.player.queue)
-        if self.player.current:
+        player = self.get_player(ctx.guild.id)
+        total_songs = len(player.queue)
+        if player.current:
             total_songs += 1
         
         embed = discord.Embed(
@@ -352,11 +729,68 @@ class Commands(commands.Cog):
             color=discord.Color.blue()
         )
         embed.add_field(name="Songs in Queue", value=str(total_songs), inline=True)
-        embed.add_field(name="Volume", value=f"{int(self.player.volume * 100)}%", inline=True)
-        embed.add_field(name="Loop Mode", value="On" if self.player.loop else "Off", inline=True)
-        embed.add_field(name="Saved Playlists", value=str(len(self.playlists)), inline=True)
+        embed.add_field(name="Volume", value=f"{int(player.volume * 100)}%", inline=True)
+        embed.add_field(name="Loop Mode", value="On" if player.loop else "Off", inline=True)
+        embed.add_field(name="Saved Playlists", value=str(await self.playlist_store.count()), inline=True)
         embed.add_field(name="Connected to VC", value="Yes" if ctx.voice_client else "No", inline=True)
         embed.add_field(name="Currently Playing", value="Yes" if ctx.voice_client and ctx.voice_client.is_playing() else "No", inline=True)
+        embed.add_field(name="Active Players", value=str(len(self.players)), inline=True)
+        cache_stats = self.api.search_cache.stats()
+        embed.add_field(
+            name="Search Cache",
+            value=f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['size']} queries)",
+            inline=True
+        )
+        stream_stats = stream_cache.stats()
+        embed.add_field(
+            name="Stream Cache",
+            value=f"{stream_stats['hits']} hits / {stream_stats['misses']} misses ({stream_stats['size']} tracks)",
+            inline=True
+        )
+        if self.audio_cache:
+            audio_stats = self.audio_cache.stats()
+            embed.add_field(
+                name="Audio Cache",
+                value=f"{audio_stats['files']} files, {audio_stats['bytes'] // (1024 * 1024)}/{audio_stats['max_bytes'] // (1024 * 1024)} MB, {audio_stats['hits']} hits",
+                inline=True
+            )
+        ui_cog = self.bot.get_cog('UI')
+        if ui_cog:
+            panel_stats = ui_cog.renderer.stats()
+            embed.add_field(
+                name="Panel Edits",
+                value=f"{panel_stats['edits']} sent, {panel_stats['suppressed']} suppressed",
+                inline=True
+            )
+        pool_stats = self.extractor.stats()
+        embed.add_field(
+            name="Extractor Pool",
+            value=f"{pool_stats['active']}/{pool_stats['workers']} busy, {pool_stats['pending']} waiting ({pool_stats['mode']})",
+            inline=True
+        )
+        embed.add_field(
+            name="Tracks Played",
+            value=f"{metrics.counter('tracks_started', ctx.guild.id)} here, {metrics.counter('tracks_started')} total, {metrics.counter('tracks_failed')} failed",
+            inline=True
+        )
+        embed.add_field(
+            name="Time to First Audio",
+            value=f"Here: {metrics.summary('time_to_first_audio_seconds', ctx.guild.id)}\nAll: {metrics.summary('time_to_first_audio_seconds')}",
+            inline=False
+        )
+        embed.add_field(
+            name="Pipeline Latency",
+            value=(
+                f"Search: {metrics.summary('search_seconds')}\n"
+                f"Resolve: {metrics.summary('resolve_seconds')}\n"
+                f"FFmpeg start: {metrics.summary('ffmpeg_spawn_seconds')}\n"
+                f"First packet: {metrics.summary('first_packet_seconds')}\n"
+                f"Track change: {metrics.summary('transition_seconds')}"
+            ),
+            inline=False
+        )
+        if self.metrics_server:
+            embed.set_footer(text=f"Prometheus metrics on port {self.metrics_server.port}")
         
         await ctx.send(embed=embed, delete_after=5.0)
     
@@ -376,25 +810,19 @@ class Commands(commands.Cog):
         quality = quality.lower()
         
         if quality == 'low':
-            bitrate = '64k'
-            ar = '22050'
+            bitrate = 64
         elif quality == 'medium':
-            bitrate = '128k'
-            ar = '44100'
+            bitrate = 128
         elif quality == 'high':
-            bitrate = '192k'
-            ar = '48000'
+            bitrate = 192
         else:
             return await ctx.send("❌ Invalid quality. Use: low, medium, or high", delete_after=5.0)
         
-        self.config['FFMPEG_OPTIONS']['options'] = f'-vn -b:a {bitrate} -ar {ar}'
+        # The adaptive controller may still lower it while playback struggles, but never raises it past this
+        self.stream_profile(ctx.guild.id).set_bitrate(bitrate)
+        self.apply_profile(ctx.guild.id)
         
-        if ctx.voice_client and ctx.voice_client.is_playing():
-            ctx.voice_client.stop()
-            if self.player.current:
-                ctx.voice_client.play(self.player.current)
-        
-        await ctx.send(f"🔊 Audio quality set to {quality} ({bitrate})", delete_after=5.0)
+        await ctx.send(f"🔊 Audio quality set to {quality} ({bitrate}k)", delete_after=5.0)
     
     @commands.command(name='optimize')
     async def optimize(self, ctx):
@@ -407,51 +835,114 @@ class Commands(commands.Cog):
             'fragment_retries': 10,
         })
         
-        self.config['FFMPEG_OPTIONS'] = {
-            'options': '-vn -b:a 128k -ar 44100',
-            'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -threads 2'
-        }
+        # Back to the default profile with automatic adjustment
+        self.streaming.reset(ctx.guild.id)
+        self.apply_profile(ctx.guild.id)
         
         await ctx.send("🔧 Streaming settings optimized!", delete_after=5.0)
     
     @commands.command(name='buffer')
     async def set_buffer(self, ctx, size: str):
         size = size.lower()
-        
-        if size == 'small':
-            buffer_size = '8K'
-        elif size == 'medium':
-            buffer_size = '16K'
-        elif size == 'large':
-            buffer_size = '32K'
-        else:
+        if size not in BUFFER_SIZES:
             return await ctx.send("❌ Invalid buffer size. Use: small, medium, or large", delete_after=5.0)
         
-        self.config['YTDL_OPTIONS']['buffer-size'] = buffer_size
+        # How far FFmpeg reads ahead of playback; applies from the next song or seek
+        self.stream_profile(ctx.guild.id).buffer = size
         await ctx.send(f"📊 Buffer size set to {size}", delete_after=5.0)
     
+    async def probe_target(self, guild_id):
+        """Stream URL of the playing track, which is the host FFmpeg actually reads from; None if nothing plays"""
+        current = self.get_player(guild_id).current
+        if current is None:
+            return None
+        info = current.data
+        if info.get('local'):
+            # Playing from the audio cache, so ask for the track's stream URL
+            if not info.get('webpage_url'):
+                return None
+            info = await YTDLSource.resolve(
+                info['webpage_url'],
+                loop=self.bot.loop,
+                requester=info.get('requester'),
+                ytdl_options=self.config['YTDL_OPTIONS'],
+                guild_id=guild_id
+            )
+        return info.get('url')
+    
+    def compare_probe(self, guild_id, result, field, formatter=format_ms):
+        value = getattr(result, field)
+        baseline = self.probe_history.baseline(guild_id, field, exclude=result)
+        if value is None or baseline is None:
+            return formatter(value)
+        return f"{formatter(value)} (usually {formatter(baseline)})"
+    
     @commands.command(name='diag')
     async def diagnostics(self, ctx):
-        import aiohttp
-        import time
-        
         await ctx.send("🔍 Running network diagnostics...", delete_after=5.0)
         
-        start_time = time.time()
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get('https://www.youtube.com', timeout=10) as response:
-                    youtube_time = time.time() - start_time
-                    await ctx.send(f"✅ YouTube response time: {youtube_time:.2f}s", delete_after=5.0)
-        except:
-            await ctx.send("❌ YouTube connection failed", delete_after=5.0)
+        async with ctx.typing():
+            try:
+                url = await self.probe_target(ctx.guild.id)
+            except Exception as e:
+                print(f"Diagnostics could not resolve the current track: {e}")
+                url = None
+            target = "current stream host" if url else "YouTube (nothing playing)"
+            result = await probe(
+                url or 'https://www.youtube.com/',
+                max_bytes=self.config.get('DIAG_PROBE_MB', 2) * 1024 * 1024,
+                max_seconds=self.config.get('DIAG_PROBE_SECONDS', 3)
+            )
+        self.probe_history.add(ctx.guild.id, result)
+        for field in ('dns', 'tls', 'ttfb'):
+            if getattr(result, field) is not None:
+                metrics.observe(f'probe_{field}_seconds', getattr(result, field), ctx.guild.id)
         
-        if ctx.guild:
-            region = ctx.guild.region
-            await ctx.send(f"🌍 Server region: {region}", delete_after=5.0)
+        embed = discord.Embed(
+            title="🔍 Network Diagnostics",
+            description=f"{target}: `{result.host}`" + (f" ({result.address})" if result.address else ""),
+            color=discord.Color.blue() if result.ok else discord.Color.red()
+        )
+        embed.add_field(name="DNS", value=self.compare_probe(ctx.guild.id, result, 'dns'), inline=True)
+        embed.add_field(name="TCP Connect", value=self.compare_probe(ctx.guild.id, result, 'connect'), inline=True)
+        embed.add_field(name="TLS Handshake", value=self.compare_probe(ctx.guild.id, result, 'tls'), inline=True)
+        embed.add_field(name="First Byte", value=self.compare_probe(ctx.guild.id, result, 'ttfb'), inline=True)
+        embed.add_field(
+            name="Throughput",
+            value=f"{self.compare_probe(ctx.guild.id, result, 'throughput', format_rate)}\n{result.bytes // 1024} KB in {format_ms(result.transfer)}",
+            inline=True
+        )
+        if not result.ok:
+            embed.add_field(name="Error", value=result.error[:1000], inline=False)
+        
+        latencies = []
+        voice_client = ctx.voice_client
+        for name, value in (
+            ("Voice", getattr(voice_client, 'latency', None)),
+            ("Voice average", getattr(voice_client, 'average_latency', None)),
+            ("Gateway", self.bot.latency),
+        ):
+            if value is not None and math.isfinite(value):
+                latencies.append(f"{name}: {value * 1000:.0f} ms")
+        embed.add_field(name="Websocket Latency", value="\n".join(latencies) or "Not connected", inline=True)
+        
+        profile = self.stream_profile(ctx.guild.id)
+        changes = [f"{time.strftime('%H:%M', time.localtime(at))} {change}" for at, change in profile.changes]
+        embed.add_field(name="Stream Profile", value="\n".join([profile.describe()] + changes[-3:]), inline=False)
+        
+        history = self.probe_history.get(ctx.guild.id)[:-1]
+        if history:
+            embed.add_field(
+                name="Earlier Runs",
+                value="\n".join(
+                    f"{time.strftime('%H:%M:%S', time.localtime(past.at))} `{past.host}` "
+                    + (f"first byte {format_ms(past.ttfb)}, {format_rate(past.throughput)}" if past.ok else f"failed: {past.error[:80]}")
+                    for past in history[-5:]
+                ),
+                inline=False
+            )
         
-        await ctx.send(f"📊 Current buffer size: {self.config['YTDL_OPTIONS'].get('buffer-size', '16K')}", delete_after=5.0)
-        await ctx.send(f"🎵 Current bitrate: {self.config['FFMPEG_OPTIONS']['options'].split()[2]}", delete_after=5.0)
+        await ctx.send(embed=embed, delete_after=60.0)
     
     @commands.command(name='streaming_help')
     async def streaming_help(self, ctx):
@@ -477,7 +968,7 @@ class Commands(commands.Cog):
             value=(
                 "• Use `!quality medium` for balance\n"
                 "• Use `!buffer large` if songs keep cutting out\n"
-                "• Use `!buffer small` for faster start times\n"
+                "• Quality and buffer also adjust automatically while playback struggles\n"
                 "• Run `!diag` if you experience lag"
             ),
             inline=False
@@ -486,7 +977,7 @@ class Commands(commands.Cog):
         await ctx.send(embed=embed, delete_after=5.0)
     
     @commands.command(name='help', aliases=['h', 'commands'])
-    async def help(self, ctx, command_name: str = None):
+    async def help(self, ctx, *, command_name: str = None):
         embed = self.cmd_manager.create_help_embed(command_name)
         await ctx.send(embed=embed, delete_after=180.0)
     
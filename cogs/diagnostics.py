@@ -0,0 +1,120 @@
+import discord
+from discord.ext import commands
+from utils.watchdog import LoopWatchdog
+from utils.profiler import SamplingProfiler
+from utils.tracing import tracer
+import os
+import time
+
+class Diagnostics(commands.Cog):
+    """Owner-only event loop watchdog and sampling profiler"""
+    
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = bot.config
+        self.output_dir = self.config.get('DIAGNOSTICS_DIR', 'diagnostics')
+        self.watchdog = None
+        self.profiler = SamplingProfiler(interval=self.config.get('PROFILER_INTERVAL_MS', 10) / 1000)
+    
+    async def cog_load(self):
+        self.watchdog = LoopWatchdog(
+            self.bot.loop,
+            threshold=self.config.get('WATCHDOG_THRESHOLD_MS', 250) / 1000
+        )
+        if self.config.get('WATCHDOG_ENABLED'):
+            self.watchdog.start()
+        if self.config.get('PROFILER_ENABLED'):
+            self.profiler.start()
+    
+    async def cog_unload(self):
+        if self.watchdog:
+            self.watchdog.stop()
+        if self.profiler.running:
+            self.profiler.stop()
+            print(f"Profile written to {self.write_profile()}")
+    
+    async def cog_check(self, ctx):
+        return await self.bot.is_owner(ctx.author)
+    
+    def write_profile(self):
+        path = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        return self.profiler.dump(path)
+    
+    @commands.command(name='watchdog', hidden=True)
+    async def watchdog_command(self, ctx, action: str = "status"):
+        if action == "on":
+            self.watchdog.start()
+            await ctx.send(f"🐶 Loop watchdog on (reports stalls over {self.watchdog.threshold * 1000:.0f} ms)")
+        elif action == "off":
+            self.watchdog.stop()
+            await ctx.send("🐶 Loop watchdog off")
+        elif action == "status":
+            stats = self.watchdog.stats()
+            embed = discord.Embed(title="🐶 Loop Watchdog", color=discord.Color.blue())
+            embed.add_field(name="Running", value="Yes" if stats['running'] else "No", inline=True)
+            embed.add_field(name="Stalls", value=str(stats['stalls']), inline=True)
+            embed.add_field(name="Lag", value=f"p99 {stats['p99_lag'] * 1000:.0f} ms / max {stats['max_lag'] * 1000:.0f} ms", inline=True)
+            for stall in list(self.watchdog.stalls)[-3:]:
+                location = "\n".join(stall.location())
+                embed.add_field(
+                    name=f"{stall.duration * 1000:.0f} ms at {time.strftime('%H:%M:%S', time.localtime(stall.started))}",
+                    value=f"```{location[-1000:]}```",
+                    inline=False
+                )
+            await ctx.send(embed=embed)
+        else:
+            await ctx.send("❌ Invalid action. Use on, off, or status")
+    
+    @commands.command(name='stalls', hidden=True)
+    async def stalls(self, ctx):
+        """Send the full stacks of recent event loop stalls as a file"""
+        if not self.watchdog.stalls:
+            return await ctx.send("✅ No stalls recorded")
+        
+        path = os.path.join(self.output_dir, f"stalls-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            for stall in self.watchdog.stalls:
+                f.write(f"=== {stall.duration * 1000:.0f} ms, task {stall.task}, {time.ctime(stall.started)}\n")
+                f.write(stall.stack + "\n")
+        await ctx.send(f"🧵 {len(self.watchdog.stalls)} stall(s)", file=discord.File(path))
+    
+    @commands.command(name='profile', hidden=True)
+    async def profile(self, ctx, action: str = "status", scope: str = "loop"):
+        if action == "start":
+            if self.profiler.running:
+                return await ctx.send("❌ The profiler is already running")
+            self.profiler.start(all_threads=scope == "all")
+            await ctx.send(f"🔬 Profiling {'all threads' if scope == 'all' else 'the event loop'} every {self.profiler.interval * 1000:.0f} ms. Use !profile stop to finish")
+        elif action == "stop":
+            if not self.profiler.running:
+                return await ctx.send("❌ The profiler is not running")
+            elapsed = self.profiler.stop()
+            path = self.write_profile()
+            top = "\n".join(f"{count:>6}  {frame}" for frame, count in self.profiler.top())
+            await ctx.send(
+                f"🔬 {self.profiler.sample_count} samples over {elapsed:.0f}s, written to `{path}` (collapsed stacks for flamegraph.pl or speedscope)\n```{top[:1500]}```",
+                file=discord.File(path)
+            )
+        elif action == "status":
+            state = f"running, {self.profiler.sample_count} samples so far" if self.profiler.running else "stopped"
+            await ctx.send(f"🔬 Profiler {state}")
+        else:
+            await ctx.send("❌ Invalid action. Use start, stop, or status")
+
+    @commands.command(name='trace', hidden=True)
+    async def trace(self, ctx, action: str = "status"):
+        if action == "on":
+            tracer.configure(self.config['TRACE_FILE'], self.config.get('TRACE_MIN_MS', 0) / 1000)
+            await ctx.send(f"🧭 Tracing commands to `{tracer.path}` (open it in ui.perfetto.dev or chrome://tracing)")
+        elif action == "off":
+            tracer.disable()
+            await ctx.send(f"🧭 Tracing off, {tracer.exported} trace(s) written to `{tracer.path}`")
+        elif action == "status":
+            state = "on" if tracer.enabled else "off"
+            await ctx.send(f"🧭 Tracing {state}, {tracer.exported} trace(s) written")
+        else:
+            await ctx.send("❌ Invalid action. Use on, off, or status")
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
@@ -2,10 +2,12 @@ import discord
 from discord.ui import Button, View
 from discord import Interaction, Embed
 from discord.ext import commands
+from utils.track import format_duration
 
 class QueueView(View):
-    def __init__(self, player):
+    def __init__(self, bot, player):
         super().__init__(timeout=300)
+        self.bot = bot
         self.player = player
         self.page = 0
         self.items_per_page = 10
@@ -24,14 +26,14 @@ class QueueView(View):
         if self.player.current:
             embed.add_field(
                 name="Now Playing",
-                value=f"**{self.player.current.title}** ({self.player.current.duration//60}:{self.player.current.duration%60:02d})",
+                value=f"**{self.player.current.title}** ({format_duration(self.player.current.duration)})",
                 inline=False
             )
         
         for i, song in enumerate(queue_items, start=start+1):
             embed.add_field(
-                name=f"{i}. {song['title'] if isinstance(song, dict) else song.title}",
-                value=f"Duration: {song['duration']//60}:{song['duration']%60:02d if isinstance(song, dict) else song.duration//60}:{song.duration%60:02d} | Requested by: {song['requester'] if isinstance(song, dict) else song.requester}",
+                name=f"{i}. {song.title}",
+                value=f"Duration: {format_duration(song.duration)} | Requested by: {song.requester}",
                 inline=False
             )
         
@@ -56,8 +58,14 @@ class QueueView(View):
     @discord.ui.button(label="Clear Queue", style=discord.ButtonStyle.danger, custom_id="clear_queue")
     async def clear_queue(self, interaction: Interaction, button: Button):
         self.player.clear_queue()
-        await interaction.response.send_message("✅ Queue cleared!", ephemeral=True)
+        commands_cog = self.bot.get_cog('Commands')
+        if commands_cog:
+            # Stops the FFmpeg process warmed for the next song
+            commands_cog.prefetcher.cancel(interaction.guild.id)
+        self.page = 0
+        # The interaction can only be responded to once, so the confirmation is a followup
         await self.update_message(interaction)
+        await interaction.followup.send("✅ Queue cleared!", ephemeral=True)
 
 class Queue(commands.Cog):
     def __init__(self, bot):
@@ -69,12 +77,12 @@ class Queue(commands.Cog):
         if not music_cog:
             return await ctx.send("❌ Music cog not loaded", delete_after=5.0)
         
-        player = music_cog.player
+        player = music_cog.get_player(ctx.guild.id)
         
         if not player.queue and not player.current:
             return await ctx.send("❌ The queue is empty", delete_after=5.0)
         
-        view = QueueView(player)
+        view = QueueView(self.bot, player)
         items_per_page = 10
         total_pages = max(1, (len(player.queue) + items_per_page - 1) // items_per_page)
         page = max(1, min(page, total_pages))
@@ -93,14 +101,14 @@ class Queue(commands.Cog):
         if player.current:
             embed.add_field(
                 name="Now Playing",
-                value=f"**{player.current.title}** ({player.current.duration//60}:{player.current.duration%60:02d})",
+                value=f"**{player.current.title}** ({format_duration(player.current.duration)})",
                 inline=False
             )
         
         for i, song in enumerate(queue_items, start=start+1):
             embed.add_field(
-                name=f"{i}. {song['title'] if isinstance(song, dict) else song.title}",
-                value=f"Duration: {song['duration']//60}:{song['duration']%60:02d if isinstance(song, dict) else song.duration//60}:{song.duration%60:02d} | Requested by: {song['requester'] if isinstance(song, dict) else song.requester}",
+                name=f"{i}. {song.title}",
+                value=f"Duration: {format_duration(song.duration)} | Requested by: {song.requester}",
                 inline=False
             )
         
@@ -2,6 +2,9 @@ import discord
 from discord.ui import Button, View, Select
 from discord import Interaction, Embed
 from discord.ext import commands
+from utils.track import format_duration
+from utils.panel_renderer import PanelRenderer
+from utils.tracing import traced
 import asyncio
 
 class ControlPanel(View):
@@ -14,7 +17,9 @@ class ControlPanel(View):
     def update_buttons(self):
         for child in self.children:
             if child.custom_id == "play_pause":
-                if self.player.current and any(vc.is_playing() for vc in self.bot.voice_clients):
+                guild = self.bot.get_guild(self.player.guild_id) if self.player.guild_id else None
+                voice_client = guild.voice_client if guild else None
+                if self.player.current and voice_client and voice_client.is_playing():
                     child.label = "⏸️"
                     child.style = discord.ButtonStyle.primary
                 else:
@@ -22,11 +27,20 @@ class ControlPanel(View):
                     child.style = discord.ButtonStyle.success
                 break
     
+    def set_volume(self, volume):
+        commands_cog = self.bot.get_cog('Commands')
+        if commands_cog and self.player.guild_id:
+            commands_cog.apply_volume(self.player.guild_id, volume)
+        else:
+            self.player.set_volume(volume)
+    
     @discord.ui.button(label="⏮️", style=discord.ButtonStyle.secondary, custom_id="prev")
+    @traced('button.prev')
     async def previous_button(self, interaction: Interaction, button: Button):
         await interaction.response.defer()
     
     @discord.ui.button(label="⏸️", style=discord.ButtonStyle.primary, custom_id="play_pause")
+    @traced('button.play_pause')
     async def play_pause_button(self, interaction: Interaction, button: Button):
         voice_client = interaction.guild.voice_client
         
@@ -46,6 +60,7 @@ class ControlPanel(View):
         await interaction.response.edit_message(view=self)
     
     @discord.ui.button(label="⏭️", style=discord.ButtonStyle.secondary, custom_id="next")
+    @traced('button.next')
     async def skip_button(self, interaction: Interaction, button: Button):
         voice_client = interaction.guild.voice_client
         
@@ -57,11 +72,9 @@ class ControlPanel(View):
         await interaction.response.send_message("⏭️ Skipped to next song", ephemeral=True)
     
     @discord.ui.button(label="🔈", style=discord.ButtonStyle.secondary, custom_id="vol_down")
+    @traced('button.vol_down')
     async def vol_down_button(self, interaction: Interaction, button: Button):
-        self.player.set_volume(max(0.0, self.player.volume - 0.1))
-        
-        if self.player.current:
-            self.player.current.volume = self.player.volume
+        self.set_volume(max(0.0, self.player.volume - 0.1))
         
         await interaction.response.send_message(
             f"🔈 Volume: {int(self.player.volume * 100)}%", 
@@ -69,11 +82,9 @@ class ControlPanel(View):
         )
     
     @discord.ui.button(label="🔊", style=discord.ButtonStyle.secondary, custom_id="vol_up")
+    @traced('button.vol_up')
     async def vol_up_button(self, interaction: Interaction, button: Button):
-        self.player.set_volume(min(2.0, self.player.volume + 0.1))
-        
-        if self.player.current:
-            self.player.current.volume = self.player.volume
+        self.set_volume(min(2.0, self.player.volume + 0.1))
         
         await interaction.response.send_message(
             f"🔊 Volume: {int(self.player.volume * 100)}%", 
@@ -81,6 +92,7 @@ class ControlPanel(View):
         )
     
     @discord.ui.button(label="⏹️", style=discord.ButtonStyle.danger, custom_id="stop")
+    @traced('button.stop')
     async def stop_button(self, interaction: Interaction, button: Button):
         voice_client = interaction.guild.voice_client
         
@@ -88,18 +100,22 @@ class ControlPanel(View):
             await interaction.response.send_message("❌ Bot is not connected to a voice channel", ephemeral=True)
             return
         
-        voice_client.stop()
         self.player.clear_queue()
+        commands_cog = self.bot.get_cog('Commands')
+        if commands_cog:
+            commands_cog.prefetcher.cancel(interaction.guild.id)
+        voice_client.stop()
         await interaction.response.send_message("⏹️ Stopped playback and cleared queue", ephemeral=True)
     
     @discord.ui.button(label="📋", style=discord.ButtonStyle.secondary, custom_id="queue")
+    @traced('button.queue')
     async def queue_button(self, interaction: Interaction, button: Button):
         commands_cog = self.bot.get_cog('Commands')
         if not commands_cog:
             await interaction.response.send_message("❌ Commands cog not loaded", ephemeral=True)
             return
         
-        player = commands_cog.player
+        player = commands_cog.get_player(interaction.guild.id)
         
         if not player.queue and not player.current:
             await interaction.response.send_message("❌ The queue is empty", ephemeral=True)
@@ -114,21 +130,14 @@ class ControlPanel(View):
         if player.current:
             embed.add_field(
                 name="Now Playing",
-                value=f"**{player.current.title}** ({player.current.duration//60}:{player.current.duration%60:02d})",
+                value=f"**{player.current.title}** ({format_duration(player.current.duration)})",
                 inline=False
             )
         
         for i, song in enumerate(player.queue[:5]):
-            if isinstance(song, dict):
-                title = song.get('title', 'Unknown')
-                duration = song.get('duration', 0)
-            else:
-                title = song.title
-                duration = song.duration
-            
             embed.add_field(
-                name=f"{i+1}. {title}",
-                value=f"Duration: {duration//60}:{duration%60:02d}",
+                name=f"{i+1}. {song.title}",
+                value=f"Duration: {format_duration(song.duration)}",
                 inline=False
             )
         
@@ -143,14 +152,14 @@ class UI(commands.Cog):
         self.bot = bot
         self.control_panels = {}
         self.auto_show = True
+        self.renderer = PanelRenderer(
+            self.render_panel,
+            on_error=self.drop_panel,
+            debounce=bot.config.get('PANEL_DEBOUNCE', 0.75),
+            min_interval=bot.config.get('PANEL_MIN_INTERVAL', 1.5)
+        )
     
-    async def show_control_panel(self, ctx, player=None):
-        if player is None:
-            commands_cog = self.bot.get_cog('Commands')
-            if not commands_cog:
-                return None
-            player = commands_cog.player
-        
+    def build_panel(self, player, idle_text):
         view = ControlPanel(player, self.bot)
         
         embed = Embed(
@@ -167,7 +176,7 @@ class UI(commands.Cog):
             )
             embed.add_field(
                 name="Duration",
-                value=f"{player.current.duration // 60}:{player.current.duration % 60:02d}",
+                value=format_duration(player.current.duration),
                 inline=True
             )
             embed.add_field(
@@ -177,68 +186,50 @@ class UI(commands.Cog):
             )
             embed.set_thumbnail(url=player.current.thumbnail)
         else:
-            embed.description = "No song is currently playing. Use !play to start playing music!"
+            embed.description = idle_text
         
         embed.set_footer(text=f"Volume: {int(player.volume * 100)}% | Queue: {len(player.queue)} songs")
+        return embed, view
+    
+    def render_panel(self, guild_id):
+        message = self.control_panels.get(guild_id)
+        commands_cog = self.bot.get_cog('Commands')
+        if message is None or not commands_cog:
+            return None
+        embed, view = self.build_panel(commands_cog.get_player(guild_id), "No song is currently playing")
+        return message, embed, view
+    
+    def drop_panel(self, guild_id):
+        self.control_panels.pop(guild_id, None)
+    
+    async def show_control_panel(self, ctx, player=None):
+        if player is None:
+            commands_cog = self.bot.get_cog('Commands')
+            if not commands_cog:
+                return None
+            player = commands_cog.get_player(ctx.guild.id)
+        
+        embed, view = self.build_panel(player, "No song is currently playing. Use !play to start playing music!")
         
         if ctx.guild.id in self.control_panels:
             try:
                 message = self.control_panels[ctx.guild.id]
                 await message.edit(embed=embed, view=view)
+                self.renderer.mark_rendered(ctx.guild.id, embed, view)
                 return message
             except:
                 pass
         
         message = await ctx.send(embed=embed, view=view)
         self.control_panels[ctx.guild.id] = message
+        self.renderer.mark_rendered(ctx.guild.id, embed, view)
         return message
     
     async def update_control_panel(self, guild_id, player=None):
+        """Queue a coalesced panel refresh; the latest player state is rendered when the edit runs"""
         if guild_id not in self.control_panels:
             return
-        
-        if player is None:
-            commands_cog = self.bot.get_cog('Commands')
-            if not commands_cog:
-                return
-            player = commands_cog.player
-        
-        message = self.control_panels[guild_id]
-        view = ControlPanel(player, self.bot)
-        
-        embed = Embed(
-            title="🎵 Music Control Panel",
-            description="Use the buttons below to control the music player",
-            color=discord.Color.blue()
-        )
-        
-        if player.current:
-            embed.add_field(
-                name="Current Song",
-                value=f"**{player.current.title}**",
-                inline=False
-            )
-            embed.add_field(
-                name="Duration",
-                value=f"{player.current.duration // 60}:{player.current.duration % 60:02d}",
-                inline=True
-            )
-            embed.add_field(
-                name="Requested by",
-                value=player.current.requester,
-                inline=True
-            )
-            embed.set_thumbnail(url=player.current.thumbnail)
-        else:
-            embed.description = "No song is currently playing"
-            embed.set_footer(text="Queue is empty")
-        
-        embed.set_footer(text=f"Volume: {int(player.volume * 100)}% | Queue: {len(player.queue)} songs")
-        
-        try:
-            await message.edit(embed=embed, view=view)
-        except:
-            del self.control_panels[guild_id]
+        self.renderer.request(guild_id)
     
     @commands.command(name='controls', aliases=['ui', 'panel'])
     async def show_controls(self, ctx):
@@ -246,7 +237,7 @@ class UI(commands.Cog):
         if not commands_cog:
             return await ctx.send("❌ Music system not available")
         
-        await self.show_control_panel(ctx, commands_cog.player)
+        await self.show_control_panel(ctx, commands_cog.get_player(ctx.guild.id))
         await ctx.message.add_reaction("✅")
     
     @commands.command(name='hide_controls', aliases=['hide'])
@@ -255,6 +246,7 @@ class UI(commands.Cog):
             try:
                 await self.control_panels[ctx.guild.id].delete()
                 del self.control_panels[ctx.guild.id]
+                self.renderer.forget(ctx.guild.id)
                 await ctx.send("✅ Control panel hidden")
             except:
                 await ctx.send("❌ Could not hide control panel")
@@ -276,7 +268,7 @@ class UI(commands.Cog):
         if not commands_cog:
             return await ctx.send("❌ Music system not available")
         
-        await self.update_control_panel(ctx.guild.id, commands_cog.player)
+        await self.update_control_panel(ctx.guild.id, commands_cog.get_player(ctx.guild.id))
         await ctx.message.add_reaction("✅")
 
 async def setup(bot):
@@ -1,14 +1,63 @@
 import os
 import sys
 import subprocess
+import argparse
+import asyncio
 
 def install_requirements():
     subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the music bot, optionally as several sharded worker processes")
+    parser.add_argument('--clusters', type=int, help="number of worker processes (default: CLUSTERS)")
+    parser.add_argument('--shards', help="total shard count or 'auto' (default: SHARD_COUNT)")
+    parser.add_argument('--audio-node', metavar='HOST:PORT', help="run an audio node instead of the bot")
+    parser.add_argument('--fake-audio', action='store_true', help="audio node plays silence without FFmpeg (for testing)")
+    return parser.parse_args()
+
+async def run_cluster(config, clusters, shard_count):
+    from utils.cluster import ClusterSupervisor
+    
+    supervisor = await ClusterSupervisor.from_config(config, clusters, shard_count)
+    await supervisor.run()
+
 if __name__ == "__main__":
     if not os.path.exists('venv'):
         print("Creating virtual environment...")
         subprocess.check_call([sys.executable, "-m", "venv", "venv"])
     
-    from bot import main
-    main()
\ No newline at end of file
+    from utils.config import load_config
+    
+    args = parse_args()
+    if args.audio_node:
+        from utils.audio_node import AudioNode, parse_address
+        
+        host, port = parse_address(args.audio_node)
+        try:
+            node = AudioNode(host, port, fake=args.fake_audio, secret=load_config()['AUDIO_NODE_SECRET'] or None)
+        except ValueError as e:
+            sys.exit(str(e))
+        try:
+            asyncio.run(node.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        sys.exit()
+    
+    config = load_config()
+    clusters = args.clusters or config['CLUSTERS']
+    shard_count = config['SHARD_COUNT']
+    if args.shards == 'auto':
+        shard_count = 0
+        os.environ['SHARDING_ENABLED'] = 'true'
+    elif args.shards:
+        shard_count = int(args.shards)
+    
+    if clusters > 1:
+        asyncio.run(run_cluster(config, clusters, shard_count))
+    else:
+        from bot import main
+        if shard_count:
+            # A single process running every shard
+            asyncio.run(main(list(range(shard_count)), shard_count))
+        else:
+            asyncio.run(main())
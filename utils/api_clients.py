@@ -1,17 +1,58 @@
-import requests
-import re
+import aiohttp
+import asyncio
+from utils.search_cache import SearchCache
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+YOUTUBE_SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
 
 class APIClients:
     def __init__(self, config):
         self.youtube_api_key = config.get('YOUTUBE_API_KEY')
+        self.timeout = aiohttp.ClientTimeout(
+            total=config.get('HTTP_TIMEOUT', 10),
+            connect=config.get('HTTP_CONNECT_TIMEOUT', 5)
+        )
+        self.pool_size = config.get('HTTP_POOL_SIZE', 20)
+        self.session = None
+        self.search_cache = SearchCache(
+            max_size=config.get('SEARCH_CACHE_SIZE', 1000),
+            ttl=config.get('SEARCH_CACHE_TTL', 86400),
+            path=config.get('SEARCH_CACHE_FILE')
+        )
+    
+    async def start(self):
+        """Create the shared HTTP session. Call once the event loop is running."""
+        if self.session and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        await asyncio.get_running_loop().run_in_executor(None, self.search_cache.load)
     
-    async def search_youtube(self, query):
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        await asyncio.get_running_loop().run_in_executor(None, self.search_cache.save)
+    
+    async def search_youtube(self, query, guild_id=None):
         if not self.youtube_api_key:
             print("YouTube API key not provided")
             return None
         
+        cached_id = self.search_cache.get(query)
+        if cached_id:
+            metrics.inc('search_cache_hits', guild_id)
+            return f"https://www.youtube.com/watch?v={cached_id}"
+        
+        if self.session is None or self.session.closed:
+            await self.start()
+        
         try:
-            url = "https://www.googleapis.com/youtube/v3/search"
             params = {
                 'part': 'snippet',
                 'q': query,
@@ -21,18 +62,25 @@ class APIClients:
                 'key': self.youtube_api_key
             }
             
-            response = requests.get(url, params=params)
-            data = response.json()
+            with metrics.timer('search_seconds', guild_id), tracer.span('youtube.search', query=query):
+                async with self.session.get(YOUTUBE_SEARCH_URL, params=params) as response:
+                    data = await response.json()
             
             if 'items' in data and len(data['items']) > 0:
                 video_id = data['items'][0]['id']['videoId']
                 video_title = data['items'][0]['snippet']['title']
                 print(f"YouTube API found: {video_title} ({video_id})")
+                self.search_cache.put(query, video_id)
                 return f"https://www.youtube.com/watch?v={video_id}"
             else:
                 print(f"No results found for query: {query}")
                 return None
-                
+        
+        except asyncio.TimeoutError:
+            metrics.inc('search_errors', guild_id)
+            print(f"YouTube API timed out for query: {query}")
+            return None
         except Exception as e:
+            metrics.inc('search_errors', guild_id)
             print(f"YouTube API error: {e}")
-            return None
\ No newline at end of file
+            return None
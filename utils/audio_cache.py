@@ -0,0 +1,192 @@
+import asyncio
+import concurrent.futures
+import os
+from collections import OrderedDict
+
+class AudioCache:
+    """Size-bounded LRU of downloaded audio files named <video id>.<ext>.
+    
+    Tracks are only downloaded once they have been played min_plays times, so
+    the cache fills with the songs a server actually repeats. Downloads run on
+    the cache's own threads, so they never hold extractor pool slots or hit
+    its extraction timeout; yt-dlp skips files over max_file_bytes instead.
+    """
+    
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, min_plays=3, max_tracked=5000, max_file_bytes=100 * 1024 * 1024, workers=1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.min_plays = min_plays
+        self.max_tracked = max_tracked
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        self.play_counts = OrderedDict()
+        self.filling = set()
+        self.hits = 0
+        self.misses = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='audio-cache')
+    
+    def scan(self):
+        """Rebuild the index from disk, oldest modification time first"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            video_id, ext = os.path.splitext(name)
+            if not ext or ext in ('.part', '.ytdl', '.tmp') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, video_id, path, stat.st_size))
+        
+        self.index.clear()
+        self.total_bytes = 0
+        for _, video_id, path, size in sorted(files):
+            self.index[video_id] = (path, size)
+            self.total_bytes += size
+        self.evict()
+    
+    def get(self, video_id):
+        """Return the local file for a video, or None"""
+        entry = self.index.get(video_id) if video_id else None
+        if entry is None or not os.path.exists(entry[0]):
+            if entry is not None:
+                self._forget(video_id)
+            self.misses += 1
+            return None
+        
+        self.index.move_to_end(video_id)
+        try:
+            # Persist the LRU order so it survives a restart
+            os.utime(entry[0])
+        except OSError:
+            pass
+        self.hits += 1
+        return entry[0]
+    
+    def record_play(self, video_id):
+        """Count a play and return True when the track should be downloaded"""
+        if not video_id or video_id in self.index or video_id in self.filling:
+            return False
+        count = self.play_counts.pop(video_id, 0) + 1
+        self.play_counts[video_id] = count
+        while len(self.play_counts) > self.max_tracked:
+            self.play_counts.popitem(last=False)
+        return count >= self.min_plays
+    
+    def add(self, video_id, path):
+        size = os.path.getsize(path)
+        if video_id in self.index:
+            self._forget(video_id)
+        self.index[video_id] = (path, size)
+        self.total_bytes += size
+        self.play_counts.pop(video_id, None)
+        self.evict()
+    
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.index:
+            video_id, (path, _) = next(iter(self.index.items()))
+            self._forget(video_id)
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Could not remove cached audio {path}: {e}")
+    
+    def _forget(self, video_id):
+        _, size = self.index.pop(video_id)
+        self.total_bytes -= size
+    
+    def download_options(self, ytdl_options):
+        options = dict(ytdl_options or {})
+        options.update({
+            'format': 'bestaudio[acodec=opus]/bestaudio/best',
+            'outtmpl': os.path.join(self.directory, '%(id)s.%(ext)s'),
+            'noplaylist': True,
+            'max_filesize': self.max_file_bytes,
+            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'opus'}],
+        })
+        return options
+    
+    def find_file(self, video_id):
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if stem == video_id and ext not in ('.part', '.ytdl', '.tmp'):
+                return os.path.join(self.directory, name)
+        return None
+    
+    def remove_files(self, video_id):
+        """Delete everything a download left behind for a video, including partial files"""
+        for name in os.listdir(self.directory):
+            # Video ids have no dots, while partial files can have several extensions
+            if name.partition('.')[0] == video_id:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError as e:
+                    print(f"Could not remove cached audio {name}: {e}")
+    
+    def _download(self, download, url, options, video_id):
+        """Runs on a cache thread: fetch the track and return its file, or None if yt-dlp skipped it"""
+        try:
+            download(url, options)
+        except BaseException:
+            self.remove_files(video_id)
+            raise
+        return self.find_file(video_id)
+    
+    async def fill(self, info, download, ytdl_options=None):
+        """Download a track in the background; download(url, options) must run yt-dlp with download=True.
+        
+        The file is indexed from the download's done callback, so it is tracked
+        even if the task awaiting the fill is cancelled first.
+        """
+        video_id = info.get('id')
+        if not video_id or video_id in self.filling:
+            return
+        self.filling.add(video_id)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(self._download, download, info['webpage_url'], self.download_options(ytdl_options), video_id)
+        except RuntimeError as e:
+            # The cache was closed
+            self.filling.discard(video_id)
+            print(f"Audio cache fill failed for {video_id}: {e}")
+            return
+        future.add_done_callback(lambda done: self._finish_threadsafe(loop, video_id, info.get('title'), done))
+        try:
+            await asyncio.wrap_future(future)
+        except Exception:
+            # Reported by _finish
+            pass
+    
+    def _finish(self, video_id, title, future):
+        self.filling.discard(video_id)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Audio cache fill failed for {video_id}: {error}")
+        elif future.result() is None:
+            print(f"Audio cache skipped {title} ({video_id}): nothing downloaded, it may be over the size limit")
+        else:
+            self.add(video_id, future.result())
+            print(f"Cached audio for {title} ({video_id})")
+    
+    def _finish_threadsafe(self, loop, video_id, title, future):
+        try:
+            loop.call_soon_threadsafe(self._finish, video_id, title, future)
+        except RuntimeError:
+            # The loop is already closed; the next scan() picks the file up
+            pass
+    
+    def close(self):
+        """Drop queued downloads; one already running finishes in the background"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self):
+        return {
+            'files': len(self.index),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'filling': len(self.filling)
+        }
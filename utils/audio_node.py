@@ -0,0 +1,496 @@
+import asyncio
+import hashlib
+import hmac
+import io
+import ipaddress
+import json
+import math
+import secrets
+import socket
+import struct
+import threading
+from urllib.parse import urlsplit
+from discord.oggparse import OggPage, OggError
+import discord
+from utils.stream_profile import BUFFER_PACKETS, CUTOFF_HZ, RECONNECT_DELAYS, input_options
+
+# Downstream frames are a 2-byte big-endian length followed by one Opus packet.
+# A zero length ends the stream; MARKER is followed by a 4-byte generation and
+# tells the client that packets from a seek or volume restart follow.
+FRAME_HEADER = struct.Struct('>H')
+GENERATION = struct.Struct('>I')
+END = 0
+MARKER = 0xFFFF
+
+# Small socket buffers keep the node at most about a second ahead of playback
+SOCKET_BUFFER = 16384
+
+OPUS_SILENCE = b'\xf8\xff\xfe'
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+# !volume goes up to 200%
+MAX_VOLUME = 2.0
+
+# Seconds a new connection gets to send its play request
+HANDSHAKE_TIMEOUT = 10.0
+
+def parse_address(address):
+    host, _, port = address.strip().rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def sign(secret, nonce):
+    """Proof that a client knows the node's secret, without sending the secret itself"""
+    return hmac.new(secret.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+
+def number(value, default, low, high=None):
+    """A finite number from a client message, clamped to [low, high]; default when missing"""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"expected a number, got {value!r}")
+    value = max(value, low)
+    return value if high is None else min(value, high)
+
+def play_options(request):
+    """Validate a client's play request; only these fields reach FFmpeg's command line"""
+    url = request.get('url')
+    if not isinstance(url, str) or urlsplit(url).scheme not in ('http', 'https'):
+        raise ValueError("only http(s) URLs can be played")
+    buffer = request.get('buffer', 'medium')
+    if buffer not in BUFFER_PACKETS:
+        raise ValueError(f"unknown buffer size {buffer!r}")
+    cutoff = request.get('cutoff')
+    if cutoff is not None and cutoff not in CUTOFF_HZ.values():
+        raise ValueError(f"unsupported cutoff {cutoff!r}")
+    bitrate = number(request.get('bitrate'), None, 6, 510)
+    return {
+        'url': url,
+        'buffer': buffer,
+        'reconnect_delay': int(number(request.get('reconnect_delay'), RECONNECT_DELAYS[buffer], 1, 60)),
+        'copy': request.get('copy') is True,
+        'volume': number(request.get('volume'), 1.0, 0.0, MAX_VOLUME),
+        'position': number(request.get('position'), 0.0, 0.0),
+        'duration': number(request.get('duration'), 0.0, 0.0),
+        'bitrate': bitrate and int(bitrate),
+        'cutoff': cutoff,
+    }
+
+def connect(address, request, timeout=5.0, secret=None):
+    """Open a connection to a node and send a play request; returns the socket and its reader.
+    
+    Blocks for up to `timeout` per step. Raises OSError if the node can't be
+    reached or doesn't answer the handshake.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    sock.settimeout(timeout)
+    reader = sock.makefile('rb')
+    try:
+        sock.connect(parse_address(address))
+        try:
+            hello = json.loads(reader.readline() or b'null')
+        except ValueError:
+            hello = None
+        if not isinstance(hello, dict) or hello.get('op') != 'hello':
+            raise OSError(f"{address} did not greet like an audio node")
+        request = dict(request, op='play')
+        if secret:
+            request['auth'] = sign(secret, str(hello.get('nonce', '')))
+        sock.sendall(json.dumps(request).encode() + b'\n')
+    except OSError:
+        reader.close()
+        sock.close()
+        raise
+    return sock, reader
+
+async def read_ogg_page(stdout):
+    """Read one Ogg page from an asyncio stream; returns None at EOF"""
+    try:
+        head = await stdout.readexactly(27)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise OggError('truncated page') from None
+        return None
+    if head[:4] != b'OggS':
+        raise OggError(f'invalid header magic {head[:4]}')
+    segtable = await stdout.readexactly(head[26])
+    body = await stdout.readexactly(sum(segtable))
+    return OggPage(io.BytesIO(head[4:] + segtable + body))
+
+class NodeStream:
+    """One track being decoded and encoded on the node for one client connection"""
+    
+    def __init__(self, node, options, writer):
+        self.node = node
+        self.writer = writer
+        self.url = options['url']
+        self.buffer = options['buffer']
+        self.reconnect_delay = options['reconnect_delay']
+        self.copy = options['copy']
+        self.volume = options['volume']
+        self.position = options['position']
+        self.duration = options['duration']
+        self.bitrate = options['bitrate'] or node.bitrate
+        self.cutoff = options['cutoff']
+        self.generation = 0
+        self.process = None
+        self.stopped = False
+        self.restart = asyncio.Event()
+    
+    def ffmpeg_args(self):
+        # Built from validated fields only, so splitting on spaces is safe
+        args = [self.node.ffmpeg, *input_options(self.buffer, reconnect_delay=self.reconnect_delay).split()]
+        if self.position:
+            args += ['-ss', f"{self.position:.3f}"]
+        args += ['-i', self.url, '-vn', '-map_metadata', '-1']
+        if self.copy and self.volume == 1.0:
+            args += ['-c:a', 'copy']
+        else:
+            args += ['-c:a', 'libopus', '-b:a', f"{self.bitrate}k", '-ar', '48000', '-ac', '2']
+            if self.cutoff:
+                args += ['-cutoff', str(self.cutoff)]
+            if self.volume != 1.0:
+                args += ['-af', f"volume={self.volume:.2f}"]
+        return args + ['-f', 'opus', '-loglevel', 'warning', 'pipe:1']
+    
+    async def send(self, packet):
+        self.writer.write(FRAME_HEADER.pack(len(packet)) + packet)
+        await self.writer.drain()
+    
+    async def produce(self):
+        if self.node.fake:
+            # Stand-in for tests: silence for the rest of the track, no FFmpeg needed
+            frames = int(max((self.duration or 30) - self.position, 0) / FRAME_SECONDS)
+            for _ in range(frames):
+                await self.send(OPUS_SILENCE)
+            return
+        
+        self.process = await asyncio.create_subprocess_exec(
+            *self.ffmpeg_args(),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE
+        )
+        partial = b''
+        while True:
+            page = await read_ogg_page(self.process.stdout)
+            if page is None:
+                break
+            for data, complete in page.iter_packets():
+                partial += data
+                if not complete:
+                    continue
+                packet, partial = partial, b''
+                if packet.startswith((b'OpusHead', b'OpusTags')):
+                    continue
+                await self.send(packet)
+        await self.process.wait()
+    
+    async def kill(self):
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        self.process = None
+    
+    async def run(self):
+        """Stream packets until the track ends, restarting FFmpeg whenever a seek or volume change asks for it"""
+        try:
+            while not self.stopped:
+                self.restart.clear()
+                producer = asyncio.create_task(self.produce())
+                restart = asyncio.create_task(self.restart.wait())
+                await asyncio.wait({producer, restart}, return_when=asyncio.FIRST_COMPLETED)
+                if not restart.done():
+                    restart.cancel()
+                    producer.result()
+                    await self.send(b'')
+                    return
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+                await self.kill()
+                if not self.stopped:
+                    self.writer.write(FRAME_HEADER.pack(MARKER) + GENERATION.pack(self.generation))
+        except (OSError, asyncio.IncompleteReadError, OggError) as e:
+            if not self.stopped:
+                print(f"Audio node stream {self.url} ended early: {e}")
+        finally:
+            await self.kill()
+    
+    def control(self, message):
+        op = message.get('op')
+        if op == 'stop':
+            self.stopped = True
+            self.restart.set()
+        elif op in ('seek', 'volume'):
+            self.generation = int(number(message.get('generation'), self.generation + 1, 0, 2 ** 32 - 1))
+            self.position = number(message.get('position'), self.position, 0.0)
+            if op == 'volume':
+                self.volume = number(message.get('value'), self.volume, 0.0, MAX_VOLUME)
+            self.restart.set()
+    
+    async def read_controls(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                # The client went away
+                self.stopped = True
+                self.restart.set()
+                return
+            try:
+                self.control(json.loads(line))
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Audio node: bad control message: {e}")
+
+class AudioNode:
+    """Standalone process that runs FFmpeg and Opus encoding for the bot.
+    
+    Each connection plays one track: the node greets it with a nonce, the
+    client answers with a JSON play request line, then receives
+    length-prefixed Opus packets it can hand straight to the voice client.
+    Seek, volume and stop are further JSON lines. The node builds FFmpeg's
+    options itself from the request's validated fields and only plays http(s)
+    URLs. With a secret, clients must sign the nonce with it; without one the
+    node only listens on loopback. With fake set, every track is silence and
+    FFmpeg is not used.
+    """
+    
+    def __init__(self, host='127.0.0.1', port=8765, fake=False, ffmpeg='ffmpeg', bitrate=128, secret=None):
+        if not secret and not is_loopback(host):
+            raise ValueError(f"An audio node on {host} needs AUDIO_NODE_SECRET; without one it can only listen on loopback")
+        self.host = host
+        self.secret = secret
+        self.port = port
+        self.fake = fake
+        self.ffmpeg = ffmpeg
+        self.bitrate = bitrate
+        self.streams = set()
+        self.served = 0
+        self.server = None
+    
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        # Port 0 picks a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Audio node listening on {self.address}{' (fake audio)' if self.fake else ''}")
+    
+    async def stop(self):
+        for stream in list(self.streams):
+            stream.control({'op': 'stop'})
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+    
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+    
+    async def handle(self, reader, writer):
+        writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+        writer.transport.set_write_buffer_limits(high=SOCKET_BUFFER)
+        stream = None
+        controls = None
+        try:
+            nonce = secrets.token_hex(16)
+            writer.write(json.dumps({'op': 'hello', 'nonce': nonce}).encode() + b'\n')
+            try:
+                line = await asyncio.wait_for(reader.readline(), HANDSHAKE_TIMEOUT)
+            except ConnectionError:
+                # Closed before asking for anything, e.g. a port check
+                return
+            request = json.loads(line or b'null')
+            if not isinstance(request, dict) or request.get('op') != 'play':
+                return
+            if self.secret and not hmac.compare_digest(str(request.get('auth', '')), sign(self.secret, nonce)):
+                print(f"Audio node: refused {writer.get_extra_info('peername')}, wrong secret")
+                return
+            stream = NodeStream(self, play_options(request), writer)
+            self.streams.add(stream)
+            self.served += 1
+            controls = asyncio.create_task(stream.read_controls(reader))
+            await stream.run()
+        except (ValueError, ConnectionError, asyncio.TimeoutError) as e:
+            print(f"Audio node: dropped connection: {e}")
+        finally:
+            if controls:
+                controls.cancel()
+            self.streams.discard(stream)
+            writer.close()
+    
+    def stats(self):
+        return {'streams': len(self.streams), 'served': self.served}
+
+class NodeAudioSource(discord.AudioSource):
+    """Opus packets streamed from an audio node.
+    
+    read() runs on the voice client's audio thread and blocks on the socket
+    like FFmpeg sources block on their pipe. Volume changes and seeks restart
+    FFmpeg on the node; packets still in flight from before are dropped until
+    the node's marker for the new generation arrives.
+    """
+    
+    remote = True
+    
+    def __init__(self, address, sock, reader, request, read_timeout=30.0):
+        self.address = address
+        self.sock = sock
+        self.reader = reader
+        self.sock.settimeout(read_timeout)
+        self._send_lock = threading.Lock()
+        self.volume = request.get('volume', 1.0)
+        self.generation = 0
+        self.base_position = request.get('position', 0.0)
+        self.pending_position = None
+        self.frames = 0
+        self.closed = False
+        # Called once when the source is cleaned up
+        self.on_close = None
+    
+    @property
+    def position(self):
+        """Seconds into the track of the last packet handed to the voice client"""
+        if self.pending_position is not None:
+            return self.pending_position
+        return self.base_position + self.frames * FRAME_SECONDS
+    
+    def is_opus(self):
+        return True
+    
+    def _send(self, message):
+        try:
+            with self._send_lock:
+                self.sock.sendall(json.dumps(message).encode() + b'\n')
+        except OSError:
+            pass
+    
+    def _restart(self, op, position, **fields):
+        self.generation += 1
+        self.pending_position = position
+        self._send(dict(fields, op=op, position=position, generation=self.generation))
+    
+    def set_volume(self, volume):
+        if volume != self.volume:
+            self.volume = volume
+            self._restart('volume', self.position, value=volume)
+    
+    def seek(self, position):
+        self._restart('seek', max(position, 0.0))
+    
+    def _read_exactly(self, size):
+        data = self.reader.read(size)
+        if data is None or len(data) < size:
+            raise EOFError
+        return data
+    
+    def read(self):
+        try:
+            while not self.closed:
+                length, = FRAME_HEADER.unpack(self._read_exactly(2))
+                if length == END:
+                    return b''
+                if length == MARKER:
+                    generation, = GENERATION.unpack(self._read_exactly(4))
+                    if generation == self.generation and self.pending_position is not None:
+                        self.base_position, self.pending_position = self.pending_position, None
+                        self.frames = 0
+                    continue
+                packet = self._read_exactly(length)
+                if self.pending_position is None:
+                    self.frames += 1
+                    return packet
+        except (OSError, EOFError, ValueError):
+            pass
+        return b''
+    
+    def cleanup(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.on_close is not None:
+            self.on_close()
+        self._send({'op': 'stop'})
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+def close_connection(connecting):
+    if connecting.cancelled() or connecting.exception() is not None:
+        return
+    sock, reader = connecting.result()
+    reader.close()
+    sock.close()
+
+class AudioNodePool:
+    """Client side of one or more audio nodes; each new track goes to the node with the fewest open streams"""
+    
+    def __init__(self, addresses, timeout=5.0, secret=None):
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.secret = secret
+        self.active = {address: 0 for address in self.addresses}
+        self.failures = 0
+    
+    @classmethod
+    def from_config(cls, config):
+        addresses = [address.strip() for address in (config.get('AUDIO_NODES') or '').split(',') if address.strip()]
+        if not addresses:
+            return None
+        return cls(addresses, timeout=config.get('AUDIO_NODE_TIMEOUT', 5), secret=config.get('AUDIO_NODE_SECRET') or None)
+    
+    async def create_source(self, info, volume=1.0, passthrough=True, buffer='medium', position=0.0, bitrate=None, cutoff=None):
+        """Start a track on the least busy node that accepts the connection; raises OSError if none do.
+        
+        Connecting can block for `timeout` per node, so it runs on an executor
+        thread and a slow or dead node never stalls the event loop.
+        """
+        request = {
+            'url': info['url'],
+            'buffer': buffer,
+            'copy': passthrough,
+            'volume': volume,
+            'duration': info.get('duration'),
+            'position': position,
+            'bitrate': bitrate,
+            'cutoff': cutoff,
+        }
+        loop = asyncio.get_running_loop()
+        error = None
+        for address in sorted(self.addresses, key=self.active.get):
+            connecting = loop.run_in_executor(None, connect, address, request, self.timeout, self.secret)
+            try:
+                sock, reader = await asyncio.shield(connecting)
+            except asyncio.CancelledError:
+                # The connection still completes on its thread; close it once it does
+                connecting.add_done_callback(close_connection)
+                raise
+            except OSError as e:
+                self.failures += 1
+                error = e
+                continue
+            source = NodeAudioSource(address, sock, reader, request)
+            self.active[address] += 1
+            source.on_close = lambda address=address: self.release(address)
+            return source
+        raise error or OSError("No audio nodes configured")
+    
+    def release(self, address):
+        self.active[address] -= 1
+    
+    def stats(self):
+        return {'nodes': len(self.addresses), 'streams': sum(self.active.values()), 'failures': self.failures}
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import aiohttp
+from aiohttp import web
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+def plan_clusters(shard_count, clusters):
+    """Split shard ids into contiguous, evenly sized groups, one per worker process"""
+    clusters = max(1, min(clusters, shard_count))
+    base, extra = divmod(shard_count, clusters)
+    plan = []
+    start = 0
+    for cluster_id in range(clusters):
+        size = base + (1 if cluster_id < extra else 0)
+        plan.append(list(range(start, start + size)))
+        start += size
+    return plan
+
+async def recommended_shard_count(token):
+    """Ask Discord how many shards this bot should run and how many may IDENTIFY at once"""
+    headers = {'Authorization': f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_BOT_URL, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data['shards'], data.get('session_start_limit', {}).get('max_concurrency', 1)
+
+class IdentifyGate:
+    """Spaces IDENTIFYs across every worker process.
+    
+    Discord allows one IDENTIFY per 5 seconds in each of max_concurrency
+    buckets, where a shard's bucket is shard_id % max_concurrency. Workers
+    reserve their bucket's next slot in shared memory before connecting, so
+    first starts and restarts stay within the limit however many workers
+    connect at once.
+    """
+    
+    INTERVAL = 5.0
+    
+    def __init__(self, context, max_concurrency=1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.lock = context.Lock()
+        # Wall-clock time of the latest reserved slot per bucket, comparable between processes
+        self.slots = context.RawArray('d', self.max_concurrency)
+    
+    def reserve(self, shard_id):
+        """Claim the next slot in the shard's bucket and return how many seconds to wait for it"""
+        bucket = shard_id % self.max_concurrency
+        with self.lock:
+            now = time.time()
+            at = max(now, self.slots[bucket] + self.INTERVAL)
+            self.slots[bucket] = at
+        return at - now
+
+def add_label(line, name, value):
+    """Add a label to one Prometheus sample line"""
+    metric, sample = line.rsplit(' ', 1)
+    if '{' in metric:
+        metric = metric.replace('{', f'{{{name}="{value}",', 1)
+    else:
+        metric = f'{metric}{{{name}="{value}"}}'
+    return f"{metric} {sample}"
+
+def merge_metrics(texts, label):
+    """Combine several Prometheus text outputs, keeping each metric family together under one TYPE line.
+    
+    texts maps a label value (e.g. a cluster id) to that process's output.
+    """
+    families = {}
+    for value, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# TYPE '):
+                family = families.setdefault(line, [])
+            elif line and not line.startswith('#') and family is not None:
+                family.append(add_label(line, label, value))
+    lines = []
+    for type_line, samples in families.items():
+        lines.append(type_line)
+        lines.extend(samples)
+    return '\n'.join(lines)
+
+class HealthReporter:
+    """Runs inside a worker and sends its shard and player health to the supervisor"""
+    
+    def __init__(self, bot, cluster_id, health_queue, interval=15):
+        self.bot = bot
+        self.cluster_id = cluster_id
+        self.health_queue = health_queue
+        self.interval = interval
+    
+    def snapshot(self):
+        from utils.metrics import metrics
+        
+        commands_cog = self.bot.get_cog('Commands')
+        shards = {}
+        if self.bot.is_ready() and self.bot.shard_count:
+            for shard_id, shard in self.bot.shards.items():
+                shards[shard_id] = {'latency': shard.latency, 'closed': shard.is_closed()}
+        return {
+            'cluster': self.cluster_id,
+            'pid': os.getpid(),
+            'time': time.time(),
+            'ready': self.bot.is_ready(),
+            'guilds': len(self.bot.guilds),
+            'voice_clients': len(self.bot.voice_clients),
+            'players': len(commands_cog.players) if commands_cog else 0,
+            'shards': shards,
+            'tracks_started': metrics.counter('tracks_started'),
+            'metrics': metrics.render()
+        }
+    
+    async def run(self):
+        while True:
+            try:
+                self.health_queue.put_nowait(self.snapshot())
+            except Exception as e:
+                print(f"Cluster {self.cluster_id}: could not report health: {e}")
+            await asyncio.sleep(self.interval)
+
+def worker_main(cluster_id, shard_ids, shard_count, health_queue, health_interval, identify_gate):
+    """Entry point of a cluster worker process"""
+    from bot import create_bot, load_extensions
+    from utils.config import load_config
+    
+    async def run():
+        config = load_config()
+        # The supervisor serves metrics for the whole cluster
+        config['METRICS_PORT'] = 0
+        bot = create_bot(config, shard_ids, shard_count)
+        bot.cluster_id = cluster_id
+        
+        async def before_identify_hook(shard_id, *, initial=False):
+            # Replaces discord.py's fixed 5 s wait, which only spaces this process's own shards
+            await asyncio.sleep(identify_gate.reserve(shard_id))
+        
+        bot.before_identify_hook = before_identify_hook
+        async with bot:
+            await load_extensions(bot)
+            reporter = HealthReporter(bot, cluster_id, health_queue, health_interval)
+            bot.loop.create_task(reporter.run())
+            await bot.start(config['DISCORD_TOKEN'])
+    
+    print(f"Cluster {cluster_id} starting shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count} (pid {os.getpid()})")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+class Worker:
+    __slots__ = ('cluster_id', 'shard_ids', 'process', 'started', 'restarts', 'health', 'last_report')
+    
+    def __init__(self, cluster_id, shard_ids):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started = 0.0
+        self.restarts = 0
+        self.health = {}
+        self.last_report = 0.0
+
+class ClusterSupervisor:
+    """Starts one worker process per shard group, restarts crashed or hung workers and aggregates their health.
+    
+    Workers take turns to IDENTIFY through an IdentifyGate sized by Discord's
+    max_concurrency. A worker that exits or stops reporting for `stale_after`
+    seconds is restarted with exponential backoff. The backoff resets once a worker has
+    stayed up for `stable_after` seconds. With a metrics port set, /metrics
+    serves every worker's metrics labelled by cluster and /health serves
+    their latest health reports as JSON.
+    """
+    
+    def __init__(self, shard_count, clusters, health_interval=15, metrics_host='127.0.0.1', metrics_port=0,
+                 stale_after=None, stable_after=300, max_backoff=60, max_concurrency=1):
+        self.shard_count = shard_count
+        self.workers = [Worker(i, shards) for i, shards in enumerate(plan_clusters(shard_count, clusters))]
+        self.health_interval = health_interval
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self.stale_after = stale_after or health_interval * 4
+        self.stable_after = stable_after
+        self.max_backoff = max_backoff
+        self.context = multiprocessing.get_context('spawn')
+        self.health_queue = self.context.Queue()
+        self.identify_gate = IdentifyGate(self.context, max_concurrency)
+        self.stopping = False
+        self.runner = None
+    
+    @classmethod
+    async def from_config(cls, config, clusters=None, shard_count=None):
+        clusters = clusters or config.get('CLUSTERS', 1)
+        shard_count = shard_count or config.get('SHARD_COUNT')
+        # Without the gateway's answer, assume the smallest identify concurrency
+        max_concurrency = 1
+        if not shard_count:
+            shard_count, max_concurrency = await recommended_shard_count(config['DISCORD_TOKEN'])
+            print(f"Discord recommends {shard_count} shard(s), {max_concurrency} IDENTIFY at a time")
+        # Every worker needs at least one shard
+        shard_count = max(shard_count, clusters)
+        return cls(
+            shard_count,
+            clusters,
+            health_interval=config.get('CLUSTER_HEALTH_INTERVAL', 15),
+            metrics_host=config.get('METRICS_HOST', '127.0.0.1'),
+            metrics_port=config.get('METRICS_PORT', 0),
+            max_concurrency=max_concurrency
+        )
+    
+    def spawn(self, worker):
+        worker.process = self.context.Process(
+            target=worker_main,
+            args=(worker.cluster_id, worker.shard_ids, self.shard_count, self.health_queue, self.health_interval, self.identify_gate),
+            name=f"cluster-{worker.cluster_id}",
+            daemon=False
+        )
+        worker.process.start()
+        worker.started = time.monotonic()
+        worker.last_report = worker.started
+        worker.health = {}
+    
+    def backoff(self, worker):
+        return min(self.max_backoff, 2 ** min(worker.restarts, 6))
+    
+    async def restart(self, worker, reason):
+        if time.monotonic() - worker.started >= self.stable_after:
+            worker.restarts = 0
+        delay = self.backoff(worker)
+        worker.restarts += 1
+        print(f"Cluster {worker.cluster_id} {reason}; restarting in {delay}s (restart #{worker.restarts})")
+        if worker.process.is_alive():
+            worker.process.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.kill()
+        await asyncio.sleep(delay)
+        if not self.stopping:
+            self.spawn(worker)
+    
+    def drain_health(self):
+        while True:
+            try:
+                report = self.health_queue.get_nowait()
+            except queue.Empty:
+                return
+            worker = self.workers[report['cluster']]
+            worker.health = report
+            worker.last_report = time.monotonic()
+    
+    async def monitor(self):
+        restarting = set()
+        last_summary = time.monotonic()
+        while not self.stopping:
+            await asyncio.sleep(1)
+            self.drain_health()
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.cluster_id in restarting:
+                    continue
+                reason = None
+                if not worker.process.is_alive():
+                    reason = f"exited with code {worker.process.exitcode}"
+                elif worker.health and now - worker.last_report > self.stale_after:
+                    reason = f"stopped reporting for {now - worker.last_report:.0f}s"
+                if reason and not self.stopping:
+                    restarting.add(worker.cluster_id)
+                    task = asyncio.create_task(self.restart(worker, reason))
+                    task.add_done_callback(lambda _, cluster_id=worker.cluster_id: restarting.discard(cluster_id))
+            if now - last_summary >= self.health_interval * 4:
+                last_summary = now
+                self.print_summary()
+    
+    def summary(self):
+        clusters = []
+        for worker in self.workers:
+            health = worker.health
+            latencies = [shard['latency'] for shard in health.get('shards', {}).values()]
+            clusters.append({
+                'cluster': worker.cluster_id,
+                'shards': worker.shard_ids,
+                'pid': worker.process.pid if worker.process else None,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'restarts': worker.restarts,
+                'ready': health.get('ready', False),
+                'guilds': health.get('guilds', 0),
+                'voice_clients': health.get('voice_clients', 0),
+                'players': health.get('players', 0),
+                'tracks_started': health.get('tracks_started', 0),
+                'max_latency': max(latencies) if latencies else None,
+                'report_age': time.monotonic() - worker.last_report if health else None,
+                'shard_health': {str(shard_id): shard for shard_id, shard in health.get('shards', {}).items()}
+            })
+        return {
+            'shard_count': self.shard_count,
+            'guilds': sum(cluster['guilds'] for cluster in clusters),
+            'voice_clients': sum(cluster['voice_clients'] for cluster in clusters),
+            'clusters': clusters
+        }
+    
+    def print_summary(self):
+        summary = self.summary()
+        print(f"Cluster status: {summary['guilds']} guilds, {summary['voice_clients']} voice connections")
+        for cluster in summary['clusters']:
+            latency = f"{cluster['max_latency'] * 1000:.0f} ms" if cluster['max_latency'] is not None else "-"
+            state = "ready" if cluster['ready'] else ("starting" if cluster['alive'] else "down")
+            print(
+                f"  cluster {cluster['cluster']} shards {cluster['shards'][0]}-{cluster['shards'][-1]}: {state}, "
+                f"{cluster['guilds']} guilds, {cluster['voice_clients']} voice, latency {latency}, restarts {cluster['restarts']}"
+            )
+    
+    def render_metrics(self):
+        texts = {worker.cluster_id: worker.health['metrics'] for worker in self.workers if worker.health.get('metrics')}
+        parts = [merge_metrics(texts, 'cluster')] if texts else []
+        parts.append("# TYPE musicbot_cluster_up gauge")
+        for worker in self.workers:
+            up = 1 if worker.process and worker.process.is_alive() else 0
+            parts.append(f'musicbot_cluster_up{{cluster="{worker.cluster_id}"}} {up}')
+        parts.append("# TYPE musicbot_cluster_restarts gauge")
+        for worker in self.workers:
+            parts.append(f'musicbot_cluster_restarts{{cluster="{worker.cluster_id}"}} {worker.restarts}')
+        return '\n'.join(parts) + '\n'
+    
+    async def start_http(self):
+        async def metrics_handler(request):
+            return web.Response(text=self.render_metrics(), content_type='text/plain', charset='utf-8')
+        
+        async def health_handler(request):
+            return web.Response(text=json.dumps(self.summary(), indent=2), content_type='application/json')
+        
+        app = web.Application()
+        app.router.add_get('/metrics', metrics_handler)
+        app.router.add_get('/health', health_handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.metrics_host, self.metrics_port).start()
+        print(f"Cluster metrics at http://{self.metrics_host}:{self.metrics_port}/metrics and /health")
+    
+    def stop(self):
+        self.stopping = True
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        print(f"Starting {len(self.workers)} cluster worker(s) for {self.shard_count} shard(s)")
+        for worker in self.workers:
+            self.spawn(worker)
+        if self.metrics_port:
+            await self.start_http()
+        
+        try:
+            await self.monitor()
+        finally:
+            print("Stopping cluster workers...")
+            for worker in self.workers:
+                if worker.process and worker.process.is_alive():
+                    worker.process.terminate()
+            for worker in self.workers:
+                if worker.process:
+                    await loop.run_in_executor(None, worker.process.join, 15)
+                    if worker.process.is_alive():
+                        worker.process.kill()
+            if self.runner:
+                await self.runner.cleanup()
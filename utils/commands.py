@@ -3,247 +3,290 @@ from discord.ext import commands
 from typing import Dict, List, Optional
 
 class CommandManager:
-    def __init__(self):
-        self.commands: Dict[str, dict] = {
+    """Help lookup and embeds derived from the bot's registered commands.
+    
+    Names and aliases always come from bot.commands; the metadata below only
+    supplies help text. The alias index and every help embed are built once
+    and rebuilt only when the command registry changes.
+    """
+    
+    def __init__(self, bot=None):
+        self.bot = bot
+        self.commands: Dict[str, dict] = {}
+        self.index: Dict[str, dict] = {}
+        self.categories: Dict[str, List[dict]] = {}
+        self.command_embeds: Dict[str, discord.Embed] = {}
+        self.category_embeds: Dict[str, discord.Embed] = {}
+        self.overview_embed: Optional[discord.Embed] = None
+        self._registry_size = None
+        
+        # Help text for registered commands, keyed by command name
+        self.metadata: Dict[str, dict] = {
             "join": {
-                "name": "join",
                 "description": "Joins the voice channel you're in",
                 "usage": "!join",
-                "category": "Music Control",
-                "aliases": ["j"]
+                "category": "Music Control"
             },
             "leave": {
-                "name": "leave",
                 "description": "Leaves the voice channel",
                 "usage": "!leave",
-                "category": "Music Control",
-                "aliases": ["l", "disconnect"]
+                "category": "Music Control"
             },
             "play": {
-                "name": "play",
                 "description": "Plays a song from YouTube",
                 "usage": "!play <song name or YouTube URL>",
-                "category": "Music Control",
-                "aliases": ["p"]
+                "category": "Music Control"
             },
             "skip": {
-                "name": "skip",
                 "description": "Skips the current song",
                 "usage": "!skip",
-                "category": "Music Control",
-                "aliases": ["s", "next"]
+                "category": "Music Control"
+            },
+            "seek": {
+                "description": "Jumps to a time in the current song",
+                "usage": "!seek <1:30|90|+15|-10>",
+                "category": "Music Control"
             },
             "pause": {
-                "name": "pause",
                 "description": "Pauses the current song",
                 "usage": "!pause",
-                "category": "Music Control",
-                "aliases": []
+                "category": "Music Control"
             },
             "resume": {
-                "name": "resume",
                 "description": "Resumes the paused song",
                 "usage": "!resume",
-                "category": "Music Control",
-                "aliases": []
+                "category": "Music Control"
             },
             "stop": {
-                "name": "stop",
                 "description": "Stops playback and clears the queue",
                 "usage": "!stop",
-                "category": "Music Control",
-                "aliases": []
+                "category": "Music Control"
+            },
+            "queue": {
+                "description": "Shows the music queue, one page at a time",
+                "usage": "!queue [page]",
+                "category": "Queue Management"
             },
             "clear": {
-                "name": "clear",
                 "description": "Clears the music queue",
                 "usage": "!clear",
-                "category": "Queue Management",
-                "aliases": []
+                "category": "Queue Management"
             },
             "remove": {
-                "name": "remove",
                 "description": "Removes a song from the queue",
                 "usage": "!remove <song number>",
-                "category": "Queue Management",
-                "aliases": ["rm", "delete"]
+                "category": "Queue Management"
             },
             "shuffle": {
-                "name": "shuffle",
                 "description": "Shuffles the music queue",
                 "usage": "!shuffle",
-                "category": "Queue Management",
-                "aliases": []
+                "category": "Queue Management"
             },
             "now": {
-                "name": "now",
                 "description": "Shows the currently playing song",
                 "usage": "!now",
-                "category": "Information",
-                "aliases": ["np", "current"]
+                "category": "Information"
             },
             "help": {
-                "name": "help",
                 "description": "Shows this help message",
                 "usage": "!help [command]",
-                "category": "Information",
-                "aliases": ["h", "commands"]
+                "category": "Information"
+            },
+            "ping": {
+                "description": "Checks that the bot is responding",
+                "usage": "!ping",
+                "category": "Information"
             },
             "volume": {
-                "name": "volume",
                 "description": "Sets the volume (0-200)",
                 "usage": "!volume <0-200>",
-                "category": "Settings",
-                "aliases": ["vol", "v"]
+                "category": "Settings"
             },
             "loop": {
-                "name": "loop",
                 "description": "Toggles loop mode for current song",
                 "usage": "!loop",
-                "category": "Settings",
-                "aliases": []
+                "category": "Settings"
             },
             "playlist": {
-                "name": "playlist",
                 "description": "Save or load a playlist",
                 "usage": "!playlist <save|load|list> [name]",
-                "category": "Advanced",
-                "aliases": ["pl"]
+                "category": "Advanced"
             },
             "stats": {
-                "name": "stats",
                 "description": "Shows bot statistics",
                 "usage": "!stats",
-                "category": "Advanced",
-                "aliases": []
+                "category": "Advanced"
             },
             "youtube_test": {
-                "name": "youtube_test",
                 "description": "Test YouTube API connection",
                 "usage": "!youtube_test",
-                "category": "Advanced",
-                "aliases": []
+                "category": "Advanced"
             },
             "quality": {
-                "name": "quality",
                 "description": "Set audio quality (low, medium, high)",
                 "usage": "!quality <low|medium|high>",
-                "category": "Settings",
-                "aliases": []
+                "category": "Settings"
             },
             "optimize": {
-                "name": "optimize",
                 "description": "Optimize streaming settings",
                 "usage": "!optimize",
-                "category": "Settings",
-                "aliases": []
+                "category": "Settings"
             },
             "buffer": {
-                "name": "buffer",
                 "description": "Set buffer size (small, medium, large)",
                 "usage": "!buffer <small|medium|large>",
-                "category": "Settings",
-                "aliases": []
+                "category": "Settings"
             },
             "diag": {
-                "name": "diag",
-                "description": "Run network diagnostics",
+                "description": "Measure DNS, TLS, first byte and throughput to the current stream host",
                 "usage": "!diag",
-                "category": "Advanced",
-                "aliases": []
+                "category": "Advanced"
             },
             "streaming_help": {
-                "name": "streaming_help",
                 "description": "Show tips for reducing lag",
                 "usage": "!streaming_help",
-                "category": "Information",
-                "aliases": []
+                "category": "Information"
             },
             "controls": {
-                "name": "controls",
                 "description": "Show the music control panel",
                 "usage": "!controls",
-                "category": "UI Control",
-                "aliases": ["ui", "panel"]
+                "category": "UI Control"
             },
             "hide_controls": {
-                "name": "hide_controls",
                 "description": "Hide the music control panel",
                 "usage": "!hide_controls",
-                "category": "UI Control",
-                "aliases": ["hide"]
+                "category": "UI Control"
             },
             "auto_controls": {
-                "name": "auto_controls",
                 "description": "Toggle automatic control panel display",
                 "usage": "!auto_controls",
-                "category": "UI Control",
-                "aliases": ["auto"]
+                "category": "UI Control"
             },
             "update_controls": {
-                "name": "update_controls",
                 "description": "Update the music control panel",
                 "usage": "!update_controls",
-                "category": "UI Control",
-                "aliases": ["update"]
+                "category": "UI Control"
             }
         }
     
+    
+    def describe(self, command: commands.Command) -> dict:
+        meta = self.metadata.get(command.name, {})
+        usage = f"!{command.qualified_name} {command.signature}".strip()
+        return {
+            "name": command.name,
+            "description": meta.get("description") or command.short_doc or "No description",
+            "usage": meta.get("usage", usage),
+            "category": meta.get("category") or command.cog_name or "Other",
+            "aliases": list(command.aliases)
+        }
+    
+    def build(self, registry=None):
+        """Index and pre-render help for every visible command"""
+        if registry is None:
+            registry = self.bot.commands if self.bot else []
+        
+        self.commands = {}
+        self.index = {}
+        self.categories = {}
+        for command in sorted(registry, key=lambda c: c.name):
+            if command.hidden:
+                continue
+            cmd = self.describe(command)
+            self.commands[cmd["name"]] = cmd
+            self.categories.setdefault(cmd["category"], []).append(cmd)
+            for alias in cmd["aliases"]:
+                self.index[alias] = cmd
+        # Real names win over any alias that happens to collide with them
+        self.index.update(self.commands)
+        
+        self.command_embeds = {name: self.render_command(cmd) for name, cmd in self.commands.items()}
+        self.category_embeds = {
+            category.lower(): self.render_category(category, cmds)
+            for category, cmds in self.categories.items()
+        }
+        self.overview_embed = self.render_overview()
+        self._registry_size = len(self.bot.all_commands) if self.bot else None
+    
+    def refresh(self):
+        """Rebuild when cogs were added or removed since the last build"""
+        if self.bot is None:
+            if self.overview_embed is None:
+                self.build()
+            return
+        if self._registry_size != len(self.bot.all_commands):
+            self.build()
+    
     def get_command(self, name: str) -> Optional[dict]:
-        for cmd_name, cmd_data in self.commands.items():
-            if name == cmd_name or name in cmd_data["aliases"]:
-                return cmd_data
-        return None
+        self.refresh()
+        return self.index.get(name.lstrip("!").lower())
     
     def get_commands_by_category(self, category: str) -> List[dict]:
-        return [cmd for cmd in self.commands.values() if cmd["category"] == category]
+        self.refresh()
+        return self.categories.get(category, [])
     
     def get_all_categories(self) -> List[str]:
-        categories = set()
-        for cmd in self.commands.values():
-            categories.add(cmd["category"])
-        return sorted(list(categories))
+        self.refresh()
+        return sorted(self.categories)
     
-    def create_help_embed(self, command_name: Optional[str] = None) -> discord.Embed:
-        if command_name:
-            cmd = self.get_command(command_name)
-            if not cmd:
-                return discord.Embed(
-                    title="❌ Command Not Found",
-                    description=f"Command `{command_name}` not found.",
-                    color=discord.Color.red()
-                )
-            
-            embed = discord.Embed(
-                title=f"Command: !{cmd['name']}",
-                description=cmd["description"],
-                color=discord.Color.blue()
-            )
-            embed.add_field(name="Usage", value=f"`{cmd['usage']}`", inline=False)
-            embed.add_field(name="Category", value=cmd["category"], inline=True)
-            
-            if cmd["aliases"]:
-                embed.add_field(
-                    name="Aliases", 
-                    value=", ".join([f"`!{alias}`" for alias in cmd["aliases"]]), 
-                    inline=True
-                )
-            
-            return embed
-        else:
-            embed = discord.Embed(
-                title="🎵 Music Bot Commands",
-                description="Here are all available commands:",
-                color=discord.Color.blue()
+    def render_command(self, cmd: dict) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"Command: !{cmd['name']}",
+            description=cmd["description"],
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Usage", value=f"`{cmd['usage']}`", inline=False)
+        embed.add_field(name="Category", value=cmd["category"], inline=True)
+        
+        if cmd["aliases"]:
+            embed.add_field(
+                name="Aliases", 
+                value=", ".join([f"`!{alias}`" for alias in cmd["aliases"]]), 
+                inline=True
             )
-            
-            for category in self.get_all_categories():
-                commands = self.get_commands_by_category(category)
-                cmd_list = "\n".join([
-                    f"`!{cmd['name']}` - {cmd['description']}" 
-                    for cmd in commands
-                ])
-                embed.add_field(name=category, value=cmd_list, inline=False)
-            
-            embed.set_footer(text="Use !help <command> for more info on a specific command")
-            return embed
\ No newline at end of file
+        
+        return embed
+    
+    def render_category(self, category: str, cmds: List[dict]) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"🎵 {category}",
+            description="\n".join([f"`!{cmd['name']}` - {cmd['description']}" for cmd in cmds]),
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text="Use !help <command> for more info on a specific command")
+        return embed
+    
+    def render_overview(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="🎵 Music Bot Commands",
+            description="Here are all available commands:",
+            color=discord.Color.blue()
+        )
+        
+        for category in sorted(self.categories):
+            cmd_list = "\n".join([
+                f"`!{cmd['name']}` - {cmd['description']}" 
+                for cmd in self.categories[category]
+            ])
+            embed.add_field(name=category, value=cmd_list, inline=False)
+        
+        embed.set_footer(text="Use !help <command> or !help <category> for more info")
+        return embed
+    
+    def create_help_embed(self, command_name: Optional[str] = None) -> discord.Embed:
+        self.refresh()
+        if not command_name:
+            return self.overview_embed
+        
+        key = command_name.lstrip("!").lower()
+        cmd = self.index.get(key)
+        if cmd:
+            return self.command_embeds[cmd["name"]]
+        if key in self.category_embeds:
+            return self.category_embeds[key]
+        
+        return discord.Embed(
+            title="❌ Command Not Found",
+            description=f"Command `{command_name}` not found.",
+            color=discord.Color.red()
+        )
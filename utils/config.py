@@ -11,12 +11,82 @@ def load_config():
     return {
         'DISCORD_TOKEN': os.getenv('DISCORD_TOKEN'),
         'YOUTUBE_API_KEY': os.getenv('YOUTUBE_API_KEY'),
-        'FFMPEG_OPTIONS': {
-            'options': '-vn -b:a 128k -ar 44100',
-            'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -threads 2'
-        },
+        # Seconds an idle guild player is kept before it is freed
+        'PLAYER_IDLE_TIMEOUT': int(os.getenv('PLAYER_IDLE_TIMEOUT', '600')),
+        # Shared HTTP client used for API requests
+        'HTTP_TIMEOUT': float(os.getenv('HTTP_TIMEOUT', '10')),
+        'HTTP_CONNECT_TIMEOUT': float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+        'HTTP_POOL_SIZE': int(os.getenv('HTTP_POOL_SIZE', '20')),
+        # Query -> video id cache for YouTube searches
+        'SEARCH_CACHE_SIZE': int(os.getenv('SEARCH_CACHE_SIZE', '1000')),
+        'SEARCH_CACHE_TTL': int(os.getenv('SEARCH_CACHE_TTL', '86400')),
+        'SEARCH_CACHE_FILE': os.getenv('SEARCH_CACHE_FILE', os.path.join(base_dir, 'search_cache.json')),
+        # Seconds before a stream URL's expiry at which it is re-resolved
+        'STREAM_CACHE_MARGIN': int(os.getenv('STREAM_CACHE_MARGIN', '300')),
+        # Number of upcoming queue entries kept resolved ahead of playback
+        'PREFETCH_DEPTH': int(os.getenv('PREFETCH_DEPTH', '2')),
+        # Start FFmpeg for the next track before the current one ends
+        'PREFETCH_WARM_FFMPEG': os.getenv('PREFETCH_WARM_FFMPEG', 'false').lower() == 'true',
+        # yt-dlp extraction workers: 'thread' or 'process'
+        'EXTRACTOR_MODE': os.getenv('EXTRACTOR_MODE', 'thread'),
+        'EXTRACTOR_WORKERS': int(os.getenv('EXTRACTOR_WORKERS', '4')),
+        'EXTRACTOR_TIMEOUT': float(os.getenv('EXTRACTOR_TIMEOUT', '30')),
+        # Send Opus streams without re-encoding when the volume is at 100%
+        'AUDIO_PASSTHROUGH': os.getenv('AUDIO_PASSTHROUGH', 'true').lower() == 'true',
+        # Where PCM volume is applied: 'ffmpeg' (filter graph), 'numpy' or 'transformer'
+        'VOLUME_MODE': os.getenv('VOLUME_MODE', 'ffmpeg'),
+        # Local copies of frequently played tracks
+        'AUDIO_CACHE_ENABLED': os.getenv('AUDIO_CACHE_ENABLED', 'false').lower() == 'true',
+        'AUDIO_CACHE_DIR': os.getenv('AUDIO_CACHE_DIR', os.path.join(base_dir, 'audio_cache')),
+        'AUDIO_CACHE_MAX_MB': int(os.getenv('AUDIO_CACHE_MAX_MB', '1024')),
+        'AUDIO_CACHE_MIN_PLAYS': int(os.getenv('AUDIO_CACHE_MIN_PLAYS', '3')),
+        # Larger downloads are skipped, e.g. hour-long mixes
+        'AUDIO_CACHE_MAX_FILE_MB': int(os.getenv('AUDIO_CACHE_MAX_FILE_MB', '100')),
+        # SQLite database for saved playlists (an old playlists.json is imported once)
+        'PLAYLIST_DB': os.getenv('PLAYLIST_DB', os.path.join(base_dir, 'playlists.db')),
+        'PLAYLIST_LEGACY_JSON': os.getenv('PLAYLIST_LEGACY_JSON', os.path.join(base_dir, 'playlists.json')),
+        # Control panel edits are coalesced and spaced to stay under rate limits
+        'PANEL_DEBOUNCE': float(os.getenv('PANEL_DEBOUNCE', '0.75')),
+        'PANEL_MIN_INTERVAL': float(os.getenv('PANEL_MIN_INTERVAL', '1.5')),
+        # Local Prometheus endpoint for playback metrics; 0 disables it
+        'METRICS_PORT': int(os.getenv('METRICS_PORT', '0')),
+        'METRICS_HOST': os.getenv('METRICS_HOST', '127.0.0.1'),
+        # Event loop watchdog and sampling profiler (also toggled by the owner with !watchdog / !profile)
+        'WATCHDOG_ENABLED': os.getenv('WATCHDOG_ENABLED', 'false').lower() == 'true',
+        'WATCHDOG_THRESHOLD_MS': int(os.getenv('WATCHDOG_THRESHOLD_MS', '250')),
+        'PROFILER_ENABLED': os.getenv('PROFILER_ENABLED', 'false').lower() == 'true',
+        'PROFILER_INTERVAL_MS': int(os.getenv('PROFILER_INTERVAL_MS', '10')),
+        'DIAGNOSTICS_DIR': os.getenv('DIAGNOSTICS_DIR', os.path.join(base_dir, 'diagnostics')),
+        # Command tracing spans written in Chrome trace event format
+        'TRACING_ENABLED': os.getenv('TRACING_ENABLED', 'false').lower() == 'true',
+        'TRACE_FILE': os.getenv('TRACE_FILE', os.path.join(base_dir, 'diagnostics', 'trace.json')),
+        'TRACE_MIN_MS': int(os.getenv('TRACE_MIN_MS', '0')),
+        # Run as an AutoShardedBot; run.py --clusters spreads the shards over worker processes
+        'SHARDING_ENABLED': os.getenv('SHARDING_ENABLED', 'false').lower() == 'true',
+        # Total shards across all clusters; 0 uses Discord's recommendation
+        'SHARD_COUNT': int(os.getenv('SHARD_COUNT', '0')),
+        'CLUSTERS': int(os.getenv('CLUSTERS', '1')),
+        # Seconds between worker health reports; a worker silent for four intervals is restarted
+        'CLUSTER_HEALTH_INTERVAL': int(os.getenv('CLUSTER_HEALTH_INTERVAL', '15')),
+        # Audio node addresses (host:port, comma separated) that run FFmpeg and Opus encoding; empty plays in-process
+        'AUDIO_NODES': os.getenv('AUDIO_NODES', ''),
+        'AUDIO_NODE_TIMEOUT': float(os.getenv('AUDIO_NODE_TIMEOUT', '5')),
+        # Shared by the bot and its nodes; required for a node that listens beyond loopback
+        'AUDIO_NODE_SECRET': os.getenv('AUDIO_NODE_SECRET', ''),
+        # Default Opus bitrate in kbps sent to Discord; !quality changes it per server
+        'AUDIO_BITRATE': int(os.getenv('AUDIO_BITRATE', '128')),
+        # Lower a server's bitrate and grow FFmpeg's input buffer while its playback struggles
+        'ADAPTIVE_STREAMING': os.getenv('ADAPTIVE_STREAMING', 'true').lower() == 'true',
+        'ADAPTIVE_MIN_BITRATE': int(os.getenv('ADAPTIVE_MIN_BITRATE', '64')),
+        'ADAPTIVE_MAX_LATENCY_MS': int(os.getenv('ADAPTIVE_MAX_LATENCY_MS', '250')),
+        'ADAPTIVE_INTERVAL': int(os.getenv('ADAPTIVE_INTERVAL', '10')),
+        # !diag downloads up to this much of the current stream (or stops after this many seconds) to measure throughput
+        'DIAG_PROBE_MB': int(os.getenv('DIAG_PROBE_MB', '2')),
+        'DIAG_PROBE_SECONDS': float(os.getenv('DIAG_PROBE_SECONDS', '3')),
+        'DIAG_HISTORY': int(os.getenv('DIAG_HISTORY', '10')),
         'YTDL_OPTIONS': {
-            'format': 'bestaudio/best',
+            # Prefer Opus (webm/251) so playback can skip the decode/re-encode step
+            'format': 'bestaudio[acodec=opus]/bestaudio/best',
             'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
             'restrictfilenames': True,
             'noplaylist': False,
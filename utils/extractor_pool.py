@@ -0,0 +1,177 @@
+import asyncio
+import concurrent.futures
+import threading
+import yt_dlp
+from utils.track import compact_info
+
+# YoutubeDL instances are reused per worker thread (or per worker process)
+_local = threading.local()
+
+def _options_key(options):
+    return repr(sorted((options or {}).items()))
+
+def get_ytdl(options):
+    """Return this worker's YoutubeDL for the given options, creating it on first use"""
+    instances = getattr(_local, 'instances', None)
+    if instances is None:
+        instances = _local.instances = {}
+    key = _options_key(options)
+    ytdl = instances.get(key)
+    if ytdl is None:
+        ytdl = instances[key] = yt_dlp.YoutubeDL(options)
+    return ytdl
+
+def extract_job(url, options, download, compact=True):
+    """Worker entry point: extract_info with this worker's YoutubeDL, trimmed to INFO_FIELDS"""
+    ytdl = get_ytdl(options)
+    data = ytdl.extract_info(url, download=download)
+    if download and data and 'entries' not in data:
+        data['_filename'] = ytdl.prepare_filename(data)
+    if compact and data:
+        data = compact_result(data)
+    return data
+
+def compact_result(data):
+    """Trim an extract_info result inside the worker so the raw info never reaches the bot"""
+    if 'entries' in data:
+        return {'entries': [compact_info(entry) for entry in data['entries'] if entry]}
+    info = compact_info(data)
+    if '_filename' in data:
+        info['_filename'] = data['_filename']
+    return info
+
+def signal_started(loop, started, func, *args):
+    """Thread worker entry point: tell the event loop the job was picked up, then run it"""
+    try:
+        loop.call_soon_threadsafe(started.set)
+    except RuntimeError:
+        # The loop is already closed during shutdown
+        pass
+    return func(*args)
+
+class ExtractorPool:
+    """Bounded pool for yt-dlp extraction jobs.
+    
+    Workers are threads by default, or processes (mode='process') so that page
+    parsing runs outside the bot's GIL. Background jobs such as prefetching can
+    only use part of the pool so interactive !play requests are never starved.
+    """
+    
+    def __init__(self, workers=4, mode='thread', timeout=30, background_share=0.5):
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.timeout = timeout
+        self.thread_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix='ytdl'
+        )
+        if mode == 'process':
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = self.thread_executor
+        self.slots = asyncio.Semaphore(self.workers)
+        self.background_slots = asyncio.Semaphore(max(1, int(self.workers * background_share)))
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            workers=config.get('EXTRACTOR_WORKERS', 4),
+            mode=config.get('EXTRACTOR_MODE', 'thread'),
+            timeout=config.get('EXTRACTOR_TIMEOUT', 30)
+        )
+    
+    async def extract(self, url, options, *, download=False, background=False, compact=True):
+        """Run extract_info on a pooled worker and return the (by default compacted) info dict"""
+        return await self._submit(self.executor, extract_job, url, options, download, compact, background=background)
+    
+    async def run(self, func, *args, background=False):
+        """Run any callable on a pool thread under the same limits, e.g. paging a lazy playlist"""
+        return await self._submit(self.thread_executor, func, *args, background=background)
+    
+    async def _submit(self, executor, func, *args, background=False):
+        self.pending += 1
+        try:
+            if background:
+                await self.background_slots.acquire()
+            try:
+                await self.slots.acquire()
+            except BaseException:
+                if background:
+                    self.background_slots.release()
+                raise
+        finally:
+            self.pending -= 1
+        
+        self.active += 1
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        try:
+            if executor is self.thread_executor:
+                future = executor.submit(signal_started, loop, started, func, *args)
+            else:
+                # Admitted jobs never outnumber the worker processes, so one picks this up at once
+                started.set()
+                future = executor.submit(func, *args)
+        except BaseException:
+            self._release(background)
+            raise
+        # A timed-out job keeps running on its worker (threads can't be interrupted),
+        # so its slots are only given back once it really finishes
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, background, started))
+        
+        try:
+            # Time queued in the executor doesn't count against the timeout
+            await started.wait()
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.timed_out += 1
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        
+        self.completed += 1
+        return result
+    
+    def _release(self, background):
+        self.active -= 1
+        self.slots.release()
+        if background:
+            self.background_slots.release()
+    
+    def _finished(self, background, started):
+        # Also wakes a waiter whose job was cancelled before any worker picked it up
+        started.set()
+        self._release(background)
+    
+    def _release_threadsafe(self, loop, background, started):
+        try:
+            loop.call_soon_threadsafe(self._finished, background, started)
+        except RuntimeError:
+            # The loop is already closed during shutdown
+            pass
+    
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'pending': self.pending,
+            'active': self.active,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out
+        }
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        if self.thread_executor is not self.executor:
+            self.thread_executor.shutdown(wait=False)
@@ -0,0 +1,188 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# Seconds; spans cache hits (milliseconds) up to slow extractions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Fixed-bucket latency histogram with Prometheus-style cumulative output"""
+    
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+    
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that holds it, capped at the largest value seen"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+    
+    def cumulative(self):
+        total = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            total += bucket_count
+            yield bound, total
+        yield '+Inf', self.count
+
+class Metrics:
+    """Counters and histograms, kept globally and per guild.
+    
+    Every observation with a guild_id lands in both the global series and the
+    guild's own series. The audio thread records first-packet times, so
+    updates are guarded by a lock.
+    """
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.help = {}
+        self._lock = threading.Lock()
+    
+    def describe(self, name, text):
+        self.help[name] = text
+    
+    def observe(self, name, value, guild_id=None):
+        with self._lock:
+            for key in ((name, None), (name, guild_id)) if guild_id is not None else ((name, None),):
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(self.buckets)
+                histogram.observe(value)
+    
+    def inc(self, name, guild_id=None, amount=1):
+        with self._lock:
+            self.counters[(name, None)] = self.counters.get((name, None), 0) + amount
+            if guild_id is not None:
+                self.counters[(name, guild_id)] = self.counters.get((name, guild_id), 0) + amount
+    
+    def gauge(self, name, func):
+        """Register a callable sampled whenever metrics are exported"""
+        self.gauges[name] = func
+    
+    @contextmanager
+    def timer(self, name, guild_id=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, guild_id)
+    
+    def histogram(self, name, guild_id=None):
+        return self.histograms.get((name, guild_id))
+    
+    def counter(self, name, guild_id=None):
+        return self.counters.get((name, guild_id), 0)
+    
+    def summary(self, name, guild_id=None):
+        """Short "p50 / p95 (n)" text for !stats"""
+        histogram = self.histogram(name, guild_id)
+        if histogram is None or not histogram.count:
+            return "no data"
+        return f"p50 {histogram.quantile(0.5) * 1000:.0f} ms / p95 {histogram.quantile(0.95) * 1000:.0f} ms ({histogram.count})"
+    
+    def retain_guilds(self, keep):
+        """Drop per-guild series for guilds where keep(guild_id) is false"""
+        with self._lock:
+            for table in (self.histograms, self.counters):
+                for key in [key for key in table if key[1] is not None and not keep(key[1])]:
+                    del table[key]
+    
+    def render(self, prefix='musicbot_'):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            counters = sorted(self.counters.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            histograms = [(key, (list(h.cumulative()), h.sum, h.count)) for key, h in histograms]
+        
+        declared = set()
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {prefix}{name} {self.help[name]}")
+                lines.append(f"# TYPE {prefix}{name} {kind}")
+        
+        def labels(guild_id, extra=None):
+            pairs = []
+            if guild_id is not None:
+                pairs.append(f'guild="{guild_id}"')
+            if extra:
+                pairs.append(extra)
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+        
+        for (name, guild_id), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{prefix}{name}_total{labels(guild_id)} {value}")
+        
+        for (name, guild_id), (buckets, total, count) in histograms:
+            declare(name, 'histogram')
+            for bound, cumulative in buckets:
+                le = f'le="{bound}"'
+                lines.append(f"{prefix}{name}_bucket{labels(guild_id, le)} {cumulative}")
+            lines.append(f"{prefix}{name}_sum{labels(guild_id)} {total:.6f}")
+            lines.append(f"{prefix}{name}_count{labels(guild_id)} {count}")
+        
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            declare(name, 'gauge')
+            lines.append(f"{prefix}{name} {value}")
+        
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves /metrics on a local port for Prometheus to scrape"""
+    
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+    
+    async def handle(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+    
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        print(f"Metrics available at http://{self.host}:{self.port}/metrics")
+    
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+metrics = Metrics()
@@ -1,9 +1,20 @@
+import time
+from utils.track import TrackQueue
+
 class MusicPlayer:
-    def __init__(self):
-        self.queue = []
+    def __init__(self, guild_id=None):
+        self.guild_id = guild_id
+        self.queue = TrackQueue()
         self.current = None
         self.volume = 0.5
         self.loop = False
+        self.last_active = time.monotonic()
+    
+    def touch(self):
+        self.last_active = time.monotonic()
+    
+    def is_idle(self):
+        return self.current is None and not self.queue
     
     def add_to_queue(self, item):
         self.queue.append(item)
@@ -23,4 +34,4 @@ class MusicPlayer:
         return True
     
     def resume(self):
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,169 @@
+import asyncio
+import collections
+import socket
+import ssl
+import statistics
+import time
+from urllib.parse import urlsplit
+
+class ProbeResult:
+    """Timings from one probe of a stream host; phases that did not happen stay None"""
+    
+    __slots__ = ('url', 'host', 'address', 'at', 'dns', 'connect', 'tls', 'ttfb', 'status', 'bytes', 'transfer', 'error')
+    
+    def __init__(self, url):
+        self.url = url
+        self.host = urlsplit(url).hostname
+        self.address = None
+        self.at = time.time()
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.ttfb = None
+        self.status = None
+        self.bytes = 0
+        self.transfer = None
+        self.error = None
+    
+    @property
+    def ok(self):
+        return self.error is None
+    
+    @property
+    def throughput(self):
+        """Body bytes per second after the first byte arrived"""
+        if not self.transfer or not self.bytes:
+            return None
+        return self.bytes / self.transfer
+    
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def format_ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.0f} ms"
+
+def format_rate(bytes_per_second):
+    return '-' if bytes_per_second is None else f"{bytes_per_second * 8 / 1_000_000:.1f} Mbit/s"
+
+async def probe(url, max_bytes=2 * 1024 * 1024, max_seconds=3.0, timeout=10.0, ssl_context=None):
+    """Fetch the start of `url` over a fresh connection, timing each phase separately.
+    
+    DNS, TCP connect, TLS handshake and time to first byte are measured one
+    after the other with raw asyncio streams, so connection reuse or a proxy
+    in an HTTP client can't hide any of them. The body is then read until
+    `max_bytes` or `max_seconds` to measure sustained throughput. Never
+    raises; failures are recorded in `error` along with the phases that
+    completed.
+    """
+    result = ProbeResult(url)
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    loop = asyncio.get_running_loop()
+    writer = None
+    try:
+        started = time.perf_counter()
+        infos = await asyncio.wait_for(loop.getaddrinfo(result.host, port, type=socket.SOCK_STREAM), timeout)
+        result.dns = time.perf_counter() - started
+        
+        # Addresses are tried in order, as FFmpeg does, so a host without an IPv6 route still connects
+        for index, (family, kind, proto, _, address) in enumerate(infos):
+            sock = socket.socket(family, kind, proto)
+            sock.setblocking(False)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+                break
+            except OSError:
+                sock.close()
+                if index == len(infos) - 1:
+                    raise
+            except BaseException:
+                sock.close()
+                raise
+        result.address = address[0]
+        result.connect = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        try:
+            if secure:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                    sock=sock, ssl=ssl_context or ssl.create_default_context(), server_hostname=result.host
+                ), timeout)
+                result.tls = time.perf_counter() - started
+            else:
+                reader, writer = await asyncio.open_connection(sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+        
+        writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Range: bytes=0-{max_bytes - 1}\r\n"
+            "User-Agent: Mozilla/5.0\r\n"
+            "Accept: */*\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode())
+        started = time.perf_counter()
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+        result.ttfb = time.perf_counter() - started
+        result.status = int(head.split(b' ', 2)[1])
+        if result.status >= 400:
+            result.error = f"HTTP {result.status}"
+            return result
+        
+        started = time.perf_counter()
+        deadline = started + max_seconds
+        while result.bytes < max_bytes:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            result.bytes += len(chunk)
+        result.transfer = time.perf_counter() - started
+    except asyncio.TimeoutError:
+        result.error = f"timed out after {timeout:.0f}s"
+    except (OSError, ssl.SSLError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, IndexError) as e:
+        result.error = str(e) or type(e).__name__
+    finally:
+        if writer is not None:
+            writer.close()
+    return result
+
+class ProbeHistory:
+    """The last few probe results per guild, to compare a new run against"""
+    
+    def __init__(self, size=10):
+        self.size = size
+        self.results = {}
+    
+    def add(self, guild_id, result):
+        history = self.results.get(guild_id)
+        if history is None:
+            history = self.results[guild_id] = collections.deque(maxlen=self.size)
+        history.append(result)
+    
+    def get(self, guild_id):
+        return list(self.results.get(guild_id, ()))
+    
+    def baseline(self, guild_id, field, exclude=None):
+        """Median of `field` over earlier successful probes, or None without any"""
+        values = [
+            getattr(result, field) for result in self.results.get(guild_id, ())
+            if result is not exclude and result.ok and getattr(result, field) is not None
+        ]
+        return statistics.median(values) if values else None
+    
+    def retain(self, keep):
+        for guild_id in [guild_id for guild_id in self.results if not keep(guild_id)]:
+            del self.results[guild_id]
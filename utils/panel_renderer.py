@@ -0,0 +1,95 @@
+import asyncio
+from utils.tracing import tracer
+import json
+import time
+
+def panel_signature(embed, view):
+    """Everything a panel edit would change, so identical renders can be skipped"""
+    buttons = [(child.custom_id, child.label, str(child.style)) for child in view.children]
+    return json.dumps([embed.to_dict(), buttons], sort_keys=True, default=str)
+
+class PanelRenderer:
+    """Debounces and coalesces control panel edits per guild.
+    
+    Any number of update requests inside the debounce window become one edit,
+    and edits to the same panel are spaced at least min_interval apart to stay
+    under Discord's per-channel edit rate limit. The panel is rendered when the
+    edit actually runs, so the latest state always lands, and the edit is
+    skipped entirely when the rendered embed and buttons have not changed.
+    
+    render(guild_id) returns (message, embed, view) or None when there is no
+    panel; on_error(guild_id) is called when an edit fails.
+    """
+    
+    def __init__(self, render, on_error=None, debounce=0.75, min_interval=1.5):
+        self.render = render
+        self.on_error = on_error
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.pending = {}
+        self.signatures = {}
+        self.last_edit = {}
+        self.requested = 0
+        self.edits = 0
+        self.coalesced = 0
+        self.unchanged = 0
+    
+    def request(self, guild_id):
+        self.requested += 1
+        if guild_id in self.pending:
+            self.coalesced += 1
+            return
+        self.pending[guild_id] = asyncio.get_running_loop().create_task(self._flush(guild_id))
+    
+    def mark_rendered(self, guild_id, embed, view):
+        """Record a panel that was sent or edited outside the renderer"""
+        self.signatures[guild_id] = panel_signature(embed, view)
+        self.last_edit[guild_id] = time.monotonic()
+    
+    def forget(self, guild_id):
+        task = self.pending.pop(guild_id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        self.signatures.pop(guild_id, None)
+        self.last_edit.pop(guild_id, None)
+    
+    async def _flush(self, guild_id):
+        try:
+            since_last = time.monotonic() - self.last_edit.get(guild_id, 0)
+            await asyncio.sleep(max(self.debounce, self.min_interval - since_last))
+        except asyncio.CancelledError:
+            return
+        # Requests arriving from here on schedule a fresh flush with newer state
+        self.pending.pop(guild_id, None)
+        
+        rendered = self.render(guild_id)
+        if rendered is None:
+            return
+        message, embed, view = rendered
+        signature = panel_signature(embed, view)
+        if signature == self.signatures.get(guild_id):
+            self.unchanged += 1
+            return
+        
+        try:
+            with tracer.span('discord.edit_panel', guild=guild_id):
+                await message.edit(embed=embed, view=view)
+        except Exception as e:
+            print(f"Control panel edit failed for guild {guild_id}: {e}")
+            # A newer flush may already be pending; only drop what this edit would have recorded
+            self.signatures.pop(guild_id, None)
+            self.last_edit.pop(guild_id, None)
+            if self.on_error:
+                self.on_error(guild_id)
+            return
+        self.edits += 1
+        self.mark_rendered(guild_id, embed, view)
+    
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'edits': self.edits,
+            'suppressed': self.coalesced + self.unchanged,
+            'coalesced': self.coalesced,
+            'unchanged': self.unchanged
+        }
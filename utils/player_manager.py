@@ -0,0 +1,49 @@
+import time
+from typing import Dict, Optional
+from utils.music_player import MusicPlayer
+
+class PlayerManager:
+    """Keeps one MusicPlayer per guild, created on first use and evicted when idle"""
+    
+    def __init__(self, idle_timeout=600):
+        self.idle_timeout = idle_timeout
+        self.players: Dict[int, MusicPlayer] = {}
+    
+    def get(self, guild_id: int) -> MusicPlayer:
+        player = self.players.get(guild_id)
+        if player is None:
+            player = MusicPlayer(guild_id)
+            self.players[guild_id] = player
+        player.touch()
+        return player
+    
+    def peek(self, guild_id: int) -> Optional[MusicPlayer]:
+        return self.players.get(guild_id)
+    
+    def remove(self, guild_id: int) -> Optional[MusicPlayer]:
+        return self.players.pop(guild_id, None)
+    
+    def evict_idle(self, is_connected=None) -> int:
+        """Drop players that have been idle longer than idle_timeout.
+        
+        is_connected(guild_id) can be passed to keep players whose guild still
+        has a live voice connection.
+        """
+        now = time.monotonic()
+        evicted = 0
+        for guild_id, player in list(self.players.items()):
+            if not player.is_idle():
+                continue
+            if now - player.last_active < self.idle_timeout:
+                continue
+            if is_connected and is_connected(guild_id):
+                continue
+            del self.players[guild_id]
+            evicted += 1
+        return evicted
+    
+    def __len__(self):
+        return len(self.players)
+    
+    def __contains__(self, guild_id):
+        return guild_id in self.players
@@ -0,0 +1,147 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import sqlite3
+import time
+from utils.stream_cache import video_id_from_url
+from utils.track import Track
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_by TEXT,
+    created_at REAL NOT NULL,
+    track_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER,
+    thumbnail TEXT,
+    PRIMARY KEY (playlist_id, position)
+);
+"""
+
+class PlaylistStore:
+    """SQLite-backed saved playlists.
+    
+    Only stable video ids and display metadata are stored; stream URLs are
+    resolved when a track plays. All queries run on one dedicated thread that
+    owns the connection, so the event loop never blocks on disk I/O.
+    """
+    
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='playlists')
+        self.connection = None
+    
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+    
+    async def open(self):
+        await self._run(self._open)
+    
+    async def close(self):
+        await self._run(self._close)
+        self.executor.shutdown(wait=False)
+    
+    async def save(self, name, tracks, created_by):
+        return await self._run(self._save, name, [track.to_dict() for track in tracks], created_by)
+    
+    async def load(self, name, requester=None):
+        """Return the playlist's Tracks, or None if there is no playlist with that name"""
+        rows = await self._run(self._load, name)
+        if rows is None:
+            return None
+        return [
+            Track(video_id, title=title, duration=duration, thumbnail=thumbnail, requester=requester)
+            for video_id, title, duration, thumbnail in rows
+        ]
+    
+    async def list(self):
+        """Return (name, track_count, created_by) for every playlist"""
+        return await self._run(self._list)
+    
+    async def count(self):
+        return await self._run(self._count)
+    
+    def _open(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        if self.legacy_json and os.path.exists(self.legacy_json):
+            self._import_legacy()
+    
+    def _close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+    
+    def _save(self, name, songs, created_by):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO playlists (name, created_by, created_at, track_count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET created_by = excluded.created_by, "
+                "created_at = excluded.created_at, track_count = excluded.track_count",
+                (name, created_by, time.time(), len(songs))
+            )
+            playlist_id = self.connection.execute(
+                "SELECT id FROM playlists WHERE name = ?", (name,)
+            ).fetchone()[0]
+            self.connection.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            self.connection.executemany(
+                "INSERT INTO playlist_tracks (playlist_id, position, video_id, title, duration, thumbnail) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (playlist_id, position, song['id'], song.get('title'), song.get('duration'), song.get('thumbnail'))
+                    for position, song in enumerate(songs)
+                ]
+            )
+        return len(songs)
+    
+    def _load(self, name):
+        row = self.connection.execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return self.connection.execute(
+            "SELECT video_id, title, duration, thumbnail FROM playlist_tracks "
+            "WHERE playlist_id = ? ORDER BY position",
+            (row[0],)
+        ).fetchall()
+    
+    def _list(self):
+        return self.connection.execute(
+            "SELECT name, track_count, created_by FROM playlists ORDER BY name"
+        ).fetchall()
+    
+    def _count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM playlists").fetchone()[0]
+    
+    def _import_legacy(self):
+        """One-time import of the old playlists.json, which is renamed afterwards"""
+        try:
+            with open(self.legacy_json, "r") as f:
+                playlists = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not import {self.legacy_json}: {e}")
+            return
+        
+        imported = 0
+        for name, data in playlists.items():
+            songs = []
+            for song in data.get('songs', []):
+                video_id = song.get('id') or video_id_from_url(song.get('webpage_url') or song.get('url'))
+                if video_id:
+                    songs.append(dict(song, id=video_id))
+            self._save(name, songs, data.get('created_by'))
+            imported += 1
+        
+        os.replace(self.legacy_json, f"{self.legacy_json}.imported")
+        print(f"Imported {imported} playlists from {self.legacy_json}")
@@ -0,0 +1,77 @@
+import asyncio
+
+class Prefetcher:
+    """Resolves upcoming queue entries in the background so track changes don't wait on yt-dlp.
+    
+    resolve(track) must return playable info with a fresh stream URL; resolved
+    URLs land in the shared stream cache, so play_next finds them there. When
+    the build_source coroutine is given, an FFmpeg source is also started for the very next
+    track so it has already connected and buffered by the time the current
+    track ends.
+    """
+    
+    def __init__(self, resolve, depth=2, build_source=None):
+        self.resolve = resolve
+        self.depth = depth
+        self.build_source = build_source
+        self.tasks = {}
+        self.warm_sources = {}
+    
+    def schedule(self, guild_id, queue):
+        """(Re)start prefetching for the first `depth` tracks of a guild's queue"""
+        tracks = queue[:self.depth]
+        warm = self.warm_sources.get(guild_id)
+        if warm and tracks and warm[0] is tracks[0]:
+            # Still the next track (e.g. a song was appended), so keep its FFmpeg running
+            self.warm_sources.pop(guild_id)
+            self.cancel(guild_id)
+            self.warm_sources[guild_id] = warm
+        else:
+            self.cancel(guild_id)
+        if self.depth <= 0:
+            return
+        if not tracks:
+            return
+        self.tasks[guild_id] = asyncio.get_running_loop().create_task(
+            self._prefetch(guild_id, tracks)
+        )
+    
+    def cancel(self, guild_id):
+        """Stop in-flight work and drop any warmed source, e.g. after a skip, shuffle or clear"""
+        task = self.tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
+        self._discard_warm(guild_id)
+    
+    def take_warm(self, guild_id, track):
+        """Return (info, source) for `track` if it is the one that was warmed, else None"""
+        warm = self.warm_sources.pop(guild_id, None)
+        if warm is None:
+            return None
+        warm_track, info, source = warm
+        if warm_track is track:
+            return info, source
+        source.cleanup()
+        return None
+    
+    def _discard_warm(self, guild_id):
+        warm = self.warm_sources.pop(guild_id, None)
+        if warm:
+            warm[2].cleanup()
+    
+    async def _prefetch(self, guild_id, tracks):
+        try:
+            for index, track in enumerate(tracks):
+                try:
+                    info = await self.resolve(track)
+                except Exception as e:
+                    print(f"Prefetch failed for {track.title}: {e}")
+                    continue
+                
+                if self.build_source and index == 0 and guild_id not in self.warm_sources:
+                    self.warm_sources[guild_id] = (track, info, await self.build_source(guild_id, info))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self.tasks.get(guild_id) is asyncio.current_task():
+                del self.tasks[guild_id]
@@ -0,0 +1,84 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    """Samples thread stacks at a fixed rate and writes collapsed stacks.
+    
+    The output is the "folded" format (one `frame;frame;frame count` line per
+    unique stack) that flamegraph.pl, speedscope and inferno read directly.
+    Only the event loop thread is sampled unless all_threads is set.
+    """
+    
+    def __init__(self, interval=0.01, all_threads=False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.target_thread_id = None
+        self.started = None
+        self.running = False
+        self._thread = None
+    
+    def start(self, all_threads=None):
+        """Start sampling; without all_threads only the calling thread is sampled"""
+        if self.running:
+            return
+        if all_threads is not None:
+            self.all_threads = all_threads
+        self.target_thread_id = threading.get_ident()
+        self.samples.clear()
+        self.sample_count = 0
+        self.started = time.monotonic()
+        self.running = True
+        self._thread = threading.Thread(target=self.sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self.running = False
+        if self._thread:
+            self._thread.join(self.interval * 4)
+            self._thread = None
+        return time.monotonic() - self.started if self.started else 0.0
+    
+    def sample(self):
+        own_id = threading.get_ident()
+        names = {}
+        while self.running:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            if not self.all_threads:
+                frame = frames.get(self.target_thread_id)
+                frames = {self.target_thread_id: frame} if frame else {}
+            if self.all_threads:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if self.all_threads:
+                    stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+    
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+    
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+        return path
+    
+    def top(self, limit=5):
+        """Leaf frames that were on-CPU (or blocked) most often"""
+        leaves = collections.Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
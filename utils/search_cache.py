@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+class SearchCache:
+    """Bounded LRU mapping normalized search queries to YouTube video ids"""
+    
+    def __init__(self, max_size=1000, ttl=86400, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(query):
+        return " ".join(query.casefold().split())
+    
+    def get(self, query):
+        key = self.normalize(query)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        video_id, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self.entries[key]
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return video_id
+    
+    def put(self, query, video_id):
+        key = self.normalize(query)
+        self.entries[key] = (video_id, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+    
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load search cache: {e}")
+            return
+        
+        now = time.time()
+        for key, (video_id, stored_at) in stored.items():
+            if now - stored_at <= self.ttl:
+                self.entries[key] = (video_id, stored_at)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def save(self):
+        if not self.path:
+            return
+        snapshot = {key: list(value) for key, value in self.entries.items()}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save search cache: {e}")
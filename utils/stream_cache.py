@@ -0,0 +1,92 @@
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+EXPIRE_PATH_PATTERN = re.compile(r'/expire/(\d+)')
+
+def video_id_from_url(url):
+    """Extract the YouTube video id from a watch/short/embed URL, or None"""
+    if not url:
+        return None
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def stream_url_expiry(url):
+    """Return the unix time a googlevideo stream URL stops working, or None if unknown"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    expire = parse_qs(parsed.query).get('expire')
+    if expire:
+        try:
+            return float(expire[0])
+        except ValueError:
+            return None
+    match = EXPIRE_PATH_PATTERN.search(parsed.path)
+    if match:
+        return float(match.group(1))
+    return None
+
+class StreamCache:
+    """Resolved stream metadata keyed by video id, valid until shortly before the URL expires"""
+    
+    def __init__(self, max_size=2000, margin=300, default_ttl=3600):
+        self.max_size = max_size
+        self.margin = margin
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def expires_at(self, url):
+        expiry = stream_url_expiry(url)
+        if expiry is None:
+            expiry = time.time() + self.default_ttl
+        return expiry
+    
+    def is_fresh(self, url):
+        """True if a stream URL can still be handed to FFmpeg"""
+        if not url:
+            return False
+        return self.expires_at(url) - self.margin > time.time()
+    
+    def get(self, video_id):
+        if not video_id:
+            return None
+        entry = self.entries.get(video_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        info, expires_at = entry
+        if expires_at - self.margin <= time.time():
+            del self.entries[video_id]
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(video_id)
+        self.hits += 1
+        return dict(info)
+    
+    def put(self, info):
+        video_id = info.get('id')
+        if not video_id or not info.get('url'):
+            return
+        self.entries[video_id] = (dict(info), self.expires_at(info['url']))
+        self.entries.move_to_end(video_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def invalidate(self, video_id):
+        self.entries.pop(video_id, None)
+    
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
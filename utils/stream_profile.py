@@ -0,0 +1,237 @@
+import collections
+import math
+import time
+
+# From best to most robust: (Opus bitrate in kbps, Opus bandwidth, expected packet loss for FEC).
+# Discord only takes 48 kHz audio, so lower levels narrow the encoded bandwidth instead of the sample rate.
+QUALITY_LEVELS = (
+    (192, 'full', 0.10),
+    (128, 'full', 0.15),
+    (96, 'superwide', 0.20),
+    (64, 'wide', 0.25),
+    (48, 'medium', 0.30),
+)
+
+# libopus -cutoff for each bandwidth, used when an audio node re-encodes the stream
+CUTOFF_HZ = {'narrow': 4000, 'medium': 6000, 'wide': 8000, 'superwide': 12000, 'full': 20000}
+
+# FFmpeg's demuxer queue in packets (about 20 ms of audio each): how far it reads ahead of playback
+BUFFER_PACKETS = {'small': 64, 'medium': 256, 'large': 1024}
+BUFFER_SIZES = tuple(BUFFER_PACKETS)
+
+# Seconds FFmpeg keeps retrying a dropped stream before giving up on the track
+RECONNECT_DELAYS = {'small': 5, 'medium': 10, 'large': 20}
+
+def input_options(buffer='medium', local=False, reconnect_delay=None):
+    """FFmpeg input options for a buffer size; local files skip the HTTP reconnect flags"""
+    options = f"-thread_queue_size {BUFFER_PACKETS[buffer]}"
+    if not local:
+        options += f" -reconnect 1 -reconnect_streamed 1 -reconnect_delay_max {reconnect_delay or RECONNECT_DELAYS[buffer]}"
+        if buffer != 'small':
+            options += " -reconnect_on_network_error 1"
+    return f"{options} -threads 2"
+
+def level_for_bitrate(bitrate):
+    """Index of the best quality level that does not exceed `bitrate`"""
+    for index, level in enumerate(QUALITY_LEVELS):
+        if level[0] <= bitrate:
+            return index
+    return len(QUALITY_LEVELS) - 1
+
+class StreamStats:
+    """Frame timings recorded on the audio thread and collected by the controller.
+    
+    A stall is a read() that took longer than `stall_threshold`, which means
+    FFmpeg had no audio ready. A late frame is one read more than
+    `late_threshold` after its 20 ms slot, which the listener hears as a gap.
+    Counters are swapped out without a lock; losing a frame to a race only
+    skews one window by a frame.
+    """
+    
+    __slots__ = ('stall_threshold', 'late_threshold', 'frames', 'stalls', 'late', 'worst_read', 'last_read')
+    
+    FRAME_SECONDS = 0.02
+    # A longer gap between reads is a pause, not a late frame
+    PAUSE_GAP = 0.5
+    
+    def __init__(self, stall_threshold=0.01, late_threshold=0.01):
+        self.stall_threshold = stall_threshold
+        self.late_threshold = late_threshold
+        self.frames = 0
+        self.stalls = 0
+        self.late = 0
+        self.worst_read = 0.0
+        self.last_read = None
+    
+    def record(self, started, finished):
+        self.frames += 1
+        duration = finished - started
+        if duration > self.stall_threshold:
+            self.stalls += 1
+        if duration > self.worst_read:
+            self.worst_read = duration
+        if self.last_read is not None:
+            gap = started - self.last_read
+            if self.FRAME_SECONDS + self.late_threshold < gap < self.PAUSE_GAP:
+                self.late += 1
+        self.last_read = started
+    
+    def take(self):
+        """Return (frames, stalls, late, worst_read) since the last call and start a new window"""
+        window = (self.frames, self.stalls, self.late, self.worst_read)
+        self.frames = self.stalls = self.late = 0
+        self.worst_read = 0.0
+        return window
+
+class StreamProfile:
+    """How one guild's tracks are streamed: Opus quality level and FFmpeg input buffering.
+    
+    `ceiling` is the best level the guild asked for with !quality; the
+    adaptive controller moves `level` between it and `floor`.
+    """
+    
+    def __init__(self, level=1, floor=3, buffer='medium', adaptive=True):
+        self.level = level
+        self.ceiling = level
+        self.floor = max(floor, level)
+        self.buffer = buffer
+        self.adaptive = adaptive
+        self.good_windows = 0
+        # (time, description) of recent automatic changes, newest last
+        self.changes = collections.deque(maxlen=5)
+    
+    @property
+    def bitrate(self):
+        return QUALITY_LEVELS[self.level][0]
+    
+    @property
+    def bandwidth(self):
+        return QUALITY_LEVELS[self.level][1]
+    
+    @property
+    def packet_loss(self):
+        return QUALITY_LEVELS[self.level][2]
+    
+    @property
+    def cutoff(self):
+        return CUTOFF_HZ[self.bandwidth]
+    
+    @property
+    def reconnect_delay(self):
+        return RECONNECT_DELAYS[self.buffer]
+    
+    def set_bitrate(self, bitrate):
+        """Pin the best quality to `bitrate`, as !quality does"""
+        self.level = self.ceiling = level_for_bitrate(bitrate)
+        self.floor = max(self.floor, self.level)
+        self.good_windows = 0
+    
+    def before_options(self, local=False):
+        """FFmpeg input options for this profile; local files skip the HTTP reconnect flags"""
+        return input_options(self.buffer, local)
+    
+    def encoder_settings(self):
+        """Keyword arguments for VoiceClient.play, which creates the Opus encoder for PCM tracks"""
+        return {'bitrate': self.bitrate, 'bandwidth': self.bandwidth, 'expected_packet_loss': self.packet_loss}
+    
+    def describe(self):
+        return f"{self.bitrate}k {self.bandwidth}band, {self.buffer} buffer{'' if self.adaptive else ' (fixed)'}"
+
+class AdaptiveStreaming:
+    """Per-guild stream profiles, stepped down when playback struggles and back up once it recovers.
+    
+    evaluate() is called every few seconds for each playing guild with the
+    voice websocket latency. High latency or late frames lower the quality
+    level one step; FFmpeg read stalls grow the input buffer. After
+    `recover_after` clean windows in a row the level goes back up one step,
+    never past what the guild chose with !quality.
+    """
+    
+    # Windows with fewer frames than this (about two seconds) are not judged
+    MIN_FRAMES = 100
+    
+    def __init__(self, bitrate=128, min_bitrate=64, enabled=True, max_latency=0.25, max_stall_ratio=0.01, max_late_ratio=0.02, recover_after=3):
+        self.level = level_for_bitrate(bitrate)
+        self.floor = level_for_bitrate(min_bitrate)
+        self.enabled = enabled
+        self.max_latency = max_latency
+        self.max_stall_ratio = max_stall_ratio
+        self.max_late_ratio = max_late_ratio
+        self.recover_after = recover_after
+        self.profiles = {}
+        self.stats = {}
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            bitrate=config.get('AUDIO_BITRATE', 128),
+            min_bitrate=config.get('ADAPTIVE_MIN_BITRATE', 64),
+            enabled=config.get('ADAPTIVE_STREAMING', True),
+            max_latency=config.get('ADAPTIVE_MAX_LATENCY_MS', 250) / 1000
+        )
+    
+    def profile(self, guild_id):
+        profile = self.profiles.get(guild_id)
+        if profile is None:
+            profile = StreamProfile(self.level, self.floor, adaptive=self.enabled)
+            self.profiles[guild_id] = profile
+        return profile
+    
+    def reset(self, guild_id):
+        self.profiles.pop(guild_id, None)
+        return self.profile(guild_id)
+    
+    def stats_for(self, guild_id):
+        stats = self.stats.get(guild_id)
+        if stats is None:
+            stats = self.stats[guild_id] = StreamStats()
+        return stats
+    
+    def retain(self, keep):
+        """Forget guilds for which keep(guild_id) is false"""
+        for table in (self.profiles, self.stats):
+            for guild_id in [guild_id for guild_id in table if not keep(guild_id)]:
+                del table[guild_id]
+    
+    def problems(self, frames, stalls, late, latency):
+        found = []
+        if latency is not None and math.isfinite(latency) and latency > self.max_latency:
+            found.append(f"voice latency {latency * 1000:.0f} ms")
+        if late > frames * self.max_late_ratio:
+            found.append(f"{late} late frames")
+        if stalls > frames * self.max_stall_ratio:
+            found.append(f"{stalls} FFmpeg stalls")
+        return found
+    
+    def evaluate(self, guild_id, latency=None):
+        """Judge the last window for a guild; returns a description of what changed, or None"""
+        profile = self.profile(guild_id)
+        frames, stalls, late, _ = self.stats_for(guild_id).take()
+        if not profile.adaptive or frames < self.MIN_FRAMES:
+            return None
+        
+        problems = self.problems(frames, stalls, late, latency)
+        if not problems:
+            profile.good_windows += 1
+            if profile.good_windows < self.recover_after or profile.level <= profile.ceiling:
+                return None
+            profile.good_windows = 0
+            profile.level -= 1
+            return self.record(profile, f"raised quality to {profile.bitrate}k")
+        
+        profile.good_windows = 0
+        changes = []
+        if stalls > frames * self.max_stall_ratio and profile.buffer != BUFFER_SIZES[-1]:
+            profile.buffer = BUFFER_SIZES[BUFFER_SIZES.index(profile.buffer) + 1]
+            changes.append(f"{profile.buffer} buffer")
+        if len(problems) > 1 or not changes:
+            if profile.level < profile.floor:
+                profile.level += 1
+                changes.append(f"{profile.bitrate}k")
+        if not changes:
+            return None
+        return self.record(profile, f"switched to {' and '.join(changes)} ({', '.join(problems)})")
+    
+    def record(self, profile, change):
+        profile.changes.append((time.time(), change))
+        return change
@@ -0,0 +1,180 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from discord.ext import commands
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    __slots__ = ('name', 'args', 'start', 'end', 'trace')
+    
+    def __init__(self, name, args, trace):
+        self.name = name
+        self.args = args
+        self.start = time.perf_counter()
+        self.end = None
+        self.trace = trace
+
+class Trace:
+    """A root span and everything started beneath it, exported together when the root ends"""
+    
+    __slots__ = ('id', 'root', 'spans', 'finished')
+    
+    def __init__(self, trace_id):
+        self.id = trace_id
+        self.root = None
+        self.spans = []
+        self.finished = False
+
+class Tracer:
+    """Nested timing spans exported in Chrome's trace event format.
+    
+    The current span lives in a context variable, so spans opened inside a
+    command (and tasks it creates) nest under it automatically. Each trace is
+    drawn on its own row, so concurrent commands don't overlap. The file is a
+    JSON array that is appended to as traces finish; chrome://tracing and
+    ui.perfetto.dev open it as-is, without the closing bracket.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.min_duration = 0.0
+        self.exported = 0
+        self._ids = itertools.count(1)
+        self._epoch = time.perf_counter()
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+    
+    def configure(self, path, min_duration=0.0):
+        self.path = path
+        self.min_duration = min_duration
+        self.enabled = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self.write_loop, name='trace-writer', daemon=True)
+            self._writer.start()
+    
+    def disable(self):
+        self.enabled = False
+    
+    def start(self, name, **args):
+        """Open a span under the current one (or a new trace) and make it current; returns (span, token)"""
+        if not self.enabled:
+            return None, None
+        parent = _current_span.get()
+        if parent is None or parent.trace.finished:
+            trace = Trace(next(self._ids))
+        else:
+            trace = parent.trace
+        span = Span(name, args, trace)
+        if trace.root is None:
+            trace.root = span
+        trace.spans.append(span)
+        return span, _current_span.set(span)
+    
+    def finish(self, span, token, **args):
+        if span is None:
+            return
+        span.end = time.perf_counter()
+        if args:
+            span.args.update(args)
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Ended from a different context than it started in (e.g. after_invoke)
+            pass
+        trace = span.trace
+        if span is trace.root:
+            trace.finished = True
+            if span.end - span.start >= self.min_duration:
+                self.export(trace, trace.spans)
+        elif trace.finished:
+            # A child that outlived its root, such as a background prefetch
+            self.export(trace, [span])
+    
+    @contextmanager
+    def span(self, name, **args):
+        span, token = self.start(name, **args)
+        try:
+            yield span
+        except BaseException as e:
+            if span is not None:
+                span.args['error'] = repr(e)
+            raise
+        finally:
+            self.finish(span, token)
+    
+    def export(self, trace, spans):
+        events = []
+        for span in spans:
+            if span.end is None:
+                continue
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': round((span.start - self._epoch) * 1e6),
+                'dur': round((span.end - span.start) * 1e6),
+                'pid': os.getpid(),
+                'tid': trace.id,
+                'args': {key: str(value) for key, value in span.args.items()},
+            })
+        if events:
+            self._queue.put(events)
+    
+    def write_loop(self):
+        while True:
+            events = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                with open(self.path, 'a') as f:
+                    if new_file:
+                        f.write('[\n')
+                    for event in events:
+                        f.write(json.dumps(event) + ',\n')
+                self.exported += 1
+            except OSError as e:
+                print(f"Could not write trace: {e}")
+    
+    # Bot-wide command hooks: bot.before_invoke(tracer.before_invoke) etc.
+    async def before_invoke(self, ctx):
+        ctx.trace_span = self.start(
+            f"command.{ctx.command.qualified_name}",
+            guild=ctx.guild.id if ctx.guild else None,
+            user=ctx.author,
+            message=ctx.message.content if ctx.message else None
+        )
+    
+    async def after_invoke(self, ctx):
+        span, token = getattr(ctx, 'trace_span', (None, None))
+        self.finish(span, token, failed=ctx.command_failed)
+
+class TracedContext(commands.Context):
+    """Context whose REST calls show up as child spans of the command"""
+    
+    async def send(self, content=None, **kwargs):
+        with tracer.span('discord.send', content=str(content or '')[:80]):
+            return await super().send(content, **kwargs)
+    
+    async def reply(self, content=None, **kwargs):
+        with tracer.span('discord.reply', content=str(content or '')[:80]):
+            return await super().reply(content, **kwargs)
+
+def traced(name):
+    """Wrap a coroutine (e.g. a ControlPanel button callback) in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+tracer = Tracer()
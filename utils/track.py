@@ -0,0 +1,136 @@
+import itertools
+import random
+from collections import deque
+
+# The only yt-dlp info fields kept once a format has been selected; formats,
+# thumbnails, subtitles, chapters and the rest of the raw info are dropped
+INFO_FIELDS = ('id', 'title', 'url', 'webpage_url', 'duration', 'thumbnail', 'acodec')
+
+def compact_info(data, requester=None):
+    """Keep only the fields needed to play and display a track"""
+    info = {field: data.get(field) for field in INFO_FIELDS}
+    if not info['webpage_url'] and info['id']:
+        info['webpage_url'] = f"https://www.youtube.com/watch?v={info['id']}"
+    info['requester'] = requester if requester is not None else data.get('requester')
+    return info
+
+def format_duration(seconds):
+    if not seconds:
+        return "Live" if seconds is None else "0:00"
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+def parse_duration(text):
+    """Parse "90", "1:30" or "1:02:03" into seconds; raises ValueError for anything else"""
+    parts = text.strip().split(':')
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Invalid time: {text}")
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+class Track:
+    """A queued song. Stream URLs are resolved by video id just before it plays, so they are not stored here."""
+    
+    __slots__ = ('id', 'title', 'duration', 'thumbnail', 'requester')
+    
+    def __init__(self, id, title=None, duration=None, thumbnail=None, requester=None):
+        self.id = id
+        self.title = title or "Unknown"
+        self.duration = int(duration) if duration else duration
+        self.thumbnail = thumbnail
+        self.requester = requester
+    
+    @property
+    def webpage_url(self):
+        return f"https://www.youtube.com/watch?v={self.id}"
+    
+    @classmethod
+    def from_info(cls, info, requester=None):
+        """Build a track from a yt-dlp info dict or flat playlist entry"""
+        video_id = info.get('id')
+        thumbnail = info.get('thumbnail')
+        if not thumbnail:
+            thumbnails = info.get('thumbnails') or []
+            thumbnail = thumbnails[-1].get('url') if thumbnails else None
+        if not thumbnail and video_id:
+            thumbnail = f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+        return cls(
+            video_id,
+            title=info.get('title'),
+            duration=info.get('duration'),
+            thumbnail=thumbnail,
+            requester=requester or info.get('requester')
+        )
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'],
+            title=data.get('title'),
+            duration=data.get('duration'),
+            thumbnail=data.get('thumbnail'),
+            requester=data.get('requester')
+        )
+    
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def __repr__(self):
+        return f"<Track id={self.id!r} title={self.title!r}>"
+
+class TrackQueue:
+    """Deque-backed queue: O(1) append and dequeue, indexed remove/move, slicing for pagination"""
+    
+    def __init__(self, tracks=()):
+        self._tracks = deque(tracks)
+    
+    def append(self, track):
+        self._tracks.append(track)
+    
+    def extend(self, tracks):
+        self._tracks.extend(tracks)
+    
+    def popleft(self):
+        return self._tracks.popleft()
+    
+    def remove_at(self, index):
+        track = self._tracks[index]
+        del self._tracks[index]
+        return track
+    
+    def move(self, source, destination):
+        track = self.remove_at(source)
+        self._tracks.insert(destination, track)
+        return track
+    
+    def shuffle(self):
+        tracks = list(self._tracks)
+        random.shuffle(tracks)
+        self._tracks = deque(tracks)
+    
+    def clear(self):
+        self._tracks.clear()
+    
+    def copy(self):
+        return list(self._tracks)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._tracks))
+            return list(itertools.islice(self._tracks, start, stop, step))
+        return self._tracks[index]
+    
+    def __len__(self):
+        return len(self._tracks)
+    
+    def __bool__(self):
+        return bool(self._tracks)
+    
+    def __iter__(self):
+        return iter(self._tracks)
@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import sys
+import threading
+import time
+import traceback
+from utils.metrics import metrics
+
+class Stall:
+    """One period where the event loop did not run, with the stack that was blocking it"""
+    
+    __slots__ = ('since', 'started', 'duration', 'task', 'stack')
+    
+    def __init__(self, since, task, stack):
+        self.since = since
+        self.started = time.time() - (time.monotonic() - since)
+        self.duration = time.monotonic() - since
+        self.task = task
+        self.stack = stack
+    
+    def location(self, lines=2):
+        return [line.strip() for line in self.stack.strip().splitlines()[-lines:]]
+
+class LoopWatchdog:
+    """Measures event loop lag and captures what is blocking the loop.
+    
+    A heartbeat coroutine wakes every `interval` seconds and records how late
+    it woke up. A separate thread checks the heartbeat; once it is older than
+    `threshold` the loop is stuck in some synchronous call, so the thread grabs
+    the loop thread's current stack, which points at the blocking call.
+    """
+    
+    def __init__(self, loop, threshold=0.25, interval=0.05, history=20):
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = collections.deque(maxlen=history)
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.max_lag = 0.0
+        self.running = False
+        self._heartbeat = None
+        self._thread = None
+    
+    def start(self):
+        """Start watching; must be called from the event loop's thread"""
+        if self.running:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.running = True
+        self._heartbeat = self.loop.create_task(self.heartbeat())
+        self._thread = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self.running = False
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._thread:
+            self._thread.join(self.interval * 4)
+            self._thread = None
+    
+    async def heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_beat = now
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe('loop_lag_seconds', lag)
+    
+    def watch(self):
+        stall = None
+        while self.running:
+            time.sleep(self.interval)
+            last_beat = self.last_beat
+            if time.monotonic() - last_beat < self.threshold + self.interval:
+                if stall is not None and last_beat > stall.since:
+                    self.finish(stall, last_beat)
+                    stall = None
+                continue
+            if stall is None:
+                stall = self.capture(last_beat)
+            else:
+                stall.duration = time.monotonic() - stall.since
+    
+    def capture(self, since):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else "(loop thread not found)\n"
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        stall = Stall(since, task.get_name() if task else None, stack)
+        self.stalls.append(stall)
+        metrics.inc('loop_stalls')
+        return stall
+    
+    def finish(self, stall, resumed):
+        # The heartbeat sleeps for one interval on its own, so that part was not blocked
+        stall.duration = max(stall.duration, resumed - stall.since - self.interval)
+        print(f"Event loop blocked for {stall.duration * 1000:.0f} ms (task {stall.task}) at:")
+        for line in stall.location():
+            print(f"  {line}")
+    
+    def stats(self):
+        histogram = metrics.histogram('loop_lag_seconds')
+        return {
+            'running': self.running,
+            'stalls': metrics.counter('loop_stalls'),
+            'max_lag': self.max_lag,
+            'p99_lag': histogram.quantile(0.99) if histogram and histogram.count else 0.0
+        }
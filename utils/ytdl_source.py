@@ -1,49 +1,350 @@
-import yt_dlp
+import asyncio
+import itertools
+import threading
+import time
 import discord
-from discord.ext import commands
+from utils.stream_cache import StreamCache, video_id_from_url
+from utils.volume import VolumeTransformer, volume_filter
+from utils.track import Track, compact_info
+from utils.extractor_pool import extract_job, get_ytdl
+from utils.metrics import metrics
+from utils.tracing import tracer
 
-class YTDLSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
-        super().__init__(source, volume)
+# discord.py already asks for 48 kHz stereo PCM; overriding the rate here would play tracks at the wrong speed
+FFMPEG_OPTIONS = {
+    'options': '-vn',
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -threads 2'
+}
+
+# Cached files are local, so the HTTP reconnect flags don't apply
+LOCAL_FFMPEG_OPTIONS = {
+    'options': FFMPEG_OPTIONS['options'],
+    'before_options': '-threads 2'
+}
+
+# Opus streams are remuxed as-is, so no bitrate or sample rate options apply
+PASSTHROUGH_OPTIONS = {
+    'options': '-vn',
+    'before_options': FFMPEG_OPTIONS['before_options']
+}
+
+# Opus is copied without re-encoding only when the chosen quality is at least this many kbps
+PASSTHROUGH_MIN_BITRATE = 128
+
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+# Resolved stream URLs shared by every guild, keyed by video id
+stream_cache = StreamCache()
+
+# Optional bounded worker pool for yt-dlp; falls back to the loop's default executor
+extractor_pool = None
+
+def set_extractor_pool(pool):
+    global extractor_pool
+    extractor_pool = pool
+
+# Optional on-disk cache of frequently played tracks
+audio_cache = None
+
+def set_audio_cache(cache):
+    global audio_cache
+    audio_cache = cache
+
+def can_passthrough(info, volume, bitrate=PASSTHROUGH_MIN_BITRATE):
+    """Opus streams at unity volume need no filter, so their packets can be sent without re-encoding"""
+    return volume == 1.0 and bitrate >= PASSTHROUGH_MIN_BITRATE and (info.get('acodec') or '').startswith('opus')
+
+def audio_mode(info, volume, passthrough=True, bitrate=PASSTHROUGH_MIN_BITRATE):
+    """How FFmpeg outputs a track: 'copy' for untouched Opus packets, 'opus' when it re-encodes
+    Opus input at another volume or bitrate, and 'pcm' for the voice client to encode"""
+    if passthrough and (info.get('acodec') or '').startswith('opus'):
+        return 'copy' if can_passthrough(info, volume, bitrate) else 'opus'
+    return 'pcm'
+
+def seek_options(before_options, position):
+    """Input-side -ss, so FFmpeg jumps straight to the position instead of decoding up to it"""
+    if not position:
+        return before_options
+    return f"{before_options} -ss {position:.3f}"
+
+def create_audio_source(info, volume=1.0, passthrough=True, volume_mode='ffmpeg', position=0.0, bitrate=PASSTHROUGH_MIN_BITRATE, before_options=None, cutoff=None):
+    """Start FFmpeg for a resolved track, copying Opus packets when nothing has to be filtered.
+    
+    Opus input that needs a volume filter or a lower bitrate is re-encoded to
+    Opus by FFmpeg itself, so its frames never pass through Python or the
+    voice client's encoder. In 'ffmpeg' volume mode the volume is applied by
+    FFmpeg's filter graph and recorded on the source as filter_volume, so
+    YTDLSource only has to scale the difference when the volume changes
+    mid-track. The output is recorded as mode (see audio_mode). before_options
+    replaces the default input options, e.g. with a guild's stream profile.
+    """
+    base_options = LOCAL_FFMPEG_OPTIONS if info.get('local') else FFMPEG_OPTIONS
+    if before_options is None:
+        before_options = base_options['before_options']
+    before_options = seek_options(before_options, position)
+    mode = audio_mode(info, volume, passthrough, bitrate)
+    options = base_options['options']
+    if mode == 'copy':
+        source = discord.FFmpegOpusAudio(
+            info['url'],
+            codec='copy',
+            before_options=before_options,
+            options=PASSTHROUGH_OPTIONS['options']
+        )
+    elif mode == 'opus':
+        options = f"{options} {volume_filter(volume)}"
+        if cutoff:
+            options += f" -cutoff {cutoff}"
+        source = discord.FFmpegOpusAudio(info['url'], bitrate=bitrate, before_options=before_options, options=options)
+        source.filter_volume = volume
+        source.bitrate = bitrate
+    elif volume_mode == 'ffmpeg' and volume > 0:
+        source = discord.FFmpegPCMAudio(info['url'], before_options=before_options, options=f"{options} {volume_filter(volume)}")
+        source.filter_volume = volume
+    else:
+        source = discord.FFmpegPCMAudio(info['url'], before_options=before_options, options=options)
+    source.mode = mode
+    return source
+
+def local_info(info, path):
+    """Copy of a track's metadata that plays from a cached file instead of the stream URL"""
+    local = dict(info)
+    local.update({'url': path, 'local': True})
+    if path.endswith(('.opus', '.webm')):
+        local['acodec'] = 'opus'
+    return local
+
+def cached_info(info):
+    """Return local playback info if the track is in the audio cache, otherwise None"""
+    if audio_cache is None:
+        return None
+    path = audio_cache.get(info.get('id'))
+    return local_info(info, path) if path else None
+
+class PrimedSource(discord.AudioSource):
+    """A freshly started source whose first frame has already been read.
+    
+    prime() blocks until FFmpeg produces audio, so it runs on a worker thread;
+    the source can then be swapped into a playing track without the voice
+    client waiting on FFmpeg's startup.
+    """
+    
+    def __init__(self, source):
+        self.source = source
+        self.first = None
+    
+    def prime(self, position, behind=None):
+        """Read the first frame, dropping frames while behind(position) says the new source is late; returns its position"""
+        self.first = self.source.read()
+        while self.first and behind is not None and behind(position):
+            self.first = self.source.read()
+            position += FRAME_SECONDS
+        return position
+    
+    def read(self):
+        if self.first is not None:
+            data, self.first = self.first, None
+            return data
+        return self.source.read()
+    
+    def is_opus(self):
+        return self.source.is_opus()
+    
+    def cleanup(self):
+        self.source.cleanup()
+    
+    def __getattr__(self, name):
+        # filter_volume, remote, spawned_at and the audio node controls
+        return getattr(self.source, name)
+
+class YTDLSource(discord.AudioSource):
+    """Track metadata wrapped around an FFmpeg source.
+    
+    PCM sources go through a VolumeTransformer, which only does per-frame work
+    when the requested volume differs from what FFmpeg already applied. Opus
+    sources, copied or encoded by FFmpeg, are passed through untouched, so
+    their volume cannot change until FFmpeg is restarted. Sources from an audio node are also Opus, but the node
+    restarts FFmpeg itself when the volume changes.
+    
+    The playback position is counted in frames read. swap() replaces the FFmpeg
+    source mid-track (after a seek, quality or volume change) without ending
+    the track for the voice client.
+    """
+    
+    def __init__(self, source, *, data, volume=0.5, volume_mode='ffmpeg', position=0.0):
+        self.volume_mode = volume_mode
+        self._volume = volume
+        self._lock = threading.Lock()
+        self._attach(source, position)
         self.data = data
+        self.id = data.get('id')
         self.title = data.get('title')
         self.url = data.get('url')
+        self.webpage_url = data.get('webpage_url')
         self.duration = data.get('duration')
         self.thumbnail = data.get('thumbnail')
         self.requester = data.get('requester')
-
-    @classmethod
-    async def from_url(cls, url, *, loop=None, stream=False, requester=None, ytdl_options=None):
-        loop = loop or commands.bot.loop
-        ytdl = yt_dlp.YoutubeDL(ytdl_options)
+        # Bumped for every respawn so only the latest replacement is swapped in
+        self.respawns = 0
+        # Called once from the audio thread when the first frame of audio is read
+        self.on_first_packet = None
+        # Optional StreamStats that every read is timed into
+        self.stats = None
+    
+    def _attach(self, source, position):
+        self.original = source
+        self.filter_volume = getattr(source, 'filter_volume', 1.0)
+        if source.is_opus():
+            self.transformer = None
+        elif self.volume_mode == 'transformer':
+            self.transformer = discord.PCMVolumeTransformer(source, self._volume)
+        else:
+            self.transformer = VolumeTransformer(source, self._volume / self.filter_volume, use_numpy=self.volume_mode == 'numpy')
+        if self.remote:
+            # A source warmed ahead of time may have started at an older volume
+            source.set_volume(self._volume)
+        self.start_position = position
+        self.frames = 0
+    
+    @property
+    def remote(self):
+        return getattr(self.original, 'remote', False)
+    
+    @property
+    def mode(self):
+        """'copy', 'opus' or 'pcm' for sources from create_audio_source, otherwise None"""
+        return getattr(self.original, 'mode', None)
+    
+    @property
+    def passthrough(self):
+        return self.transformer is None and not self.remote
+    
+    @property
+    def position(self):
+        """Seconds into the track of the last frame handed to the voice client"""
+        if self.remote:
+            return self.original.position
+        return self.start_position + self.frames * FRAME_SECONDS
+    
+    @property
+    def volume(self):
+        return self._volume
+    
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(value, 0.0)
+        if self.transformer:
+            self.transformer.volume = self._volume / self.filter_volume
+        elif self.remote:
+            self.original.set_volume(self._volume)
+    
+    def read(self):
+        stats = self.stats
+        started = time.perf_counter() if stats is not None else 0.0
+        with self._lock:
+            data = self.transformer.read() if self.transformer else self.original.read()
+            if data:
+                self.frames += 1
+        if stats is not None:
+            stats.record(started, time.perf_counter())
+        if data and self.on_first_packet is not None:
+            callback, self.on_first_packet = self.on_first_packet, None
+            callback()
+        return data
+    
+    def is_opus(self):
+        return self.transformer is None
+    
+    def swap(self, source, position):
+        """Play `source` from `position` in place of the current FFmpeg process.
+        
+        Waits for a read in progress on the audio thread to finish, so call
+        it from a worker thread.
+        """
+        with self._lock:
+            old = self.original
+            self._attach(source, position)
+        old.cleanup()
+    
+    def cleanup(self):
+        self.original.cleanup()
+    
+    @staticmethod
+    async def extract(url, *, loop=None, ytdl_options=None, download=False, background=False):
+        """Run yt-dlp and return only the whitelisted INFO_FIELDS (plus _filename for downloads)"""
+        if extractor_pool is not None:
+            return await extractor_pool.extract(url, ytdl_options, download=download, background=background)
         
-        data = await loop.run_in_executor(
+        loop = loop or asyncio.get_running_loop()
+        return await loop.run_in_executor(
             None, 
-            lambda: ytdl.extract_info(url, download=not stream)
+            extract_job,
+            url,
+            ytdl_options,
+            download
         )
-
-        if 'entries' in data:
-            entries = []
-            for entry in data['entries']:
-                entry_data = {
-                    'title': entry.get('title'),
-                    'url': entry.get('url'),
-                    'duration': entry.get('duration'),
-                    'thumbnail': entry.get('thumbnail'),
-                    'requester': requester
-                }
-                entries.append(entry_data)
-            return entries
+    
+    @staticmethod
+    async def iter_playlist(url, *, loop=None, requester=None, ytdl_options=None, batch_size=25):
+        """Yield batches of flat playlist entries as yt-dlp pages through the playlist"""
+        loop = loop or asyncio.get_running_loop()
+        options = dict(ytdl_options or {})
+        options.update({'extract_flat': 'in_playlist', 'lazy_playlist': True})
+        
+        async def run(func):
+            if extractor_pool is not None:
+                return await extractor_pool.run(func)
+            return await loop.run_in_executor(None, func)
         
-        data['requester'] = requester
-        filename = data['url'] if stream else ytdl.prepare_filename(data)
+        data = await run(lambda: get_ytdl(options).extract_info(url, download=False, process=False))
         
-        ffmpeg_options = {
-            'options': '-vn -b:a 128k -ar 44100',
-            'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -threads 2'
-        }
+        entries = iter(data.get('entries') or [])
+        while True:
+            batch = await run(lambda: list(itertools.islice(entries, batch_size)))
+            if not batch:
+                break
+            yield [Track.from_info(entry, requester) for entry in batch if entry and entry.get('id')]
+    
+    @classmethod
+    async def resolve(cls, url, *, loop=None, requester=None, ytdl_options=None, background=False, guild_id=None):
+        """Return compact playable metadata for a single video, using the stream cache when fresh"""
+        cached = stream_cache.get(video_id_from_url(url))
+        if cached:
+            cached['requester'] = requester
+            metrics.inc('resolve_cache_hits', guild_id)
+            return cached
         
-        return cls(
-            discord.FFmpegPCMAudio(filename, **ffmpeg_options), 
-            data=data
-        )
\ No newline at end of file
+        start = time.perf_counter()
+        try:
+            with tracer.span('ytdl.extract', url=url, background=background):
+                data = await cls.extract(url, loop=loop, ytdl_options=ytdl_options, background=background)
+        except Exception:
+            metrics.inc('resolve_errors', guild_id)
+            raise
+        metrics.observe('prefetch_seconds' if background else 'resolve_seconds', time.perf_counter() - start, guild_id)
+        if 'entries' in data:
+            # Search URLs such as ytsearch: come back as a one-entry result list
+            entries = [entry for entry in data['entries'] if entry]
+            if not entries:
+                raise ValueError(f"No results for {url}")
+            data = entries[0]
+        
+        info = compact_info(data, requester)
+        stream_cache.put(info)
+        return info
+    
+    @classmethod
+    async def resolve_track(cls, track, *, loop=None, ytdl_options=None, background=False, guild_id=None):
+        """Return playable info for a queued track: the cached file if there is one, else a fresh stream URL"""
+        info = track.to_dict()
+        local = cached_info(info)
+        if local:
+            return local
+        return await cls.resolve(
+            track.webpage_url,
+            loop=loop,
+            requester=track.requester,
+            ytdl_options=ytdl_options,
+            background=background,
+            guild_id=guild_id
+        )